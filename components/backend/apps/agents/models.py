@@ -2,8 +2,11 @@
 Agent models
 """
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class AgentStatus(models.Model):
     """Agent real-time status"""
@@ -29,7 +32,8 @@ class AgentStatus(models.Model):
     # Session info
     login_time = models.DateTimeField(null=True, blank=True, verbose_name=_('Login time'))
     logout_time = models.DateTimeField(null=True, blank=True, verbose_name=_('Logout time'))
-    state_since = models.DateTimeField(auto_now=True, verbose_name=_('State since'))
+    # Written by apps.agents.presence with the time of the transition
+    state_since = models.DateTimeField(default=timezone.now, verbose_name=_('State since'))
     
     # SIP/WebRTC info
     sip_status = models.CharField(max_length=20, default='UNREGISTERED', verbose_name=_('SIP status'))
@@ -41,6 +45,10 @@ class AgentStatus(models.Model):
     class Meta:
         verbose_name = _('Agent Status')
         verbose_name_plural = _('Agent Statuses')
+        indexes = [
+            # Timeout sweep: WHERE state IN (...) AND updated_at < threshold
+            models.Index(fields=['state', 'updated_at']),
+        ]
     
     def __str__(self):
         return f"{self.agent.email} - {self.get_state_display()}"
@@ -66,10 +74,18 @@ class AgentSession(models.Model):
     total_wrap_time = models.DurationField(null=True, blank=True, verbose_name=_('Total wrap time'))
     total_idle_time = models.DurationField(null=True, blank=True, verbose_name=_('Total idle time'))
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Agent Session')
         verbose_name_plural = _('Agent Sessions')
+        default_manager_name = 'unscoped'
         ordering = ['-login_time']
+        indexes = [
+            models.Index(fields=['organization', '-login_time'], name='session_org_login_idx'),
+            models.Index(fields=['organization', 'agent', '-login_time'], name='session_org_agent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.agent.email} - {self.login_time}"
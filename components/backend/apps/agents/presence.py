@@ -0,0 +1,335 @@
+"""
+Real-time agent presence store
+
+Agent state transitions are written to Redis and persisted to AgentStatus
+asynchronously in batches:
+
+    presence:agent:{agent_id}             hash: state, state_since, queue, call
+    presence:agent:{agent_id}:queues      set:  queues the agent is an unpaused member of
+    presence:queue:{queue_id}:available   set:  available agents of the queue
+    presence:dirty                        set:  agents not yet persisted
+    presence:flushing                     set:  agents being persisted
+
+Each transition is also published on the `agent:{agent_id}` and
+`queue:{queue_id}` channels for real-time consumers, and forwarded to the
+Channels consumers (the agent_ and queue_ groups and the dashboard stream
+of the agent's organization).
+"""
+import json
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from apps.api.broadcast import broadcast_many
+from apps.api.live_state import dashboard_group, publish_state
+from apps.users.models import User
+from apps.users.statistics import invalidate_agents
+from .models import AgentStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+KEY_PREFIX = 'presence'
+DIRTY_KEY = f'{KEY_PREFIX}:dirty'
+FLUSHING_KEY = f'{KEY_PREFIX}:flushing'
+
+AVAILABLE_STATES = (AgentStatus.State.AVAILABLE,)
+
+PERSIST_BATCH_SIZE = 500
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def agent_key(agent_id):
+    return f'{KEY_PREFIX}:agent:{agent_id}'
+
+
+def agent_queues_key(agent_id):
+    return f'{KEY_PREFIX}:agent:{agent_id}:queues'
+
+
+def available_key(queue_id):
+    return f'{KEY_PREFIX}:queue:{queue_id}:available'
+
+
+def _decode(values):
+    return {k.decode(): v.decode() for k, v in values.items()}
+
+
+def sync_queue_membership(agent_id):
+    """Reload the queues an agent serves and fix up the availability sets"""
+    from apps.queues.models import QueueMember
+
+    client = _redis()
+    queue_ids = set(
+        QueueMember.objects
+        .filter(agent_id=agent_id, paused=False, queue__is_active=True)
+        .values_list('queue_id', flat=True)
+    )
+    previous = {int(q) for q in client.smembers(agent_queues_key(agent_id))}
+    state = client.hget(agent_key(agent_id), 'state')
+    available = state is not None and state.decode() in AVAILABLE_STATES
+
+    pipe = client.pipeline()
+    pipe.delete(agent_queues_key(agent_id))
+    if queue_ids:
+        pipe.sadd(agent_queues_key(agent_id), *queue_ids)
+    for queue_id in previous - queue_ids:
+        pipe.srem(available_key(queue_id), agent_id)
+    if available:
+        for queue_id in queue_ids:
+            pipe.sadd(available_key(queue_id), agent_id)
+    pipe.execute()
+
+    return queue_ids
+
+
+def _queue_ids(client, agent_id):
+    queue_ids = client.smembers(agent_queues_key(agent_id))
+    if queue_ids:
+        return {int(q) for q in queue_ids}
+    return sync_queue_membership(agent_id)
+
+
+def _event(agent_id, state, since, queue_id=None, call_id=None):
+    return {
+        'type': 'agent_state',
+        'agent_id': agent_id,
+        'state': state,
+        'state_since': since.isoformat(),
+        'queue_id': queue_id,
+        'call_id': call_id,
+    }
+
+
+def notify_consumers(transitions):
+    """
+    Forward ``(event, queue_ids)`` transitions to the Channels consumers.
+
+    The presence store is already written, so a channel layer failure is
+    logged rather than raised.
+    """
+    messages = []
+    dashboards = {}
+    try:
+        organizations = dict(
+            User.objects
+            .filter(id__in=[event['agent_id'] for event, _ in transitions])
+            .values_list('id', 'organization_id')
+        )
+        for event, queue_ids in transitions:
+            # A slow socket only needs the agent's latest state
+            key = f'agent:{event["agent_id"]}'
+            messages.append((f'agent_{event["agent_id"]}', 'agent_update', event, key))
+            messages.extend((f'queue_{queue_id}', 'queue_update', event, key) for queue_id in queue_ids)
+            organization_id = organizations.get(event['agent_id'])
+            if organization_id is not None:
+                # Each organization's dashboard only carries its own agents
+                dashboards.setdefault(organization_id, {})[str(event['agent_id'])] = {
+                    field: event[field] for field in ('state', 'state_since', 'queue_id', 'call_id')
+                }
+        broadcast_many(messages)
+        for organization_id, agents in dashboards.items():
+            publish_state(dashboard_group(organization_id), 'dashboard_update', {'agents': agents})
+    except Exception:
+        logger.exception("Could not forward agent presence to the WebSocket consumers")
+
+
+def _state_commands(pipe, agent_id, state, queue_ids, since, queue_id, call_id):
+    available = state in AVAILABLE_STATES
+    event = _event(agent_id, state, since, queue_id, call_id)
+    text = json.dumps(event)
+
+    pipe.hset(agent_key(agent_id), mapping={
+        'state': state,
+        'state_since': since.isoformat(),
+        'queue': queue_id or '',
+        'call': call_id or '',
+    })
+    for member_queue_id in queue_ids:
+        if available:
+            pipe.sadd(available_key(member_queue_id), agent_id)
+        else:
+            pipe.srem(available_key(member_queue_id), agent_id)
+    pipe.sadd(DIRTY_KEY, agent_id)
+    pipe.publish(f'agent:{agent_id}', text)
+    for member_queue_id in queue_ids:
+        pipe.publish(f'queue:{member_queue_id}', text)
+    return event
+
+
+def set_state(agent_id, state, queue_id=None, call_id=None, since=None):
+    """Record an agent state transition"""
+    client = _redis()
+    since = since or timezone.now()
+    queue_ids = _queue_ids(client, agent_id)
+
+    pipe = client.pipeline()
+    event = _state_commands(pipe, agent_id, state, queue_ids, since, queue_id, call_id)
+    pipe.execute()
+    notify_consumers([(event, queue_ids)])
+
+
+def publish_offline(agent_ids, since):
+    """
+    Mirror a bulk logout that was already written to AgentStatus.
+
+    The agents leave every availability set and an event is published per
+    agent, but they aren't marked dirty since the database is up to date.
+    """
+    if not agent_ids:
+        return
+
+    client = _redis()
+    pipe = client.pipeline(transaction=False)
+    for agent_id in agent_ids:
+        pipe.smembers(agent_queues_key(agent_id))
+    memberships = pipe.execute()
+
+    state = AgentStatus.State.OFFLINE
+    transitions = []
+    pipe = client.pipeline()
+    for agent_id, queue_ids in zip(agent_ids, memberships):
+        queue_ids = [int(queue_id) for queue_id in queue_ids]
+        event = _event(agent_id, state, since)
+        transitions.append((event, queue_ids))
+        event = json.dumps(event)
+        pipe.hset(agent_key(agent_id), mapping={
+            'state': state,
+            'state_since': since.isoformat(),
+            'queue': '',
+            'call': '',
+        })
+        pipe.publish(f'agent:{agent_id}', event)
+        for queue_id in queue_ids:
+            pipe.srem(available_key(queue_id), agent_id)
+            pipe.publish(f'queue:{queue_id}', event)
+    pipe.execute()
+
+    invalidate_agents(agent_ids)
+    notify_consumers(transitions)
+
+
+def _state(agent_id, values):
+    if not values:
+        return None
+    values = _decode(values)
+    return {
+        'agent_id': agent_id,
+        'state': values['state'],
+        'state_since': values['state_since'],
+        'queue_id': int(values['queue']) if values.get('queue') else None,
+        'call_id': int(values['call']) if values.get('call') else None,
+    }
+
+
+def get_state(agent_id):
+    """Current presence of an agent, or None when unknown"""
+    return _state(agent_id, _redis().hgetall(agent_key(agent_id)))
+
+
+def available_count(queue_id):
+    """Number of available agents in a queue"""
+    return _redis().scard(available_key(queue_id))
+
+
+def available_agents(queue_id):
+    """Ids of the available agents in a queue"""
+    return {int(a) for a in _redis().smembers(available_key(queue_id))}
+
+
+# Async variants for the real-time views (apps.api.realtime)
+
+async def aset_state(agent_id, state, queue_id=None, call_id=None, since=None):
+    """set_state() on the async client"""
+    from apps.api.realtime import aredis
+
+    client = aredis()
+    since = since or timezone.now()
+    queue_ids = {int(q) for q in await client.smembers(agent_queues_key(agent_id))}
+    if not queue_ids:
+        queue_ids = await sync_to_async(sync_queue_membership)(agent_id)
+
+    pipe = client.pipeline()
+    event = _state_commands(pipe, agent_id, state, queue_ids, since, queue_id, call_id)
+    await pipe.execute()
+    await sync_to_async(notify_consumers)([(event, queue_ids)])
+
+
+async def aget_state(agent_id):
+    """get_state() on the async client"""
+    from apps.api.realtime import aredis
+
+    return _state(agent_id, await aredis().hgetall(agent_key(agent_id)))
+
+
+async def aavailable_agents(queue_id):
+    """available_agents() on the async client"""
+    from apps.api.realtime import aredis
+
+    return {int(a) for a in await aredis().smembers(available_key(queue_id))}
+
+
+def claim(queue_id, agent_id):
+    """Take an agent out of a queue's availability set; False if someone else did first"""
+    return bool(_redis().srem(available_key(queue_id), agent_id))
+
+
+def persist_dirty(batch_size=PERSIST_BATCH_SIZE):
+    """
+    Copy pending presence changes to AgentStatus in batches.
+
+    The dirty set is moved to a "flushing" set first and agents only leave
+    it once their rows are written, so a failed run is retried by the next
+    one while transitions recorded meanwhile stay in the dirty set.
+    """
+    client = _redis()
+    persisted = 0
+
+    # Take over the dirty set, keeping whatever a previous run left behind
+    pipe = client.pipeline()
+    pipe.sunionstore(FLUSHING_KEY, [FLUSHING_KEY, DIRTY_KEY])
+    pipe.delete(DIRTY_KEY)
+    pipe.execute()
+
+    while True:
+        members = client.srandmember(FLUSHING_KEY, batch_size)
+        if not members:
+            break
+
+        agent_ids = [int(m) for m in members]
+        pipe = client.pipeline(transaction=False)
+        for agent_id in agent_ids:
+            pipe.hgetall(agent_key(agent_id))
+        snapshots = pipe.execute()
+
+        rows = []
+        for agent_id, values in zip(agent_ids, snapshots):
+            if not values:
+                continue
+            values = _decode(values)
+            rows.append(AgentStatus(
+                agent_id=agent_id,
+                state=values['state'],
+                state_since=datetime.fromisoformat(values['state_since']),
+                current_queue_id=int(values['queue']) if values.get('queue') else None,
+                current_call_id=int(values['call']) if values.get('call') else None,
+            ))
+
+        AgentStatus.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['agent'],
+            update_fields=['state', 'state_since', 'current_queue', 'current_call', 'updated_at'],
+        )
+        client.srem(FLUSHING_KEY, *members)
+        persisted += len(rows)
+        invalidate_agents([row.agent_id for row in rows])
+
+    return persisted
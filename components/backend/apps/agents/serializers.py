@@ -0,0 +1,18 @@
+"""
+Serializers for agents app
+"""
+from rest_framework import serializers
+from .models import AgentStatus
+
+
+class AgentStatusSerializer(serializers.ModelSerializer):
+    """Agent status serializer"""
+    
+    class Meta:
+        model = AgentStatus
+        fields = [
+            'id', 'agent', 'state', 'current_call', 'current_queue',
+            'login_time', 'logout_time', 'state_since', 'sip_status',
+            'updated_at'
+        ]
+        read_only_fields = fields
@@ -4,25 +4,66 @@ from django.utils import timezone
 from datetime import timedelta
 
 
+# Flips stale statuses to OFFLINE and closes their open sessions in a single
+# statement; the status scan is served by the (state, updated_at) index.
+_TIMEOUT_SQL = """
+WITH stale AS (
+    UPDATE {status_table}
+    SET state = %(offline)s,
+        logout_time = %(now)s,
+        state_since = %(now)s,
+        updated_at = %(now)s,
+        current_call_id = NULL,
+        current_queue_id = NULL
+    WHERE state = ANY(%(states)s) AND updated_at < %(threshold)s
+    RETURNING agent_id
+), closed AS (
+    UPDATE {session_table} AS s
+    SET logout_time = %(now)s,
+        duration = %(now)s - s.login_time
+    FROM stale
+    WHERE s.agent_id = stale.agent_id AND s.logout_time IS NULL
+)
+SELECT agent_id FROM stale
+"""
+
+
 @shared_task
 def check_agent_timeouts():
     """Check for agent timeouts and auto-logout"""
-    from .models import AgentStatus
+    from django.db import connection, transaction
+    from .models import AgentSession, AgentStatus
+    from .presence import publish_offline
     
-    timeout_threshold = timezone.now() - timedelta(hours=12)
+    now = timezone.now()
+    sql = _TIMEOUT_SQL.format(
+        status_table=connection.ops.quote_name(AgentStatus._meta.db_table),
+        session_table=connection.ops.quote_name(AgentSession._meta.db_table),
+    )
     
     # Find agents that haven't updated in X hours
-    stale_agents = AgentStatus.objects.filter(
-        state__in=['AVAILABLE', 'BUSY', 'ON_CALL'],
-        updated_at__lt=timeout_threshold
-    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'offline': AgentStatus.State.OFFLINE,
+            'states': [AgentStatus.State.AVAILABLE, AgentStatus.State.BUSY, AgentStatus.State.ON_CALL],
+            'threshold': now - timedelta(hours=12),
+            'now': now,
+        })
+        agent_ids = [row[0] for row in cursor.fetchall()]
+    
+    publish_offline(agent_ids, now)
+    
+    return f"Logged out {len(agent_ids)} stale agents"
+
+
+@shared_task
+def persist_agent_presence():
+    """Persist pending presence transitions to AgentStatus"""
+    from .presence import persist_dirty
     
-    for agent_status in stale_agents:
-        agent_status.state = AgentStatus.State.OFFLINE
-        agent_status.logout_time = timezone.now()
-        agent_status.save()
+    persisted = persist_dirty()
     
-    return f"Checked {stale_agents.count()} stale agents"
+    return f"Persisted {persisted} agent states"
 
 
 @shared_task
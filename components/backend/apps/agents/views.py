@@ -0,0 +1,90 @@
+"""
+Views for agents app
+"""
+from django.utils import timezone
+from rest_framework import permissions, viewsets
+
+from apps.api.fastpath import FastListMixin
+from apps.api.realtime import AsyncAPIView, error, json_response
+from apps.calls.models import Call
+from apps.queues.models import Queue
+from apps.users.models import User
+from omnivoip.db_router import ReplicaReadMixin
+from .models import AgentStatus
+from .presence import aget_state, aset_state
+from .serializers import AgentStatusSerializer
+
+
+class AgentStatusViewSet(ReplicaReadMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Persisted agent states for wallboards.
+    
+    Presence is written to Redis first and persisted in batches, so rows
+    may trail live state by a few seconds.
+    """
+    queryset = AgentStatus.objects.all()
+    serializer_class = AgentStatusSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['state', 'current_queue']
+    ordering_fields = ['state_since', 'updated_at']
+    ordering = ['agent_id']
+    
+    def get_queryset(self):
+        """Filter agent states by organization for non-admins"""
+        user = self.request.user
+        queryset = super().get_queryset()
+        
+        if user.role == User.Role.ADMIN:
+            return queryset
+        
+        if user.organization:
+            return queryset.filter(agent__organization=user.organization)
+        
+        return queryset.none()
+
+
+class AgentStateView(AsyncAPIView):
+    """
+    Live presence of the calling agent (async, /api/rt/).
+    
+    GET reads it from the presence store; POST records a transition:
+    {"state": "AVAILABLE", "queue_id": null, "call_id": null}.
+    """
+    
+    async def get(self, request):
+        state = await aget_state(request.user.id)
+        if state is None:
+            state = {
+                'agent_id': request.user.id,
+                'state': AgentStatus.State.OFFLINE,
+                'state_since': None,
+                'queue_id': None,
+                'call_id': None,
+            }
+        return json_response(state)
+    
+    async def post(self, request):
+        state = request.data.get('state')
+        queue_id = request.data.get('queue_id')
+        call_id = request.data.get('call_id')
+        if state not in AgentStatus.State.values:
+            return error(f'"{state}" is not a valid state.', 400)
+        # bool is an int subclass, but true/false aren't ids
+        if not all(value is None or (isinstance(value, int) and not isinstance(value, bool)) for value in (queue_id, call_id)):
+            return error('queue_id and call_id must be integers.', 400)
+        # Both managers are tenant scoped, so another organization's ids don't exist either
+        if queue_id is not None and not await Queue.objects.filter(id=queue_id).aexists():
+            return error(f'Queue {queue_id} does not exist.', 400)
+        if call_id is not None and not await Call.objects.filter(id=call_id).aexists():
+            return error(f'Call {call_id} does not exist.', 400)
+        
+        since = timezone.now()
+        await aset_state(request.user.id, state, queue_id=queue_id, call_id=call_id, since=since)
+        
+        return json_response({
+            'agent_id': request.user.id,
+            'state': state,
+            'state_since': since.isoformat(),
+            'queue_id': queue_id,
+            'call_id': call_id,
+        })
@@ -4,3 +4,15 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.api'
     verbose_name = 'API'
+    
+    def ready(self):
+        from apps.campaigns.models import Campaign
+        from apps.contacts.models import Contact, ContactCampaign
+        from apps.queues.models import Queue
+        from apps.users.models import Organization, User, UserProfile
+        from .conditional import track
+        
+        track(Campaign)
+        track(Queue)
+        track(Contact, ContactCampaign)
+        track(User, UserProfile, Organization)
@@ -0,0 +1,56 @@
+"""
+Serialize-once group broadcasts
+
+A payload is JSON-encoded a single time when it's published and travels
+through the channel layer as text; every consumer in the group forwards
+that text as-is instead of encoding the same data again.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def encode_event(handler, data, key=None):
+    """
+    Group message for ``handler`` carrying ``data`` pre-encoded; consumers
+    coalesce pending frames that share a ``key``
+    """
+    message = {
+        'type': handler,
+        'text': json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')),
+    }
+    if key is not None:
+        message['key'] = key
+    return message
+
+
+async def abroadcast(group, handler, data, key=None):
+    """Send ``data`` to every consumer of ``group`` through ``handler``"""
+    await get_channel_layer().group_send(group, encode_event(handler, data, key))
+
+
+def broadcast(group, handler, data, key=None):
+    """Synchronous broadcast() for views, signals and Celery tasks"""
+    async_to_sync(abroadcast)(group, handler, data, key)
+
+
+async def abroadcast_many(messages):
+    """abroadcast() for a list of ``(group, handler, data)`` or ``(group, handler, data, key)``"""
+    layer = get_channel_layer()
+    for group, handler, data, *key in messages:
+        await layer.group_send(group, encode_event(handler, data, *key))
+
+
+def broadcast_many(messages):
+    """Synchronous broadcast_many(), one event loop hop for all messages"""
+    async_to_sync(abroadcast_many)(messages)
+
+
+def event_text(event):
+    """Wire text of a group message; older messages still carry raw ``data``"""
+    text = event.get('text')
+    if text is None:
+        text = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return text
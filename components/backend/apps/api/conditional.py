@@ -0,0 +1,184 @@
+"""
+Conditional GET (ETag / If-None-Match) for REST resources
+
+Every tracked model has a version counter in the cache, bumped whenever
+one of its rows is saved or deleted. ETags are derived from it:
+
+    detail   W/"<pk>.<updated_at>.<version>"
+    list     W/"<hash of version, tenant, query string and format>"
+
+The ``updated_at`` of each object is kept cache-aside, so answering a
+matching If-None-Match costs one cache round trip and returns 304 before
+anything is loaded or serialized. Bulk writes that skip signals
+(``update()``, ``bulk_update()``) must call ``bump_version()``, or
+``abump_version()`` from async code.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.users.models import User
+
+
+ENTRY_TIMEOUT = 60 * 60
+
+
+def version_key(model):
+    return f'etag:{model._meta.label_lower}:version'
+
+
+def entry_key(model, pk):
+    return f'etag:{model._meta.label_lower}:{pk}'
+
+
+def _initial_version():
+    # Time based, so a version lost with the cache never repeats
+    return int(time.time() * 1000)
+
+
+def get_version(model):
+    version = cache.get(version_key(model))
+    if version is None:
+        cache.add(version_key(model), _initial_version(), None)
+        version = cache.get(version_key(model))
+    return version
+
+
+def bump_version(model, pks=()):
+    """Invalidate the ETags of ``model`` after a write"""
+    try:
+        cache.incr(version_key(model))
+    except ValueError:
+        cache.set(version_key(model), _initial_version(), None)
+    if pks:
+        cache.delete_many([entry_key(model, pk) for pk in pks])
+
+
+async def abump_version(model, pks=()):
+    """bump_version() for async views, on the async Redis client"""
+    from .realtime import aredis
+
+    key = cache.make_key(version_key(model))
+    pipe = aredis().pipeline()
+    pipe.set(key, _initial_version(), nx=True)
+    pipe.incr(key)
+    if pks:
+        pipe.delete(*[cache.make_key(entry_key(model, pk)) for pk in pks])
+    await pipe.execute()
+
+
+def _on_change(sender, instance, **kwargs):
+    # After commit, so a reader can't cache the old row under the new version
+    pk = instance.pk
+    transaction.on_commit(lambda: bump_version(sender, [pk]))
+
+
+def track(model, *related):
+    """
+    Keep the ETag version of ``model`` current through model signals.
+
+    Writes to ``related`` models, which appear in ``model``'s representation
+    or filters, bump its version too.
+    """
+    label = model._meta.label_lower
+    post_save.connect(_on_change, sender=model, dispatch_uid=f'etag-save-{label}')
+    post_delete.connect(_on_change, sender=model, dispatch_uid=f'etag-delete-{label}')
+
+    def on_related_change(sender, instance, **kwargs):
+        transaction.on_commit(lambda: bump_version(model))
+
+    for other in related:
+        uid = f'etag-{label}-{other._meta.label_lower}'
+        post_save.connect(on_related_change, sender=other, weak=False, dispatch_uid=f'{uid}-save')
+        post_delete.connect(on_related_change, sender=other, weak=False, dispatch_uid=f'{uid}-delete')
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison, as for GET
+    strip = lambda tag: tag[2:] if tag.startswith('W/') else tag
+    return strip(etag) in {strip(tag) for tag in parse_etags(header)}
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin answering If-None-Match on ``list`` and ``retrieve``.
+
+    ``organization_field`` is the tenant column checked before a cached
+    ETag is trusted; it mirrors the organization filtering of the viewsets.
+    """
+    organization_field = 'organization'
+
+    def _scope(self):
+        """Tenant the request sees: 'all', an organization id, or None to skip"""
+        user = self.request.user
+        if user.role == User.Role.ADMIN:
+            return 'all'
+        return user.organization_id
+
+    def _not_modified(self, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    def _with_etag(self, response, etag):
+        if etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def detail_etag(self, pk):
+        """ETag of object ``pk``, or None when it can't be vouched for from the cache"""
+        scope = self._scope()
+        if scope is None:
+            return None
+
+        model = self.get_queryset().model
+        key = entry_key(model, pk)
+        values = cache.get_many([version_key(model), key])
+        version = values.get(version_key(model)) or get_version(model)
+        entry = values.get(key)
+        if entry is None:
+            row = model.objects.filter(pk=pk).values_list('updated_at', f'{self.organization_field}_id').first()
+            if row is None:
+                return None
+            entry = (row[0].timestamp(), row[1])
+            cache.set(key, entry, ENTRY_TIMEOUT)
+
+        updated_at, organization_id = entry
+        if scope != 'all' and scope != organization_id:
+            return None
+        return f'W/"{pk}.{updated_at}.{version}"'
+
+    def list_etag(self):
+        scope = self._scope()
+        if scope is None:
+            return None
+
+        version = get_version(self.get_queryset().model)
+        request = self.request
+        digest = hashlib.sha1('|'.join([
+            str(version), str(scope), request.get_full_path(), request.accepted_renderer.format,
+        ]).encode()).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        etag = self.detail_etag(pk) if str(pk).isdigit() else None
+        if etag and etag_matches(request, etag):
+            return self._not_modified(etag)
+        return self._with_etag(super().retrieve(request, *args, **kwargs), etag)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.list_etag()
+        if etag and etag_matches(request, etag):
+            return self._not_modified(etag)
+        return self._with_etag(super().list(request, *args, **kwargs), etag)
@@ -1,111 +1,298 @@
 """
 WebSocket consumers for real-time updates
+
+Sockets authenticate with their session or an access token (?token=...).
+Each stream belongs to one organization: the dashboard of the caller's
+organization (admins pick one with ?organization=<id>), and agents,
+queues and campaigns of that organization only.
 """
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from apps.users.authentication import CachedJWTAuthentication
+from apps.users.models import User
+from .broadcast import event_text
+from .buffers import BufferOverflow, OutboundBuffer, drain
+from .live_state import covers, dashboard_group, encode, flatten, load_snapshot, unflatten
+
+logger = logging.getLogger(__name__)
+
+# Close codes for sockets refused in connect(), as on the WebSocket hub
+UNAUTHENTICATED = 4401
+FORBIDDEN = 4403
 
 
-class DashboardConsumer(AsyncWebsocketConsumer):
-    """Real-time dashboard updates"""
+class BufferedConsumer(AsyncWebsocketConsumer):
+    """
+    Consumer whose group handlers never wait on the socket.
     
-    async def connect(self):
-        self.room_group_name = 'dashboard'
-        
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+    Frames go through an OutboundBuffer drained by a per-connection task, so
+    a stalled browser tab only loses its own updates instead of holding up
+    the consumer's channel layer inbox.
+    """
+    
+    room_group_name = None
+    
+    def query_param(self, name):
+        values = parse_qs(self.scope.get('query_string', b'').decode()).get(name)
+        return values[0] if values else None
+    
+    async def get_user(self):
+        """The session user, or the user of a valid ?token= access token"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user
+        token = self.query_param('token')
+        if not token:
+            return None
+        authentication = CachedJWTAuthentication()
+        try:
+            validated_token = authentication.get_validated_token(token)
+            return await database_sync_to_async(authentication.get_user)(validated_token)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+    
+    async def authorize(self, model, pk):
+        """
+        Whether the socket may follow row ``pk`` of ``model``: admins any
+        row, everyone else only rows of their own organization. Refused
+        sockets are closed.
+        """
+        user = await self.get_user()
+        if user is None:
+            await self.close(code=UNAUTHENTICATED)
+            return False
+        if user.role == User.Role.ADMIN:
+            return True
         
+        organization_id = None
+        if str(pk).isdigit() and user.organization_id:
+            organization_id = await model._default_manager.filter(pk=pk).values_list('organization_id', flat=True).afirst()
+        if organization_id is None or organization_id != user.organization_id:
+            await self.close(code=FORBIDDEN)
+            return False
+        return True
+    
+    async def join(self, group):
+        self.room_group_name = group
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
     
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
+        # Sockets refused in connect() never joined a group
+        if self.room_group_name is not None:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+    
+    async def accept(self, subprotocol=None):
+        await super().accept(subprotocol)
+        self.outbound = OutboundBuffer(
+            capacity=settings.WEBSOCKET_SEND_BUFFER,
+            policy=settings.WEBSOCKET_DROP_POLICY,
         )
+        self._sender = asyncio.create_task(self._run_sender())
+    
+    async def _send_frame(self, frame):
+        if isinstance(frame, bytes):
+            await AsyncWebsocketConsumer.send(self, bytes_data=frame)
+        else:
+            await AsyncWebsocketConsumer.send(self, text_data=frame)
+    
+    async def _run_sender(self):
+        try:
+            await drain(self.outbound, self._send_frame, settings.WEBSOCKET_SEND_TIMEOUT)
+        except BufferOverflow:
+            logger.warning("Closing slow WebSocket client %s: %s", self.channel_name, self.outbound.metrics())
+            await self._close_quietly(1013)
+        except Exception as e:
+            logger.warning("Send to WebSocket client %s failed, closing it: %s", self.channel_name, e)
+            await self._close_quietly(1011)
+    
+    async def _close_quietly(self, code):
+        try:
+            await self.close(code=code)
+        except Exception:
+            # Already gone; websocket_disconnect cleans up
+            pass
+    
+    def send_buffered(self, text_data, key=None):
+        """Queue a frame; ``key`` lets a newer frame replace a pending one"""
+        self.outbound.push(text_data, key)
+    
+    async def websocket_disconnect(self, message):
+        sender = getattr(self, '_sender', None)
+        if sender is not None:
+            sender.cancel()
+            logger.info("WebSocket client %s disconnected: %s", self.channel_name, self.outbound.metrics())
+        await super().websocket_disconnect(message)
+
+
+class StateStreamConsumer(BufferedConsumer):
+    """
+    Snapshot on connect, then deltas batched per tick.
+    
+    Group messages carry partial state updates (see apps.api.live_state);
+    changed leaves are collected and flushed every WEBSOCKET_DELTA_INTERVAL
+    seconds as one delta. Clients connecting with ?encoding=msgpack get
+    binary frames.
+    """
+    
+    async def start_stream(self):
+        self.binary = self.query_param('encoding') == 'msgpack'
+        self.pending_set = {}
+        self.pending_unset = set()
+        self._flush_task = None
+        await self.send_snapshot()
+    
+    async def send_snapshot(self):
+        self.version, self.state = await sync_to_async(load_snapshot)(self.room_group_name)
+        self.sent_version = self.version
+        self.pending_set.clear()
+        self.pending_unset.clear()
+        self.send_buffered(encode({
+            'type': 'snapshot',
+            'version': self.version,
+            'state': unflatten(self.state),
+        }, self.binary))
+    
+    def apply_update(self, event):
+        """Fold a group message into the pending delta"""
+        version = event.get('version')
+        if version is not None:
+            # Already part of the snapshot this client received
+            if version <= self.version:
+                return
+            self.version = version
+        
+        # publish_state() ships the update already flattened
+        changes = event['changes'].items() if 'changes' in event else flatten(event['data'])
+        for path, value in changes:
+            if value is None:
+                for field in [f for f in self.state if covers(path, f)]:
+                    del self.state[field]
+                for field in [f for f in self.pending_set if covers(path, f)]:
+                    del self.pending_set[field]
+                self.pending_unset.add(path)
+            elif self.state.get(path) != value:
+                self.state[path] = value
+                self.pending_set[path] = value
+        
+        if (self.pending_set or self.pending_unset) and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(settings.WEBSOCKET_DELTA_INTERVAL)
+        self._flush_task = None
+        self.flush_delta()
+    
+    def flush_delta(self):
+        if not self.pending_set and not self.pending_unset:
+            return
+        
+        # Clients remove the unset subtrees first, then apply the set paths
+        self.send_buffered(encode({
+            'type': 'delta',
+            'from': self.sent_version,
+            'to': self.version,
+            'set': self.pending_set,
+            'unset': sorted(self.pending_unset),
+        }, self.binary))
+        self.sent_version = self.version
+        self.pending_set = {}
+        self.pending_unset = set()
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """Clients that missed a delta ask for a fresh snapshot"""
+        try:
+            message = json.loads(text_data or '{}')
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get('action') == 'resync':
+            await self.send_snapshot()
     
-    async def receive(self, text_data):
-        """Receive message from WebSocket"""
-        pass
+    async def websocket_disconnect(self, message):
+        flush_task = getattr(self, '_flush_task', None)
+        if flush_task is not None:
+            flush_task.cancel()
+        await super().websocket_disconnect(message)
+
+
+class DashboardConsumer(StateStreamConsumer):
+    """Real-time dashboard updates of one organization"""
+    
+    async def connect(self):
+        user = await self.get_user()
+        if user is None:
+            await self.close(code=UNAUTHENTICATED)
+            return
+        
+        organization_id = user.organization_id
+        if user.role == User.Role.ADMIN:
+            requested = self.query_param('organization') or ''
+            organization_id = int(requested) if requested.isdigit() else None
+        if organization_id is None:
+            await self.close(code=FORBIDDEN)
+            return
+        
+        await self.join(dashboard_group(organization_id))
+        await self.start_stream()
     
     async def dashboard_update(self, event):
-        """Send dashboard update to WebSocket"""
-        await self.send(text_data=json.dumps(event['data']))
+        """Queue dashboard changes for the next delta"""
+        self.apply_update(event)
 
 
-class AgentConsumer(AsyncWebsocketConsumer):
+class AgentConsumer(BufferedConsumer):
     """Real-time agent updates"""
     
     async def connect(self):
         self.agent_id = self.scope['url_route']['kwargs']['agent_id']
-        self.room_group_name = f'agent_{self.agent_id}'
-        
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        if not await self.authorize(User, self.agent_id):
+            return
         
-        await self.accept()
-    
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        await self.join(f'agent_{self.agent_id}')
     
     async def agent_update(self, event):
-        """Send agent update"""
-        await self.send(text_data=json.dumps(event['data']))
+        """Send agent update; a newer frame with the same key replaces a pending one"""
+        self.send_buffered(event_text(event), event.get('key'))
 
 
-class QueueConsumer(AsyncWebsocketConsumer):
+class QueueConsumer(BufferedConsumer):
     """Real-time queue updates"""
     
     async def connect(self):
-        self.queue_id = self.scope['url_route']['kwargs']['queue_id']
-        self.room_group_name = f'queue_{self.queue_id}'
+        from apps.queues.models import Queue
         
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        self.queue_id = self.scope['url_route']['kwargs']['queue_id']
+        if not await self.authorize(Queue, self.queue_id):
+            return
         
-        await self.accept()
-    
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        await self.join(f'queue_{self.queue_id}')
     
     async def queue_update(self, event):
-        """Send queue update"""
-        await self.send(text_data=json.dumps(event['data']))
+        """Send queue update; a newer frame with the same key replaces a pending one"""
+        self.send_buffered(event_text(event), event.get('key'))
 
 
-class CampaignConsumer(AsyncWebsocketConsumer):
+class CampaignConsumer(StateStreamConsumer):
     """Real-time campaign updates"""
     
     async def connect(self):
-        self.campaign_id = self.scope['url_route']['kwargs']['campaign_id']
-        self.room_group_name = f'campaign_{self.campaign_id}'
+        from apps.campaigns.models import Campaign
         
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        self.campaign_id = self.scope['url_route']['kwargs']['campaign_id']
+        if not await self.authorize(Campaign, self.campaign_id):
+            return
         
-        await self.accept()
-    
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        await self.join(f'campaign_{self.campaign_id}')
+        await self.start_stream()
     
     async def campaign_update(self, event):
-        """Send campaign update"""
-        await self.send(text_data=json.dumps(event['data']))
+        """Queue campaign changes for the next delta"""
+        self.apply_update(event)
@@ -0,0 +1,82 @@
+"""
+Read-only fast path for high-volume lists
+
+List responses are built from ``.values()`` rows instead of model
+instances and ModelSerializer fields. It applies when every requested
+serializer field is a plain model column; otherwise, e.g. with a
+SerializerMethodField, the regular serializer runs. Values are converted
+the same way the serializer fields would, so both paths return identical
+JSON.
+"""
+from django.db import models
+from django.utils import timezone
+from django.utils.duration import duration_string
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .sparse import requested_fields
+
+
+def _datetime(value):
+    return timezone.localtime(value) if timezone.is_aware(value) else value
+
+
+def _decimal(value):
+    return str(value) if api_settings.COERCE_DECIMAL_TO_STRING else float(value)
+
+
+CONVERTERS = {
+    models.DateTimeField: _datetime,
+    models.DurationField: duration_string,
+    models.DecimalField: _decimal,
+}
+
+# Serialized as URLs or files, not as the stored column
+UNSUPPORTED_FIELDS = (models.FileField,)
+
+
+class FastListMixin:
+    """Viewset mixin serving ``list`` from ``.values()`` rows"""
+
+    def get_fast_columns(self):
+        """{field name: converter} for the list, or None to use the serializer"""
+        serializer_class = self.get_serializer_class()
+        declared = serializer_class._declared_fields
+        names = serializer_class.Meta.fields
+        requested = requested_fields(self.request)
+        if requested:
+            names = [name for name in names if name in requested]
+
+        opts = serializer_class.Meta.model._meta
+        concrete = {f.name: f for f in opts.concrete_fields}
+        columns = {}
+        for name in names:
+            field = concrete.get(name)
+            if name in declared or field is None or isinstance(field, UNSUPPORTED_FIELDS):
+                return None
+            columns[name] = next(
+                (convert for cls, convert in CONVERTERS.items() if isinstance(field, cls)), None
+            )
+        return columns
+
+    def list(self, request, *args, **kwargs):
+        columns = self.get_fast_columns()
+        if not columns:
+            return super().list(request, *args, **kwargs)
+
+        # Keyset pagination reads the ordering columns from each row
+        ordering = [f.lstrip('-') for f in getattr(self, 'keyset_ordering', ())]
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*dict.fromkeys([*columns, *ordering]))
+
+        page = self.paginate_queryset(rows)
+        data = [
+            {
+                name: row[name] if convert is None or row[name] is None else convert(row[name])
+                for name, convert in columns.items()
+            }
+            for row in (rows if page is None else page)
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,45 @@
+"""
+Database health and connection pool metrics
+"""
+import os
+import time
+
+from django.db import DatabaseError, connections
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.users.models import User
+from omnivoip.pooled_postgresql.base import pool_stats
+
+
+class IsAdminRole(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role == User.Role.ADMIN)
+
+
+class DatabaseHealthView(APIView):
+    """
+    Round trip to every database, plus the pool statistics of the process
+    that served the request (see omnivoip.pooled_postgresql).
+    """
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        databases = {}
+        for alias in connections:
+            start = time.perf_counter()
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except DatabaseError as exc:
+                databases[alias] = {'ok': False, 'error': str(exc)}
+            else:
+                databases[alias] = {'ok': True, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+
+        healthy = all(db['ok'] for db in databases.values())
+        return Response(
+            {'pid': os.getpid(), 'databases': databases, 'pools': pool_stats()},
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
@@ -0,0 +1,141 @@
+"""
+Live state streams for dashboard WebSockets
+
+Producers publish partial updates of a stream's state (a nested dict),
+flattened once at publish time rather than by every consumer. The state
+is kept flattened in a Redis hash, one field per leaf path such as
+``agents.5.state``, together with a version counter. Consumers send a full
+snapshot on connect and then per-tick deltas:
+
+    {"type": "snapshot", "version": 12, "state": {...}}
+    {"type": "delta", "from": 12, "to": 15, "set": {"agents.5.state": "BUSY"}, "unset": ["agents.7"]}
+
+A client applies ``set`` paths and deletes ``unset`` subtrees; when ``from``
+doesn't match its version it sends {"action": "resync"} for a new snapshot.
+A ``None`` value in an update removes that path. Keys must not contain dots.
+"""
+import json
+
+import msgpack
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django_redis import get_redis_connection
+
+
+KEY_PREFIX = 'live'
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def state_key(group):
+    return f'{KEY_PREFIX}:{group}'
+
+
+def version_key(group):
+    return f'{KEY_PREFIX}:{group}:version'
+
+
+def dashboard_group(organization_id):
+    """Stream of an organization's dashboard; every tenant has its own"""
+    return f'dashboard_{organization_id}'
+
+
+def flatten(data, prefix=''):
+    """Yield (path, value) for every leaf of a nested dict"""
+    for key, value in data.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict) and value:
+            yield from flatten(value, f'{path}.')
+        else:
+            yield path, value
+
+
+def unflatten(paths):
+    """Nested dict from a {path: value} mapping"""
+    state = {}
+    for path, value in paths.items():
+        *parents, leaf = path.split('.')
+        node = state
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return state
+
+
+def covers(path, field):
+    """Whether removing ``path`` removes ``field``"""
+    return field == path or field.startswith(f'{path}.')
+
+
+# Applies an update atomically: removed subtrees are looked up and deleted
+# in the same step as the new leaves are written and the version bumped
+_PUBLISH_SCRIPT = """
+local removed = cjson.decode(ARGV[1])
+if #removed > 0 then
+    for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+        for _, path in ipairs(removed) do
+            if field == path or string.sub(field, 1, #path + 1) == path .. '.' then
+                redis.call('HDEL', KEYS[1], field)
+                break
+            end
+        end
+    end
+end
+for path, value in pairs(cjson.decode(ARGV[2])) do
+    redis.call('HSET', KEYS[1], path, value)
+end
+return redis.call('INCR', KEYS[2])
+"""
+
+_publish_script = None
+
+
+def _script():
+    global _publish_script
+    if _publish_script is None:
+        _publish_script = _redis().register_script(_PUBLISH_SCRIPT)
+    return _publish_script
+
+
+def publish_state(group, handler, data):
+    """
+    Merge a partial update into a stream's state and notify its consumers.
+
+    ``handler`` is the consumer method the group message is dispatched to,
+    e.g. ``dashboard_update``.
+    """
+    changes = dict(flatten(data))
+    removed = [path for path, value in changes.items() if value is None]
+    updates = {path: json.dumps(value) for path, value in changes.items() if value is not None}
+
+    version = _script()(
+        keys=[state_key(group), version_key(group)],
+        # cjson decodes an empty object and an empty array alike
+        args=[json.dumps(removed), json.dumps(updates)],
+    )
+
+    async_to_sync(get_channel_layer().group_send)(group, {
+        'type': handler,
+        'version': version,
+        'changes': changes,
+    })
+    return version
+
+
+def load_snapshot(group):
+    """(version, flattened state) of a stream"""
+    pipe = _redis().pipeline(transaction=True)
+    pipe.get(version_key(group))
+    pipe.hgetall(state_key(group))
+    version, fields = pipe.execute()
+    paths = {k.decode(): json.loads(v) for k, v in fields.items()}
+    return int(version or 0), paths
+
+
+def encode(message, binary=False):
+    """Frame for the wire: msgpack bytes for binary clients, JSON text otherwise"""
+    if binary:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(',', ':'))
@@ -0,0 +1,134 @@
+"""
+Per-request SQL instrumentation
+
+QueryRecorder hooks the database connection with execute_wrapper(), so it
+works with DEBUG off, and collects the count, total duration and a
+fingerprint per statement. Statements executed more than once with the
+same fingerprint are the usual sign of an N+1: one query per row of a
+page instead of a JOIN or prefetch.
+
+QueryCountMiddleware records every request. When QUERY_COUNT_HEADERS is
+enabled, it adds the result to the response:
+
+    X-Query-Count: 4
+    X-Query-Duplicates: 1
+    Server-Timing: db;dur=3.2;desc="4 queries"
+
+Requests over QUERY_BUDGET, or running one statement QUERY_REPEAT_THRESHOLD
+times or more, are logged to `apps.api.queries` with the numbers as extra
+fields for log-based metrics.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Statement shape: literals and IN lists of any length collapse together"""
+    return _LITERALS.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+class QueryRecorder:
+    """Context manager recording the queries run on every database connection"""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._contexts = []
+
+    def __enter__(self):
+        for alias in self.aliases:
+            context = connections[alias].execute_wrapper(self)
+            context.__enter__()
+            self._contexts.append(context)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self._contexts:
+            self._contexts.pop().__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """{fingerprint: times} of the statements executed more than once"""
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'query_ms': round(self.duration * 1000, 1),
+            'duplicate_queries': sum(n - 1 for n in self.duplicates.values()),
+        }
+
+
+class QueryCountMiddleware:
+    """Record SQL count, duration and duplicates per request"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_COUNT_HEADERS', False)
+        self.budget = getattr(settings, 'QUERY_BUDGET', 50)
+        self.repeat_threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        # Under ASGI the ORM runs on the request's thread-sensitive
+        # sync_to_async thread, and connections are per thread, so the
+        # recorder is installed and removed from that thread
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        summary = recorder.summary()
+        if self.headers:
+            response['X-Query-Count'] = summary['queries']
+            response['X-Query-Duplicates'] = summary['duplicate_queries']
+            timing = f'db;dur={summary["query_ms"]};desc="{summary["queries"]} queries"'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        worst, repeats = max(recorder.fingerprints.items(), key=lambda item: item[1], default=(None, 0))
+        if summary['queries'] > self.budget or repeats >= self.repeat_threshold:
+            logger.warning(
+                "%s %s ran %s queries (%s duplicated) in %sms",
+                request.method, request.path, summary['queries'],
+                summary['duplicate_queries'], summary['query_ms'],
+                extra={**summary, 'path': request.path, 'top_repeated': worst, 'repeats': repeats},
+            )
+        return response
@@ -0,0 +1,102 @@
+"""
+Async views for the real-time endpoints
+
+The dialer and the agent softphones poll a handful of endpoints in tight
+loops (presence, availability, contact claims and status, campaign
+counters). They are served under /api/rt/ by plain async Django views
+instead of DRF, so an ASGI worker keeps them on the event loop:
+
+- Redis is used through one redis.asyncio client per event loop.
+- Users are resolved from the JWT auth cache through that client.
+- Queries use Django's async ORM (aget(), aupdate(), async for).
+
+The views run in the caller's tenant scope, like TenantScopedMixin, and
+answer with orjson-rendered JSON and DRF-style {"detail": ...} errors.
+"""
+import asyncio
+import weakref
+
+import orjson
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views import View
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from apps.users.authentication import CachedJWTAuthentication
+from apps.users.tenancy import tenant_of, tenant_scope
+from .renderers import ORJSONRenderer
+
+_clients = weakref.WeakKeyDictionary()
+_renderer = ORJSONRenderer()
+
+
+def _connect():
+    options = settings.CACHES['default'].get('OPTIONS', {})
+    return aioredis.from_url(settings.CACHES['default']['LOCATION'], password=options.get('PASSWORD'))
+
+
+def aredis():
+    """Async client for the default cache's Redis, bound to the running loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _connect()
+    return client
+
+
+async def cache_get(key):
+    """cache.get() over the async client (django-redis encoding)"""
+    value = await aredis().get(cache.make_key(key))
+    return None if value is None else cache.client.decode(value)
+
+
+async def cache_set(key, value, timeout):
+    await aredis().set(cache.make_key(key), cache.client.encode(value), ex=timeout)
+
+
+def json_response(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type=_renderer.media_type)
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+class AsyncAPIView(View):
+    """
+    Base view: JWT authentication, JSON bodies, tenant scope.
+
+    Handlers are ``async def`` methods named after the HTTP method and
+    read the parsed body from ``request.data``.
+    """
+    authentication = CachedJWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authenticated; csrf_exempt() would make the view sync on Django 4.2
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await self.authentication.aauthenticate(request)
+        except (AuthenticationFailed, InvalidToken) as exc:
+            return error(exc.detail, 401)
+        if auth is None:
+            return error('Authentication credentials were not provided.', 401)
+        request.user = auth[0]
+
+        request.data = {}
+        if request.body:
+            try:
+                request.data = orjson.loads(request.body)
+            except orjson.JSONDecodeError as exc:
+                return error(f'JSON parse error - {exc}', 400)
+            if not isinstance(request.data, dict):
+                return error('Expected a JSON object.', 400)
+
+        with tenant_scope(tenant_of(request.user)):
+            return await super().dispatch(request, *args, **kwargs)
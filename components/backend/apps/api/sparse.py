@@ -0,0 +1,54 @@
+"""
+Sparse field selection
+
+``?fields=id,phone,status`` limits a response to the named fields and the
+query to the columns behind them. Unknown names are ignored.
+"""
+from rest_framework import serializers
+
+
+def requested_fields(request):
+    """Field names from ``?fields=``, or None when all fields are wanted"""
+    if request is None:
+        return None
+    value = request.query_params.get('fields', '')
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    """ModelSerializer that drops fields not listed in the request's ``fields``"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = requested_fields(self.context.get('request'))
+        if names:
+            for name in set(self.fields) - set(names):
+                self.fields.pop(name)
+
+
+class SparseFieldsMixin:
+    """
+    Viewset mixin loading only the columns the sparse serializer needs.
+
+    Columns named in ``keyset_ordering`` are always loaded, so the paginator
+    can read the cursor position without deferred-field queries.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        names = requested_fields(self.request)
+        if not names or self.action not in ('list', 'retrieve'):
+            return queryset
+
+        model = queryset.model
+        concrete = {f.name for f in model._meta.concrete_fields}
+        declared = self.get_serializer_class()._declared_fields
+        columns = set()
+        for name in names:
+            source = getattr(declared.get(name), 'source', None) or name
+            column = source.split('.')[0]
+            if column in concrete:
+                columns.add(column)
+        columns.update(f.lstrip('-') for f in getattr(self, 'keyset_ordering', ()))
+        return queryset.only(model._meta.pk.name, *columns)
@@ -0,0 +1,90 @@
+"""
+N+1 guards for the list endpoints
+
+Each list is fetched with a small and a bigger page; the bigger page must
+not run more queries.
+"""
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.calls.models import Call
+from apps.campaigns.models import Campaign
+from apps.contacts.models import Contact
+from apps.queues.models import Queue
+from apps.users.models import Organization, User
+from .testing import assert_queries_constant
+
+
+class ListQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Acme', slug='acme', email='ops@acme.test')
+        cls.manager = User.objects.create_user(
+            email='manager@acme.test',
+            password='secret',
+            role=User.Role.MANAGER,
+            organization=cls.organization,
+        )
+        cls.queue = Queue.objects.create(name='Sales', extension='2000', organization=cls.organization)
+        cls.campaign = Campaign.objects.create(name='Spring', organization=cls.organization, queue=cls.queue)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.created = 0
+
+    def _next(self):
+        self.created += 1
+        return self.created
+
+    def test_users_list(self):
+        def populate(n):
+            for _ in range(n):
+                User.objects.create_user(
+                    email=f'agent{self._next()}@acme.test',
+                    password='secret',
+                    organization=self.organization,
+                )
+
+        assert_queries_constant(self.client, '/api/auth/users/', populate)
+
+    def test_calls_list(self):
+        def populate(n):
+            agent = User.objects.create_user(
+                email=f'caller{self._next()}@acme.test',
+                password='secret',
+                organization=self.organization,
+            )
+            Call.objects.bulk_create(
+                Call(
+                    organization=self.organization,
+                    campaign=self.campaign,
+                    queue=self.queue,
+                    agent=agent,
+                    unique_id=f'call-{self._next()}',
+                    direction=Call.Direction.INBOUND,
+                    status=Call.Status.COMPLETED,
+                    caller_id='5550100',
+                    destination='2000',
+                    start_time=timezone.now(),
+                )
+                for _ in range(n)
+            )
+
+        assert_queries_constant(self.client, '/api/calls/', populate)
+
+    def test_contacts_list(self):
+        def populate(n):
+            Contact.objects.bulk_create(
+                Contact(
+                    organization=self.organization,
+                    first_name='Ada',
+                    last_name=f'Lovelace {self._next()}',
+                    phone=f'555{self.created:04d}',
+                )
+                for _ in range(n)
+            )
+
+        assert_queries_constant(self.client, '/api/contacts/', populate)
@@ -0,0 +1,58 @@
+"""
+Query-count assertions for API tests
+
+    from apps.api.testing import assert_max_queries, assert_queries_constant
+
+    with assert_max_queries(3):
+        client.get('/api/calls/')
+
+    # Fails when the list runs more queries for a bigger page (an N+1)
+    assert_queries_constant(client, '/api/auth/users/', populate=lambda n: UserFactory.create_batch(n))
+"""
+from contextlib import contextmanager
+
+from .queries import QueryRecorder
+
+
+def _describe(recorder):
+    lines = [f'{recorder.count} queries, {recorder.duration * 1000:.1f}ms']
+    for sql, times in sorted(recorder.duplicates.items(), key=lambda item: -item[1]):
+        lines.append(f'  {times}x {sql}')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_max_queries(limit, using=None):
+    """Fail when the block runs more than ``limit`` queries"""
+    with QueryRecorder(using) as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise AssertionError(f'Expected at most {limit} queries, got {_describe(recorder)}')
+
+
+def assert_queries_constant(client, url, populate, sizes=(1, 10), **extra):
+    """
+    Fail when GET ``url`` runs more queries as the page grows.
+
+    ``populate(n)`` must add ``n`` more rows to the list; it's called
+    before each request so the page holds ``sizes[i]`` rows, which must
+    fit in one page.
+    """
+    counts = []
+    created = 0
+    for size in sizes:
+        populate(size - created)
+        created = size
+        with QueryRecorder() as recorder:
+            response = client.get(url, **extra)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {url} returned {response.status_code}')
+        counts.append((size, recorder))
+
+    (first_size, first), *rest = counts
+    for size, recorder in rest:
+        if recorder.count > first.count:
+            raise AssertionError(
+                f'GET {url} ran {first.count} queries for {first_size} rows but '
+                f'{_describe(recorder)} for {size} rows'
+            )
@@ -4,24 +4,35 @@ API URLs - Central routing for all apps
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-# Import viewsets from each app (will be created)
-# from apps.campaigns.views import CampaignViewSet
-# from apps.contacts.views import ContactViewSet
-# from apps.calls.views import CallViewSet
-# from apps.agents.views import AgentStatusViewSet
-# from apps.queues.views import QueueViewSet
-# from apps.reports.views import ReportViewSet
+from apps.agents.views import AgentStateView, AgentStatusViewSet
+from apps.api.health import DatabaseHealthView
+from apps.campaigns.views import CampaignClaimView, CampaignStatsView, CampaignViewSet
+from apps.calls.views import CallViewSet
+from apps.contacts.views import ContactStatusView, ContactViewSet
+from apps.queues.views import QueueAvailabilityView, QueueViewSet, ReleaseAgentView, RouteCallView
+from apps.reports.views import ReportViewSet
+from apps.users.views import TopicGrantView
 
 router = DefaultRouter()
 
-# Register routes (uncomment when viewsets are created)
-# router.register(r'campaigns', CampaignViewSet, basename='campaign')
-# router.register(r'contacts', ContactViewSet, basename='contact')
-# router.register(r'calls', CallViewSet, basename='call')
-# router.register(r'agents', AgentStatusViewSet, basename='agent')
-# router.register(r'queues', QueueViewSet, basename='queue')
-# router.register(r'reports', ReportViewSet, basename='report')
+router.register(r'campaigns', CampaignViewSet, basename='campaign')
+router.register(r'queues', QueueViewSet, basename='queue')
+router.register(r'agents', AgentStatusViewSet, basename='agent')
+router.register(r'contacts', ContactViewSet, basename='contact')
+router.register(r'calls', CallViewSet, basename='call')
+router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('queues/<str:extension>/route/', RouteCallView.as_view(), name='queue-route'),
+    path('queues/<str:extension>/release/', ReleaseAgentView.as_view(), name='queue-release'),
+    path('health/db/', DatabaseHealthView.as_view(), name='health-db'),
+
+    # Async views for the endpoints polled by the dialer and softphones
+    path('rt/agents/me/state/', AgentStateView.as_view(), name='rt-agent-state'),
+    path('rt/queues/<int:queue_id>/availability/', QueueAvailabilityView.as_view(), name='rt-queue-availability'),
+    path('rt/campaigns/<int:campaign_id>/claim/', CampaignClaimView.as_view(), name='rt-campaign-claim'),
+    path('rt/campaigns/<int:campaign_id>/stats/', CampaignStatsView.as_view(), name='rt-campaign-stats'),
+    path('rt/contacts/<int:contact_id>/status/', ContactStatusView.as_view(), name='rt-contact-status'),
+    path('rt/ws/grant/', TopicGrantView.as_view(), name='rt-ws-grant'),
 ]
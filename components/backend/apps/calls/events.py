@@ -0,0 +1,313 @@
+"""
+Call event bus consumer (CDR writer)
+
+Dialer and telephony components append typed events to a Redis Stream.
+Each entry uses short field names to keep the stream compact:
+
+    t   event type, e.g. call.answered     ts  epoch milliseconds
+    o   organization id                    c   campaign id
+    k   contact id                         u   call unique id
+    q   queue id                           a   agent id
+    s   status / disposition               d   duration in seconds
+    x   JSON object with extra data
+
+The backend reads the stream in the `cdr` consumer group and writes call
+outcomes to Call rows. Entries are only acknowledged once their batch is
+committed, so a restart replays them instead of losing them. Entries that
+can't be decoded or applied are moved to the `<stream>:dead` stream and
+acknowledged, so one bad entry never holds back the ones behind it.
+"""
+import json
+import logging
+import socket
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
+from .models import Call
+
+logger = logging.getLogger(__name__)
+
+GROUP = 'cdr'
+
+# Entries read per XREADGROUP and how long to block waiting for them
+BATCH_SIZE = 200
+BLOCK_MS = 5000
+
+# Entries pending longer than this on a dead consumer are taken over
+CLAIM_IDLE_MS = 60 * 1000
+
+# Seconds between attempts to reach an unreachable event bus, doubling up to the maximum
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 30
+
+# Rejected entries are kept for inspection, up to about this many
+DEAD_LETTER_MAXLEN = 10000
+
+# Failures worth retrying the batch for; anything else is a bad entry
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, redis.ConnectionError, redis.TimeoutError)
+
+FIELDS = {
+    't': 'type', 'ts': 'timestamp', 'o': 'organization_id', 'c': 'campaign_id',
+    'k': 'contact_id', 'u': 'call_id', 'q': 'queue_id', 'a': 'agent_id',
+    's': 'status', 'd': 'duration',
+}
+INTEGER_FIELDS = {'organization_id', 'campaign_id', 'contact_id', 'queue_id', 'agent_id'}
+
+CALL_ORIGINATED = 'call.originated'
+CALL_ANSWERED = 'call.answered'
+CALL_COMPLETED = 'call.completed'
+CALL_FAILED = 'call.failed'
+
+FAILED_STATUSES = {
+    'busy': Call.Status.BUSY,
+    'no_answer': Call.Status.NO_ANSWER,
+    'cancelled': Call.Status.CANCELLED,
+}
+
+
+def events_client():
+    return redis.Redis.from_url(settings.EVENTS_REDIS_URL, decode_responses=True)
+
+
+def decode(fields):
+    """Event dict from a stream entry's compact fields"""
+    event = json.loads(fields['x']) if fields.get('x') else {}
+    for short, name in FIELDS.items():
+        value = fields.get(short)
+        if value is None or value == '':
+            continue
+        if name in INTEGER_FIELDS:
+            value = int(value)
+        elif name == 'timestamp':
+            value = datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+        elif name == 'duration':
+            value = timedelta(seconds=float(value))
+        event[name] = value
+    return event
+
+
+def _new_call(event, campaign_organizations):
+    organization_id = event.get('organization_id') or campaign_organizations.get(event.get('campaign_id'))
+    if organization_id is None:
+        return None
+
+    return Call(
+        unique_id=event['call_id'],
+        direction=Call.Direction.OUTBOUND,
+        status=Call.Status.INITIATED,
+        caller_id=event.get('caller_id', ''),
+        destination=event.get('phone_number', ''),
+        organization_id=organization_id,
+        campaign_id=event.get('campaign_id'),
+        contact_id=event.get('contact_id'),
+        queue_id=event.get('queue_id'),
+        start_time=event.get('timestamp') or timezone.now(),
+    )
+
+
+def _apply(call, event):
+    """Fold one event into a Call; returns False when it doesn't concern the CDR"""
+    at = event.get('timestamp') or timezone.now()
+    event_type = event['type']
+
+    if event.get('agent_id'):
+        call.agent_id = event['agent_id']
+    if event.get('queue_id'):
+        call.queue_id = event['queue_id']
+
+    if event_type == CALL_ANSWERED:
+        call.status = Call.Status.ANSWERED
+        call.answer_time = at
+        call.wait_time = at - call.start_time
+    elif event_type == CALL_COMPLETED:
+        call.status = Call.Status.COMPLETED
+        call.end_time = at
+        call.duration = event.get('duration') or at - call.start_time
+        if call.answer_time:
+            call.talk_time = at - call.answer_time
+    elif event_type == CALL_FAILED:
+        call.status = FAILED_STATUSES.get(event.get('status', ''), Call.Status.FAILED)
+        call.end_time = at
+        call.duration = at - call.start_time
+        call.hangup_cause = event.get('hangup_cause', '')
+    else:
+        return False
+    return True
+
+
+UPDATE_FIELDS = [
+    'status', 'agent', 'queue', 'answer_time', 'end_time', 'duration',
+    'talk_time', 'wait_time', 'hangup_cause', 'updated_at',
+]
+
+
+def write_cdrs(events):
+    """Apply a batch of call events to Call rows; returns the number of calls touched"""
+    from apps.campaigns.models import Campaign
+    from apps.queues.accumulators import FINAL_STATUSES, record_call_completion
+
+    events = [e for e in events if e.get('call_id') and e.get('type', '').startswith('call.')]
+    if not events:
+        return 0
+
+    with transaction.atomic():
+        calls = {
+            c.unique_id: c
+            for c in Call.objects.select_for_update().filter(unique_id__in={e['call_id'] for e in events})
+        }
+
+        originated = [e for e in events if e['call_id'] not in calls and e['type'] == CALL_ORIGINATED]
+        campaign_organizations = dict(
+            Campaign.objects
+            .filter(id__in={e['campaign_id'] for e in originated if e.get('campaign_id')})
+            .values_list('id', 'organization_id')
+        ) if originated else {}
+
+        created = []
+        for event in originated:
+            if event['call_id'] not in calls:
+                call = _new_call(event, campaign_organizations)
+                if call is not None:
+                    calls[call.unique_id] = call
+                    created.append(call)
+        if created:
+            Call.objects.bulk_create(created, ignore_conflicts=True)
+            # Reload so the rows have primary keys (and lose any race to another writer)
+            calls.update({
+                c.unique_id: c
+                for c in Call.objects.filter(unique_id__in=[c.unique_id for c in created])
+            })
+
+        previous = {unique_id: c.status for unique_id, c in calls.items()}
+        changed = {}
+        for event in events:
+            call = calls.get(event['call_id'])
+            if call is not None and _apply(call, event):
+                changed[call.unique_id] = call
+
+        now = timezone.now()
+        for call in changed.values():
+            # bulk_update() neither runs auto_now nor sends post_save
+            call.updated_at = now
+        Call.objects.bulk_update(changed.values(), UPDATE_FIELDS)
+
+        # Only calls that finish in this batch, so a replayed entry isn't counted twice
+        finished = [
+            c for c in changed.values()
+            if c.queue_id and c.status in FINAL_STATUSES and previous.get(c.unique_id) not in FINAL_STATUSES
+        ]
+        transaction.on_commit(lambda: [record_call_completion(c) for c in finished])
+
+    return len(changed)
+
+
+def ensure_group(client, stream=None):
+    stream = stream or settings.EVENTS_STREAM
+    try:
+        client.xgroup_create(stream, GROUP, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def dead_letter(client, stream, entry_id, fields, error):
+    """Move a rejected entry to ``<stream>:dead`` with the reason"""
+    logger.warning("Dead-lettering event %s: %s", entry_id, error)
+    client.xadd(
+        f'{stream}:dead',
+        {**fields, 'entry_id': entry_id, 'group': GROUP, 'error': str(error)[:500]},
+        maxlen=DEAD_LETTER_MAXLEN,
+        approximate=True,
+    )
+
+
+def _process(client, stream, entries):
+    decoded, rejected = [], []
+    for entry_id, fields in entries:
+        # Trimmed entries come back without fields; they are only acknowledged
+        if not fields:
+            continue
+        try:
+            decoded.append((entry_id, fields, decode(fields)))
+        except (ValueError, TypeError, KeyError) as e:
+            rejected.append((entry_id, fields, e))
+
+    try:
+        written = write_cdrs([event for _, _, event in decoded])
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception:
+        # Find the offending entries; writes are idempotent, so redoing the good ones is safe
+        logger.exception("CDR batch failed; applying its events one by one")
+        written = 0
+        for entry_id, fields, event in decoded:
+            try:
+                written += write_cdrs([event])
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                rejected.append((entry_id, fields, e))
+
+    for entry_id, fields, error in rejected:
+        dead_letter(client, stream, entry_id, fields, error)
+    client.xack(stream, GROUP, *[entry_id for entry_id, _ in entries])
+    logger.debug("Acknowledged %s events, %s calls written, %s rejected", len(entries), written, len(rejected))
+
+
+def consume(consumer=None, batch_size=BATCH_SIZE, block_ms=BLOCK_MS, once=False):
+    """Run the CDR writer loop"""
+    client = events_client()
+    stream = settings.EVENTS_STREAM
+    consumer = consumer or socket.gethostname()
+    ensure_group(client, stream)
+
+    # Our own unacknowledged entries first (from before a restart), then new ones
+    cursor = '0'
+    last_claim = 0
+    delay = RECONNECT_DELAY
+    while True:
+        try:
+            if time.monotonic() - last_claim > CLAIM_IDLE_MS / 1000:
+                last_claim = time.monotonic()
+                # Take over what crashed consumers left behind
+                claimed = client.xautoclaim(stream, GROUP, consumer, CLAIM_IDLE_MS, count=batch_size)[1]
+                if claimed:
+                    cursor = '0'
+                    continue
+
+            response = client.xreadgroup(GROUP, consumer, {stream: cursor}, count=batch_size, block=block_ms)
+        except (redis.ConnectionError, redis.TimeoutError):
+            logger.warning("Event bus unreachable; retrying in %s seconds", delay, exc_info=True)
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            cursor = '0'
+            continue
+        except redis.ResponseError as e:
+            if 'NOGROUP' not in str(e):
+                raise
+            # The stream is gone, e.g. Redis restarted without persistence
+            ensure_group(client, stream)
+            cursor = '0'
+            continue
+        delay = RECONNECT_DELAY
+        entries = response[0][1] if response else []
+
+        if not entries:
+            if cursor == '0':
+                cursor = '>'
+                continue
+            if once:
+                return
+            continue
+
+        try:
+            _process(client, stream, entries)
+        except Exception:
+            logger.exception("CDR writer failed on a batch; it will be retried")
+            cursor = '0'
+            time.sleep(1)
@@ -0,0 +1,23 @@
+"""
+Run the CDR writer on the call event bus
+"""
+from django.core.management.base import BaseCommand
+
+from apps.calls.events import BATCH_SIZE, consume
+
+
+class Command(BaseCommand):
+    help = 'Consume call events from the Redis Streams bus and write CDRs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Consumer name within the group (defaults to the hostname)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--once', action='store_true', help='Stop when the stream is drained')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Consuming call events...')
+        consume(
+            consumer=options['consumer'],
+            batch_size=options['batch_size'],
+            once=options['once'],
+        )
@@ -4,6 +4,8 @@ Call models
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class Call(models.Model):
     """Call record (CDR)"""
@@ -62,15 +64,24 @@ class Call(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Call')
         verbose_name_plural = _('Calls')
+        default_manager_name = 'unscoped'
         ordering = ['-start_time']
         indexes = [
             models.Index(fields=['unique_id']),
             models.Index(fields=['caller_id']),
             models.Index(fields=['start_time']),
             models.Index(fields=['agent', 'start_time']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['organization', '-start_time', 'id'], name='call_list_order_idx'),
+            models.Index(fields=['organization', 'status', 'start_time'], name='call_org_status_idx'),
+            models.Index(fields=['organization', 'agent', 'start_time'], name='call_org_agent_idx'),
+            models.Index(fields=['organization', 'campaign', 'start_time'], name='call_org_campaign_idx'),
         ]
     
     def __str__(self):
@@ -0,0 +1,20 @@
+"""
+Serializers for calls app
+"""
+from apps.api.sparse import SparseFieldsSerializer
+from .models import Call
+
+
+class CallSerializer(SparseFieldsSerializer):
+    """Call record serializer; supports ?fields= selection"""
+    
+    class Meta:
+        model = Call
+        fields = [
+            'id', 'unique_id', 'channel', 'direction', 'status', 'caller_id',
+            'destination', 'organization', 'campaign', 'contact', 'agent',
+            'queue', 'disposition', 'notes', 'start_time', 'answer_time',
+            'end_time', 'duration', 'talk_time', 'wait_time', 'recording_url',
+            'hangup_cause', 'data', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,38 @@
+"""
+Views for calls app
+"""
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, permissions, viewsets
+
+from apps.api.fastpath import FastListMixin
+from apps.api.pagination import KeysetPagination
+from apps.api.sparse import SparseFieldsMixin
+from apps.users.tenancy import TenantScopedMixin
+from omnivoip.db_router import ReplicaReadMixin
+from .models import Call
+from .serializers import CallSerializer
+
+
+class CallViewSet(TenantScopedMixin, ReplicaReadMixin, FastListMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Call records (CDR), newest first.
+    
+    Rows are written by the CDR writer from the event bus, so the API is
+    read-only and served from the read replica. Lists are keyset paginated.
+    """
+    queryset = Call.objects.all()
+    serializer_class = CallSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-start_time', 'id')
+    # The keyset ordering is fixed, so no OrderingFilter
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = {
+        'status': ['exact'],
+        'direction': ['exact'],
+        'campaign': ['exact'],
+        'agent': ['exact'],
+        'queue': ['exact'],
+        'start_time': ['gte', 'lt'],
+    }
+    search_fields = ['unique_id', 'caller_id', 'destination']
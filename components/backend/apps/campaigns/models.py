@@ -4,6 +4,8 @@ Campaign models
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class Campaign(models.Model):
     """Campaign model for outbound/inbound campaigns"""
@@ -47,10 +49,18 @@ class Campaign(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, related_name='created_campaigns')
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Campaign')
         verbose_name_plural = _('Campaigns')
+        default_manager_name = 'unscoped'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', 'status'], name='campaign_org_status_idx'),
+            models.Index(fields=['organization', '-created_at'], name='campaign_org_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_campaign_type_display()})"
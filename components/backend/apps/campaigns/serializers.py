@@ -0,0 +1,23 @@
+"""
+Serializers for campaigns app
+"""
+from rest_framework import serializers
+from .models import Campaign
+
+
+class CampaignSerializer(serializers.ModelSerializer):
+    """Campaign serializer"""
+    
+    class Meta:
+        model = Campaign
+        fields = [
+            'id', 'name', 'description', 'campaign_type', 'status',
+            'organization', 'queue', 'start_date', 'end_date',
+            'max_calls_per_contact', 'retry_delay', 'dialer_enabled',
+            'dialer_ratio', 'total_contacts', 'called_contacts',
+            'successful_calls', 'created_by', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'total_contacts', 'called_contacts', 'successful_calls',
+            'created_by', 'created_at', 'updated_at'
+        ]
@@ -3,9 +3,23 @@ from celery import shared_task
 from django.utils import timezone
 
 
+def publish_campaign_state(campaign):
+    """Update the live state stream of the campaign's WebSocket consumers"""
+    from apps.api.live_state import publish_state
+    
+    publish_state(f'campaign_{campaign.id}', 'campaign_update', {
+        'status': campaign.status,
+        'total_contacts': campaign.total_contacts,
+        'called_contacts': campaign.called_contacts,
+        'successful_calls': campaign.successful_calls,
+    })
+
+
 @shared_task
 def update_campaign_statistics(campaign_id=None):
     """Update campaign statistics"""
+    from apps.calls.models import Call
+    from omnivoip.db_router import use_replica
     from .models import Campaign
     
     if campaign_id:
@@ -13,19 +27,24 @@ def update_campaign_statistics(campaign_id=None):
     else:
         campaigns = Campaign.objects.filter(status=Campaign.Status.ACTIVE)
     
+    # Counting runs on the replica so it never competes with dialing writes
+    with use_replica():
+        campaigns = list(campaigns)
+        for campaign in campaigns:
+            # Update statistics from calls
+            calls = Call.objects.filter(campaign=campaign)
+            campaign.total_contacts = campaign.contacts.count()
+            campaign.called_contacts = calls.values('contact').distinct().count()
+            campaign.successful_calls = calls.filter(
+                disposition__is_successful=True
+            ).count()
+            # Only the counters: the rest of the row may be newer on the primary
+            campaign.save(update_fields=['total_contacts', 'called_contacts', 'successful_calls', 'updated_at'])
+    
     for campaign in campaigns:
-        # Update statistics from calls
-        from apps.calls.models import Call
-        
-        calls = Call.objects.filter(campaign=campaign)
-        campaign.total_contacts = campaign.contacts.count()
-        campaign.called_contacts = calls.values('contact').distinct().count()
-        campaign.successful_calls = calls.filter(
-            disposition__is_successful=True
-        ).count()
-        campaign.save()
+        publish_campaign_state(campaign)
     
-    return f"Updated {campaigns.count()} campaigns"
+    return f"Updated {len(campaigns)} campaigns"
 
 
 @shared_task
@@ -38,6 +57,7 @@ def start_campaign(campaign_id):
         campaign.status = Campaign.Status.ACTIVE
         campaign.start_date = timezone.now()
         campaign.save()
+        publish_campaign_state(campaign)
         
         # Trigger dialer if enabled
         if campaign.dialer_enabled:
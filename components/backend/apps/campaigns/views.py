@@ -0,0 +1,107 @@
+"""
+Views for campaigns app
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import permissions, viewsets
+
+from apps.agents.presence import available_key
+from apps.api.conditional import ConditionalGetMixin
+from apps.api.realtime import AsyncAPIView, aredis, error, json_response
+from apps.contacts.models import Contact, ContactCampaign
+from apps.users.tenancy import TenantScopedMixin
+from .models import Campaign
+from .serializers import CampaignSerializer
+
+
+MAX_CLAIM = 100
+
+
+def claim_key(contact_id):
+    return f'dialer:claim:{contact_id}'
+
+
+class CampaignViewSet(TenantScopedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Campaign CRUD operations; GETs honour If-None-Match"""
+    queryset = Campaign.objects.all()
+    serializer_class = CampaignSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['status', 'campaign_type', 'queue', 'dialer_enabled']
+    search_fields = ['name', 'description']
+    ordering_fields = ['created_at', 'name', 'status']
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer, created_by=self.request.user)
+
+
+class CampaignClaimView(AsyncAPIView):
+    """
+    Claim contacts of an active campaign for dialing (async, /api/rt/).
+    
+    POST {"limit": 10} returns up to ``limit`` dialable contacts in dialing
+    order. Each is held in Redis for DIALER_CLAIM_SECONDS, so concurrent
+    dialers never get the same contact, and the attempt is counted.
+    """
+    
+    async def post(self, request, campaign_id):
+        limit = request.data.get('limit', 10)
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_CLAIM:
+            return error(f'limit must be an integer between 1 and {MAX_CLAIM}.', 400)
+        
+        campaign = await Campaign.objects.filter(id=campaign_id).values('status', 'max_calls_per_contact').afirst()
+        if campaign is None:
+            return error('Not found.', 404)
+        if campaign['status'] != Campaign.Status.ACTIVE:
+            return json_response({'campaign_id': campaign_id, 'contacts': []})
+        
+        now = timezone.now()
+        hold = settings.DIALER_CLAIM_SECONDS
+        candidates = (
+            ContactCampaign.objects
+            .filter(
+                Q(next_attempt__isnull=True) | Q(next_attempt__lte=now),
+                Q(last_attempt__isnull=True) | Q(last_attempt__lte=now - timedelta(seconds=hold)),
+                campaign_id=campaign_id,
+                attempts__lt=campaign['max_calls_per_contact'],
+                contact__status=Contact.Status.NEW,
+                contact__do_not_call=False,
+            )
+            .order_by('-contact__priority', 'contact__created_at', 'contact_id')
+            .values_list('id', 'contact_id', 'contact__phone')[:limit]
+        )
+        rows = [row async for row in candidates]
+        
+        # SET NX decides between dialers that read the same candidates
+        pipe = aredis().pipeline()
+        for _, contact_id, _ in rows:
+            pipe.set(claim_key(contact_id), campaign_id, nx=True, ex=hold)
+        claimed = [row for row, won in zip(rows, await pipe.execute()) if won]
+        
+        if claimed:
+            await ContactCampaign.objects.filter(id__in=[row[0] for row in claimed]).aupdate(
+                attempts=F('attempts') + 1, last_attempt=now,
+            )
+        
+        return json_response({
+            'campaign_id': campaign_id,
+            'contacts': [{'id': contact_id, 'phone': phone} for _, contact_id, phone in claimed],
+        })
+
+
+class CampaignStatsView(AsyncAPIView):
+    """Campaign counters with live agent availability (async, /api/rt/)"""
+    
+    async def get(self, request, campaign_id):
+        campaign = await Campaign.objects.filter(id=campaign_id).values(
+            'status', 'queue_id', 'total_contacts', 'called_contacts', 'successful_calls', 'updated_at',
+        ).afirst()
+        if campaign is None:
+            return error('Not found.', 404)
+        
+        queue_id = campaign['queue_id']
+        available = await aredis().scard(available_key(queue_id)) if queue_id else 0
+        
+        return json_response({'campaign_id': campaign_id, **campaign, 'available_agents': available})
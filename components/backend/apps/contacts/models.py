@@ -4,6 +4,8 @@ Contact models
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class Contact(models.Model):
     """Contact/Lead model"""
@@ -45,6 +47,7 @@ class Contact(models.Model):
     campaigns = models.ManyToManyField('campaigns.Campaign', through='ContactCampaign', related_name='contacts')
     
     # Metadata
+    priority = models.IntegerField(default=0, verbose_name=_('Priority'))
     do_not_call = models.BooleanField(default=False, verbose_name=_('Do not call'))
     last_contacted = models.DateTimeField(null=True, blank=True, verbose_name=_('Last contacted'))
     assigned_to = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_contacts')
@@ -52,14 +55,20 @@ class Contact(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Contact')
         verbose_name_plural = _('Contacts')
+        default_manager_name = 'unscoped'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['phone']),
             models.Index(fields=['email']),
             models.Index(fields=['organization', 'status']),
+            models.Index(fields=['organization', 'phone'], name='contact_org_phone_idx'),
+            models.Index(fields=['organization', '-priority', 'created_at', 'id'], name='contact_dial_order_idx'),
         ]
     
     def __str__(self):
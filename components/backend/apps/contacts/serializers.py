@@ -0,0 +1,20 @@
+"""
+Serializers for contacts app
+"""
+from apps.api.sparse import SparseFieldsSerializer
+from .models import Contact
+
+
+class ContactSerializer(SparseFieldsSerializer):
+    """Contact serializer; supports ?fields= selection"""
+    
+    class Meta:
+        model = Contact
+        fields = [
+            'id', 'organization', 'first_name', 'last_name', 'email', 'phone',
+            'phone_2', 'phone_3', 'company', 'job_title', 'address', 'city',
+            'state', 'country', 'postal_code', 'status', 'source', 'notes',
+            'tags', 'custom_fields', 'priority', 'do_not_call', 'last_contacted',
+            'assigned_to', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,61 @@
+"""
+Views for contacts app
+"""
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, permissions, viewsets
+
+from apps.api.conditional import ConditionalGetMixin, abump_version
+from apps.api.fastpath import FastListMixin
+from apps.api.pagination import KeysetPagination
+from apps.api.realtime import AsyncAPIView, error, json_response
+from apps.api.sparse import SparseFieldsMixin
+from apps.users.tenancy import TenantScopedMixin
+from .models import Contact
+from .serializers import ContactSerializer
+
+
+class ContactViewSet(TenantScopedMixin, ConditionalGetMixin, FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    """
+    Contact CRUD operations.
+    
+    Lists are keyset paginated in dialing order (highest priority first,
+    then oldest); ``campaign_id`` limits them to one campaign's contacts.
+    """
+    queryset = Contact.objects.all()
+    serializer_class = ContactSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-priority', 'created_at', 'id')
+    # The keyset ordering is fixed, so no OrderingFilter
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['status', 'do_not_call', 'assigned_to']
+    search_fields = ['first_name', 'last_name', 'phone', 'email', 'company']
+    
+    def get_queryset(self):
+        """Limit to one campaign's contacts with ``campaign_id``"""
+        queryset = super().get_queryset()
+        
+        campaign_id = self.request.query_params.get('campaign_id')
+        if campaign_id and campaign_id.isdigit():
+            queryset = queryset.filter(contactcampaign__campaign_id=campaign_id)
+        
+        return queryset
+
+
+class ContactStatusView(AsyncAPIView):
+    """Set a contact's status, e.g. from the dialer (async, /api/rt/)"""
+    
+    async def post(self, request, contact_id):
+        status = request.data.get('status')
+        if status not in Contact.Status.values:
+            return error(f'"{status}" is not a valid status.', 400)
+        
+        now = timezone.now()
+        updated = await Contact.objects.filter(id=contact_id).aupdate(status=status, updated_at=now)
+        if not updated:
+            return error('Not found.', 404)
+        # update() sends no signals
+        await abump_version(Contact, [contact_id])
+        
+        return json_response({'id': contact_id, 'status': status, 'updated_at': now})
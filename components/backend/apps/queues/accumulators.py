@@ -0,0 +1,281 @@
+"""
+Streaming queue statistics accumulators
+
+Every completed queue call is folded into a per-queue, per-day Redis hash
+(running sums, maxima, service level counter and a wait-time histogram).
+flush_accumulators() upserts those hashes into QueueStatistics, so the
+statistics never require scanning Call rows.
+
+Touched accumulators are listed in a "dirty" set. A flush first moves
+that set to a "flushing" set and only removes members from it once their
+rows are written, so a failed or interrupted flush is picked up again by
+the next one and completions recorded meanwhile stay in the dirty set.
+Flushed rows are pushed to the queue_ groups and, for today, the
+dashboard stream of the queue's organization.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from apps.api.broadcast import broadcast_many
+from apps.api.live_state import dashboard_group, publish_state
+from apps.calls.models import Call
+from .models import Queue, QueueStatistics
+
+
+logger = logging.getLogger(__name__)
+
+
+KEY_PREFIX = 'queue_stats'
+DIRTY_KEY = f'{KEY_PREFIX}:dirty'
+FLUSHING_KEY = f'{KEY_PREFIX}:flushing'
+
+# Accumulators outlive their day so late completions can still be flushed.
+# Calls from older days are ignored: their "seen" set may be gone, and a
+# fresh accumulator would overwrite the day's QueueStatistics row.
+ACCUMULATOR_DAYS = 3
+ACCUMULATOR_TTL = ACCUMULATOR_DAYS * 24 * 60 * 60
+
+# Upper bounds (seconds) of the wait-time histogram buckets; the last bucket is open ended
+WAIT_BUCKETS = (5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300)
+OVERFLOW_BUCKET = 'inf'
+
+FINAL_STATUSES = (
+    Call.Status.COMPLETED,
+    Call.Status.BUSY,
+    Call.Status.NO_ANSWER,
+    Call.Status.FAILED,
+    Call.Status.CANCELLED,
+)
+ABANDONED_STATUSES = (Call.Status.NO_ANSWER, Call.Status.CANCELLED)
+
+FLUSH_BATCH_SIZE = 500
+
+# Records one completion atomically. The per-day "seen" set makes repeated
+# post_save signals for the same call a no-op; the talk time is tracked
+# separately ("t:" members) since it may only be known on a later save.
+_RECORD_SCRIPT = """
+local talk_ms = tonumber(ARGV[5])
+local new_call = redis.call('SADD', KEYS[2], ARGV[1]) == 1
+local new_talk = talk_ms >= 0 and redis.call('SADD', KEYS[2], 't:' .. ARGV[1]) == 1
+if not new_call and not new_talk then
+    return 0
+end
+redis.call('EXPIRE', KEYS[2], ARGV[9])
+if new_call then
+    redis.call('HINCRBY', KEYS[1], 'total_calls', 1)
+    redis.call('HINCRBY', KEYS[1], 'answered_calls', ARGV[2])
+    redis.call('HINCRBY', KEYS[1], 'abandoned_calls', ARGV[3])
+    redis.call('HINCRBY', KEYS[1], 'calls_within_sl', ARGV[6])
+    local wait_ms = tonumber(ARGV[4])
+    if wait_ms >= 0 then
+        redis.call('HINCRBY', KEYS[1], 'wait_ms_sum', wait_ms)
+        redis.call('HINCRBY', KEYS[1], 'wait_count', 1)
+        redis.call('HINCRBY', KEYS[1], 'h:' .. ARGV[7], 1)
+        local max_wait = tonumber(redis.call('HGET', KEYS[1], 'max_wait_ms') or '-1')
+        if wait_ms > max_wait then
+            redis.call('HSET', KEYS[1], 'max_wait_ms', wait_ms)
+        end
+    end
+end
+if new_talk then
+    redis.call('HINCRBY', KEYS[1], 'talk_ms_sum', talk_ms)
+    redis.call('HINCRBY', KEYS[1], 'talk_count', 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[9])
+redis.call('SADD', KEYS[3], ARGV[8])
+return 1
+"""
+
+_record_script = None
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _script():
+    global _record_script
+    if _record_script is None:
+        _record_script = _redis().register_script(_RECORD_SCRIPT)
+    return _record_script
+
+
+def accumulator_key(queue_id, day):
+    return f'{KEY_PREFIX}:{queue_id}:{day.isoformat()}'
+
+
+def wait_bucket(seconds):
+    """Histogram bucket label for a wait time in seconds"""
+    for bound in WAIT_BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return OVERFLOW_BUCKET
+
+
+def _ms(duration):
+    return int(duration.total_seconds() * 1000) if duration is not None else -1
+
+
+def record_call_completion(call):
+    """
+    Fold a finished queue call into its accumulator.
+
+    A call saved again once its talk time is known only adds the talk
+    time. Returns False when the call isn't a finished queue call of the
+    last ACCUMULATOR_DAYS days or was already recorded.
+    """
+    if not call.queue_id or call.status not in FINAL_STATUSES:
+        return False
+
+    day = timezone.localdate(call.start_time)
+    if (timezone.localdate() - day).days >= ACCUMULATOR_DAYS:
+        return False
+    key = accumulator_key(call.queue_id, day)
+    answered = call.answer_time is not None
+    abandoned = not answered and call.status in ABANDONED_STATUSES
+
+    wait = call.wait_time
+    if wait is None and answered:
+        wait = call.answer_time - call.start_time
+    threshold = timedelta(seconds=settings.QUEUE_SERVICE_LEVEL_THRESHOLD)
+    within_sl = answered and wait is not None and wait <= threshold
+
+    recorded = _script()(
+        keys=[key, f'{key}:seen', DIRTY_KEY],
+        args=[
+            call.pk,
+            int(answered),
+            int(abandoned),
+            _ms(wait),
+            _ms(call.talk_time) if answered else -1,
+            int(within_sl),
+            wait_bucket(wait.total_seconds()) if wait is not None else OVERFLOW_BUCKET,
+            f'{call.queue_id}:{day.isoformat()}',
+            ACCUMULATOR_TTL,
+        ],
+    )
+    return bool(recorded)
+
+
+def _to_statistics(queue_id, day, values):
+    def number(field):
+        return int(values.get(field, 0))
+
+    wait_count = number('wait_count')
+    talk_count = number('talk_count')
+    max_wait = values.get('max_wait_ms')
+
+    histogram = {
+        field[2:]: int(count)
+        for field, count in values.items()
+        if field.startswith('h:')
+    }
+
+    return QueueStatistics(
+        queue_id=queue_id,
+        date=day,
+        total_calls=number('total_calls'),
+        answered_calls=number('answered_calls'),
+        abandoned_calls=number('abandoned_calls'),
+        avg_wait_time=timedelta(milliseconds=number('wait_ms_sum') / wait_count) if wait_count else None,
+        avg_talk_time=timedelta(milliseconds=number('talk_ms_sum') / talk_count) if talk_count else None,
+        max_wait_time=timedelta(milliseconds=int(max_wait)) if max_wait is not None else None,
+        service_level_threshold=settings.QUEUE_SERVICE_LEVEL_THRESHOLD,
+        calls_within_sl=number('calls_within_sl'),
+        wait_time_histogram=histogram,
+    )
+
+
+def _seconds(duration):
+    return round(duration.total_seconds(), 1) if duration is not None else None
+
+
+def notify_consumers(rows, organizations):
+    """
+    Push flushed QueueStatistics rows to the WebSocket consumers;
+    ``organizations`` maps each queue to its organization's dashboard.
+    """
+
+    messages = []
+    dashboards = {}
+    today = timezone.localdate()
+    for row in rows:
+        counters = {
+            'total_calls': row.total_calls,
+            'answered_calls': row.answered_calls,
+            'abandoned_calls': row.abandoned_calls,
+            'calls_within_sl': row.calls_within_sl,
+            'avg_wait_time': _seconds(row.avg_wait_time),
+            'max_wait_time': _seconds(row.max_wait_time),
+        }
+        messages.append((f'queue_{row.queue_id}', 'queue_update', {
+            'type': 'queue_statistics',
+            'queue_id': row.queue_id,
+            'date': row.date.isoformat(),
+            **counters,
+        }, f'queue_statistics:{row.queue_id}:{row.date.isoformat()}'))
+        if row.date == today:
+            dashboards.setdefault(organizations[row.queue_id], {})[str(row.queue_id)] = counters
+    try:
+        broadcast_many(messages)
+        for organization_id, queues in dashboards.items():
+            publish_state(dashboard_group(organization_id), 'dashboard_update', {'queues': queues})
+    except Exception:
+        logger.exception("Could not push queue statistics to the WebSocket consumers")
+
+
+def flush_accumulators(batch_size=FLUSH_BATCH_SIZE):
+    """Upsert every accumulator touched since the last flush into QueueStatistics"""
+    client = _redis()
+    flushed = 0
+
+    # Take over the dirty set, keeping whatever a previous flush left behind
+    pipe = client.pipeline()
+    pipe.sunionstore(FLUSHING_KEY, [FLUSHING_KEY, DIRTY_KEY])
+    pipe.delete(DIRTY_KEY)
+    pipe.execute()
+
+    while True:
+        members = client.srandmember(FLUSHING_KEY, batch_size)
+        if not members:
+            break
+
+        targets = []
+        for member in members:
+            queue_id, day = member.decode().split(':')
+            targets.append((int(queue_id), date.fromisoformat(day)))
+
+        pipe = client.pipeline(transaction=False)
+        for queue_id, day in targets:
+            pipe.hgetall(accumulator_key(queue_id, day))
+        snapshots = pipe.execute()
+
+        organizations = dict(
+            Queue.unscoped.filter(id__in={q for q, _ in targets}).values_list('id', 'organization_id')
+        )
+        rows = [
+            _to_statistics(queue_id, day, {k.decode(): v.decode() for k, v in values.items()})
+            for (queue_id, day), values in zip(targets, snapshots)
+            if values and queue_id in organizations
+        ]
+
+        QueueStatistics.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['queue', 'date'],
+            update_fields=[
+                'total_calls', 'answered_calls', 'abandoned_calls',
+                'avg_wait_time', 'avg_talk_time', 'max_wait_time',
+                'service_level_threshold', 'calls_within_sl',
+                'wait_time_histogram',
+            ],
+        )
+        client.srem(FLUSHING_KEY, *members)
+        flushed += len(rows)
+        notify_consumers(rows, organizations)
+
+    return flushed
@@ -12,7 +12,7 @@ class QueueAdmin(admin.ModelAdmin):
 
 @admin.register(QueueMember)
 class QueueMemberAdmin(admin.ModelAdmin):
-    list_display = ['queue', 'agent', 'penalty', 'paused', 'calls_taken', 'last_call']
+    list_display = ['queue', 'agent', 'penalty', 'paused', 'skills', 'calls_taken', 'last_call']
     list_filter = ['paused', 'queue']
     search_fields = ['queue__name', 'agent__email']
     readonly_fields = ['calls_taken', 'last_call', 'added_at']
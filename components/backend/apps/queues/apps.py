@@ -4,3 +4,6 @@ class QueuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.queues'
     verbose_name = 'Call Queues'
+    
+    def ready(self):
+        import apps.queues.signals
@@ -0,0 +1,202 @@
+"""
+Vectorized agent-to-call matching
+
+Every unpaused member of a queue is loaded once into NumPy arrays (penalty,
+calls taken, last call time, skill bitmask). Matching a call scores the
+whole pool with array operations and claims the best available agent from
+the presence store, so the cost per call does not grow with Python loops
+over the floor.
+"""
+import threading
+import time
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from apps.agents import presence
+from apps.agents.models import AgentStatus
+from .models import Queue, QueueMember
+
+
+# Seconds a queue's member arrays are reused before reloading from the database
+POOL_TTL = 5.0
+
+# A penalty level always outranks any idle time / call count difference
+PENALTY_WEIGHT = 1e6
+
+# (idle time weight, calls taken weight, random weight) per queue strategy;
+# idle time and calls taken are normalized to [0, 1] across the pool
+STRATEGY_WEIGHTS = {
+    Queue.Strategy.LEAST_RECENT: (1.0, 0.0, 0.0),
+    Queue.Strategy.ROUND_ROBIN: (1.0, 0.0, 0.0),
+    Queue.Strategy.FEWEST_CALLS: (1e-3, 1.0, 0.0),
+    Queue.Strategy.RANDOM: (0.0, 0.0, 1.0),
+    Queue.Strategy.RING_ALL: (0.0, 0.0, 1.0),
+}
+DEFAULT_WEIGHTS = (1.0, 0.5, 0.0)
+
+# Agents that never took a call count as idle for this long
+NEVER_CALLED_IDLE = 365 * 24 * 60 * 60.0
+
+_rng = np.random.default_rng()
+
+
+class MemberPool:
+    """Array view of a queue's members"""
+
+    def __init__(self, queue_id, strategy, members):
+        self.queue_id = queue_id
+        self.strategy = strategy
+        self.loaded_at = time.monotonic()
+
+        skills = sorted({skill for m in members for skill in m['skills']})
+        # One bit per skill; a floor with more than 64 skills drops the rest
+        self.skill_bits = {skill: 1 << i for i, skill in enumerate(skills[:64])}
+
+        self.agent_ids = np.array([m['agent_id'] for m in members], dtype=np.int64)
+        self.extensions = [m['agent__extension'] for m in members]
+        self.penalty = np.array([m['penalty'] for m in members], dtype=np.float64)
+        self.calls_taken = np.array([m['calls_taken'] for m in members], dtype=np.float64)
+        self.last_call = np.array(
+            [m['last_call'].timestamp() if m['last_call'] else np.nan for m in members],
+            dtype=np.float64,
+        )
+        self.skill_mask = np.array(
+            [self.skill_mask_for(m['skills']) for m in members],
+            dtype=np.uint64,
+        )
+
+    def __len__(self):
+        return len(self.agent_ids)
+
+    @property
+    def expired(self):
+        return time.monotonic() - self.loaded_at > POOL_TTL
+
+    def skill_mask_for(self, skills):
+        mask = 0
+        for skill in skills:
+            mask |= self.skill_bits.get(skill, 0)
+        return mask
+
+    def rank(self, available_ids, required_skills=()):
+        """Indexes of eligible agents, best first"""
+        if not len(self) or not available_ids:
+            return np.empty(0, dtype=np.int64)
+
+        eligible = np.isin(self.agent_ids, np.fromiter(available_ids, dtype=np.int64))
+        if required_skills:
+            if any(skill not in self.skill_bits for skill in required_skills):
+                return np.empty(0, dtype=np.int64)
+            required = np.uint64(self.skill_mask_for(required_skills))
+            eligible &= (self.skill_mask & required) == required
+
+        candidates = np.flatnonzero(eligible)
+        if not len(candidates):
+            return candidates
+
+        idle_weight, calls_weight, random_weight = STRATEGY_WEIGHTS.get(self.strategy, DEFAULT_WEIGHTS)
+
+        idle = time.time() - self.last_call[candidates]
+        idle = np.where(np.isnan(idle), NEVER_CALLED_IDLE, idle)
+        calls = self.calls_taken[candidates]
+
+        score = -PENALTY_WEIGHT * self.penalty[candidates]
+        if idle_weight:
+            score += idle_weight * idle / max(idle.max(), 1.0)
+        if calls_weight:
+            score -= calls_weight * calls / max(calls.max(), 1.0)
+        if random_weight:
+            score += random_weight * _rng.random(len(candidates))
+
+        return candidates[np.argsort(-score, kind='stable')]
+
+    def record_call(self, index):
+        """Reflect a routed call in the arrays until the next reload"""
+        self.calls_taken[index] += 1
+        self.last_call[index] = time.time()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def load_pool(queue):
+    # Agents without an extension can't be dialed, so they never enter the pool
+    members = list(
+        QueueMember.objects
+        .filter(queue=queue, paused=False, agent__extension__isnull=False)
+        .exclude(agent__extension='')
+        .values('agent_id', 'agent__extension', 'penalty', 'calls_taken', 'last_call', 'skills')
+    )
+    return MemberPool(queue.id, queue.strategy, members)
+
+
+def get_pool(queue):
+    """Cached member pool of a queue"""
+    pool = _pools.get(queue.id)
+    if pool is None or pool.expired or pool.strategy != queue.strategy:
+        pool = load_pool(queue)
+        with _pools_lock:
+            _pools[queue.id] = pool
+    return pool
+
+
+def match_agent(queue, required_skills=()):
+    """
+    Pick and reserve the best available agent for an answered call.
+
+    Returns (agent_id, extension) or None when nobody is eligible. The agent
+    is removed from the queue's availability set atomically, so concurrent
+    calls never get the same agent.
+    """
+    pool = get_pool(queue)
+    available = presence.available_agents(queue.id)
+
+    for index in pool.rank(available, required_skills):
+        agent_id = int(pool.agent_ids[index])
+        # SREM only succeeds for one caller; losing the race means trying the next agent
+        if not presence.claim(queue.id, agent_id):
+            continue
+
+        pool.record_call(index)
+        presence.set_state(agent_id, AgentStatus.State.BUSY, queue_id=queue.id)
+        QueueMember.objects.filter(queue=queue, agent_id=agent_id).update(
+            calls_taken=F('calls_taken') + 1,
+            last_call=timezone.now(),
+        )
+        return agent_id, pool.extensions[index]
+
+    return None
+
+
+def release_agent(queue, extension):
+    """
+    Undo match_agent() for a routed call the agent never answered.
+
+    The agent only goes back to AVAILABLE while still holding the
+    reservation (BUSY on this queue, no call), so a state the agent set
+    meanwhile wins. Returns the released agent id or None.
+    """
+    agent_id = (
+        QueueMember.objects
+        .filter(queue=queue, agent__extension=extension)
+        .values_list('agent_id', flat=True)
+        .first()
+    )
+    if agent_id is None:
+        return None
+
+    state = presence.get_state(agent_id)
+    reserved = (
+        state is not None
+        and state['state'] == AgentStatus.State.BUSY
+        and state['queue_id'] == queue.id
+        and state['call_id'] is None
+    )
+    if not reserved:
+        return None
+
+    presence.set_state(agent_id, AgentStatus.State.AVAILABLE)
+    return agent_id
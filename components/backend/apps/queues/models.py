@@ -4,6 +4,8 @@ Queue models
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class Queue(models.Model):
     """Call queue model"""
@@ -46,10 +48,17 @@ class Queue(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Queue')
         verbose_name_plural = _('Queues')
+        default_manager_name = 'unscoped'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['organization', 'name'], name='queue_org_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.extension})"
@@ -63,6 +72,7 @@ class QueueMember(models.Model):
     
     penalty = models.IntegerField(default=0, verbose_name=_('Penalty'))
     paused = models.BooleanField(default=False, verbose_name=_('Paused'))
+    skills = models.JSONField(default=list, blank=True, help_text='Skill names used by the call matcher', verbose_name=_('Skills'))
     
     # Statistics
     calls_taken = models.IntegerField(default=0, verbose_name=_('Calls taken'))
@@ -99,6 +109,9 @@ class QueueStatistics(models.Model):
     service_level_threshold = models.IntegerField(default=20, help_text='Seconds')
     calls_within_sl = models.IntegerField(default=0)
     
+    # Wait-time distribution: bucket upper bound (seconds) -> calls
+    wait_time_histogram = models.JSONField(default=dict, blank=True)
+    
     class Meta:
         verbose_name = _('Queue Statistics')
         verbose_name_plural = _('Queue Statistics')
@@ -0,0 +1,23 @@
+"""
+Serializers for queues app
+"""
+from rest_framework import serializers
+from .models import Queue
+
+
+class QueueSerializer(serializers.ModelSerializer):
+    """Queue serializer"""
+    
+    class Meta:
+        model = Queue
+        fields = [
+            'id', 'name', 'extension', 'organization', 'strategy',
+            'max_wait_time', 'max_callers', 'moh_class', 'announcement_file',
+            'periodic_announce_frequency', 'is_active', 'record_calls',
+            'total_calls', 'answered_calls', 'abandoned_calls',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'total_calls', 'answered_calls', 'abandoned_calls',
+            'created_at', 'updated_at'
+        ]
@@ -0,0 +1,40 @@
+"""
+Signal handlers for queues app
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.calls.models import Call
+from .accumulators import FINAL_STATUSES, record_call_completion
+from .models import QueueMember
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Call)
+def accumulate_queue_statistics(sender, instance, **kwargs):
+    """Feed finished queue calls into the queue statistics accumulators"""
+    if instance.queue_id and instance.status in FINAL_STATUSES:
+        transaction.on_commit(lambda: _record_completion(instance))
+
+
+def _record_completion(call):
+    # Runs after the commit, inside the caller's save(); a Redis outage must
+    # not turn an already committed save into an error
+    try:
+        record_call_completion(call)
+    except Exception:
+        logger.exception(f"Could not record call {call.pk} in the queue statistics")
+
+
+@receiver(post_save, sender=QueueMember)
+@receiver(post_delete, sender=QueueMember)
+def sync_agent_presence(sender, instance, **kwargs):
+    """Keep the presence store's queue availability sets in line with membership"""
+    from apps.agents.presence import sync_queue_membership
+    
+    agent_id = instance.agent_id
+    transaction.on_commit(lambda: sync_queue_membership(agent_id))
@@ -0,0 +1,12 @@
+"""Celery tasks for queues"""
+from celery import shared_task
+
+
+@shared_task
+def flush_queue_statistics():
+    """Upsert accumulated queue statistics into QueueStatistics"""
+    from .accumulators import flush_accumulators
+    
+    flushed = flush_accumulators()
+    
+    return f"Flushed {flushed} queue statistics rows"
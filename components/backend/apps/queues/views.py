@@ -0,0 +1,109 @@
+"""
+Views for queues app
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.agents.presence import aavailable_agents
+from apps.api.conditional import ConditionalGetMixin
+from apps.api.realtime import AsyncAPIView, error, json_response
+from apps.users.tenancy import TenantScopedMixin
+from .matching import match_agent, release_agent
+from .models import Queue
+from .serializers import QueueSerializer
+
+
+class HasDialplanKey(permissions.BasePermission):
+    """Asterisk presenting the shared dialplan key (X-Dialplan-Key header)"""
+
+    def has_permission(self, request, view):
+        if not settings.DIALPLAN_API_KEY:
+            # An empty key would let any caller through
+            raise ImproperlyConfigured('DIALPLAN_API_KEY must be set to route queue calls.')
+        return constant_time_compare(request.headers.get('X-Dialplan-Key', ''), settings.DIALPLAN_API_KEY)
+
+
+class RouteCallView(APIView):
+    """
+    Pick the agent for an answered queue call.
+
+    Called from the dialplan with CURL() as a POST, since it claims the
+    agent; ``skills`` is a comma separated list of required skills. With
+    ``plain=1`` the body is just the dial string (empty when nobody is
+    available) so it can be fed straight into Dial(). Only the dialplan
+    may call it: the queue's extension is global, so a user session
+    would reach every tenant's agents.
+    """
+    authentication_classes = []
+    permission_classes = [HasDialplanKey]
+
+    def post(self, request, extension):
+        queue = get_object_or_404(Queue, extension=extension, is_active=True)
+        params = request.data or request.query_params
+        skills = [s.strip() for s in params.get('skills', '').split(',') if s.strip()]
+
+        match = match_agent(queue, skills)
+        interface = f'PJSIP/{match[1]}' if match else ''
+
+        if params.get('plain'):
+            return HttpResponse(interface, content_type='text/plain')
+
+        if match is None:
+            return Response({'queue': queue.extension, 'agent_id': None, 'extension': None, 'interface': None})
+
+        agent_id, agent_extension = match
+        return Response({
+            'queue': queue.extension,
+            'agent_id': agent_id,
+            'extension': agent_extension,
+            'interface': interface,
+        })
+
+
+class ReleaseAgentView(APIView):
+    """
+    Hand a routed agent back when the Dial() didn't connect.
+
+    Called from the dialplan (POST, ``agent`` is the agent's extension)
+    after a failed or unanswered Dial and from the hangup handler when
+    the caller gives up while the agent rings. With ``plain=1`` the body
+    is the released agent id, empty when nothing was released.
+    """
+    authentication_classes = []
+    permission_classes = [HasDialplanKey]
+
+    def post(self, request, extension):
+        queue = get_object_or_404(Queue, extension=extension)
+        params = request.data or request.query_params
+        agent_id = release_agent(queue, params.get('agent', ''))
+
+        if params.get('plain'):
+            return HttpResponse(agent_id or '', content_type='text/plain')
+        return Response({'queue': queue.extension, 'agent_id': agent_id})
+
+
+class QueueViewSet(TenantScopedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Queue CRUD operations; GETs honour If-None-Match"""
+    queryset = Queue.objects.all()
+    serializer_class = QueueSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['is_active', 'strategy']
+    search_fields = ['name', 'extension']
+    ordering_fields = ['name', 'extension', 'created_at']
+
+
+class QueueAvailabilityView(AsyncAPIView):
+    """Available agents of a queue, from the presence store (async, /api/rt/)"""
+
+    async def get(self, request, queue_id):
+        if not await Queue.objects.filter(id=queue_id).aexists():
+            return error('Not found.', 404)
+
+        agents = sorted(await aavailable_agents(queue_id))
+        return json_response({'queue_id': queue_id, 'available': len(agents), 'agents': agents})
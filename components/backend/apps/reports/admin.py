@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Report, ReportExport
+from .models import Report, ReportExport, CallVolumeCube
 
 
 @admin.register(Report)
@@ -16,3 +16,10 @@ class ReportExportAdmin(admin.ModelAdmin):
     list_filter = ['format', 'generated_at']
     readonly_fields = ['generated_at']
     date_hierarchy = 'generated_at'
+
+
+@admin.register(CallVolumeCube)
+class CallVolumeCubeAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'hour', 'campaign', 'queue', 'agent', 'direction', 'status', 'call_count', 'answered_count']
+    list_filter = ['organization', 'direction', 'status']
+    date_hierarchy = 'hour'
@@ -4,3 +4,6 @@ class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'
     verbose_name = 'Reports & Analytics'
+    
+    def ready(self):
+        import apps.reports.signals
@@ -0,0 +1,280 @@
+"""
+Call volume cube maintenance and roll-up queries
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from apps.calls.models import Call
+from .models import CallVolumeCube, LatencySketch, RollupWatermark
+from .sketches import LatencyHistogram
+
+
+WATERMARK_NAME = 'call_volume_cube'
+
+# Reporting dimensions, in cube key order
+DIMENSIONS = ('organization', 'campaign', 'queue', 'agent', 'direction', 'status')
+FOREIGN_KEY_DIMENSIONS = ('organization', 'campaign', 'queue', 'agent')
+
+GRANULARITIES = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# CDRs committed by slow transactions may carry an updated_at slightly in the past
+REFRESH_LAG = timedelta(seconds=30)
+# Upper bound of source changes folded into the cube per refresh run
+MAX_REFRESH_WINDOW = timedelta(days=1)
+
+# Call columns feeding each latency sketch scope
+SKETCH_SCOPES = (
+    (LatencySketch.Scope.QUEUE, 'queue_id'),
+    (LatencySketch.Scope.CAMPAIGN, 'campaign_id'),
+    (LatencySketch.Scope.AGENT, 'agent_id'),
+)
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _dimension_fields(dimensions):
+    return [f'{d}_id' if d in FOREIGN_KEY_DIMENSIONS else d for d in dimensions]
+
+
+def _build_sketches(organization_id, hour, calls):
+    """Wait/handle histograms per queue, campaign and agent for one hour"""
+    sketches = {}
+    columns = [column for _, column in SKETCH_SCOPES]
+    rows = calls.order_by().values_list(*columns, 'wait_time', 'talk_time')
+
+    for row in rows.iterator(chunk_size=2000):
+        wait_time, talk_time = row[-2:]
+        for (scope, _), scope_id in zip(SKETCH_SCOPES, row):
+            if scope_id is None:
+                continue
+            entry = sketches.setdefault((scope, scope_id), [LatencyHistogram(), LatencyHistogram(), 0])
+            entry[0].add_duration(wait_time)
+            # Wrap-up isn't tracked per call, so handle time is the talk time
+            entry[1].add_duration(talk_time)
+            entry[2] += 1
+
+    return [
+        LatencySketch(
+            organization_id=organization_id,
+            scope=scope,
+            scope_id=scope_id,
+            hour=hour,
+            wait_sketch=wait.to_bytes(),
+            handle_sketch=handle.to_bytes(),
+            calls=calls,
+        )
+        for (scope, scope_id), (wait, handle, calls) in sketches.items()
+    ]
+
+
+def _lock_bucket(organization_id, hour):
+    """Serialize rebuilds of one (organization, hour) bucket until the transaction ends"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s::integer, %s::integer)',
+                [organization_id, int(hour.timestamp()) // 3600],
+            )
+
+
+def rebuild_hour(organization_id, hour):
+    """
+    Recompute the cube rows and latency sketches of one organization for one hour bucket.
+
+    Concurrent rebuilds of the same bucket (the rolling refresh, the daily
+    run, a deleted call) queue behind each other, and each reads the calls
+    only once it holds the bucket, so the last one always wins.
+    """
+    calls = Call.objects.filter(
+        organization_id=organization_id,
+        start_time__gte=hour,
+        start_time__lt=hour + timedelta(hours=1),
+    )
+    rows = (
+        calls
+        .order_by()
+        .values(*_dimension_fields(DIMENSIONS))
+        .annotate(
+            call_count=Count('id'),
+            answered_count=Count('id', filter=Q(answer_time__isnull=False)),
+            duration_sum=Sum('duration'),
+            talk_time_sum=Sum('talk_time'),
+            wait_time_sum=Sum('wait_time'),
+            wait_time_max=Max('wait_time'),
+        )
+    )
+
+    with transaction.atomic():
+        _lock_bucket(organization_id, hour)
+
+        sketches = _build_sketches(organization_id, hour, calls)
+        CallVolumeCube.objects.filter(organization_id=organization_id, hour=hour).delete()
+        created = CallVolumeCube.objects.bulk_create(
+            [CallVolumeCube(hour=hour, **row) for row in rows],
+            batch_size=1000,
+        )
+        LatencySketch.objects.filter(organization_id=organization_id, hour=hour).delete()
+        LatencySketch.objects.bulk_create(sketches, batch_size=1000)
+
+    return len(created)
+
+
+def call_bucket(call):
+    """The (organization_id, hour) bucket a call is counted in"""
+    hour = timezone.localtime(call.start_time).replace(minute=0, second=0, microsecond=0)
+    return call.organization_id, hour
+
+
+def touched_buckets(queryset):
+    """Distinct (organization_id, hour) buckets covered by a Call queryset"""
+    return (
+        queryset
+        .order_by()
+        .annotate(bucket=TruncHour('start_time'))
+        .values_list('organization_id', 'bucket')
+        .distinct()
+    )
+
+
+def rebuild_range(start, end, organization_id=None):
+    """Recompute every cube bucket in [start, end) that has calls or cube rows"""
+    calls = Call.objects.filter(start_time__gte=start, start_time__lt=end)
+    cube = CallVolumeCube.objects.filter(hour__gte=start, hour__lt=end)
+    if organization_id:
+        calls = calls.filter(organization_id=organization_id)
+        cube = cube.filter(organization_id=organization_id)
+
+    # Buckets whose calls are all gone still hold rows to clear
+    buckets = set(touched_buckets(calls))
+    buckets.update(cube.order_by().values_list('organization_id', 'hour').distinct())
+    for org_id, hour in sorted(buckets):
+        rebuild_hour(org_id, hour)
+
+    return len(buckets)
+
+
+def refresh_cube(now=None):
+    """
+    Fold CDRs written since the last run into the cube.
+
+    Buckets are rebuilt rather than incremented, so calls that are updated
+    after hangup (disposition, recording, talk time) are never double counted.
+
+    Changes are found through Call.updated_at. Writes that skip auto_now
+    (QuerySet.update(), bulk_update() without updated_at) are only picked
+    up once something else touches the bucket, so such writers must set
+    updated_at themselves or call rebuild_range(). Deleted calls leave no
+    row to find; the reports app rebuilds their bucket on post_delete.
+    """
+    until = (now or timezone.now()) - REFRESH_LAG
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if watermark:
+        since = watermark.position
+    else:
+        first_change = Call.objects.aggregate(first=Min('updated_at'))['first']
+        if first_change is None:
+            return 0
+        since = first_change - timedelta(microseconds=1)
+
+    until = min(until, since + MAX_REFRESH_WINDOW)
+    if until <= since:
+        return 0
+
+    changed = Call.objects.filter(updated_at__gt=since, updated_at__lte=until)
+    buckets = list(touched_buckets(changed))
+    for org_id, hour in buckets:
+        rebuild_hour(org_id, hour)
+
+    RollupWatermark.objects.update_or_create(
+        name=WATERMARK_NAME,
+        defaults={'position': until},
+    )
+
+    return len(buckets)
+
+
+def query_cube(organization, start, end, group_by=(), granularity=None, **filters):
+    """
+    Roll the cube up over [start, end).
+
+    ``group_by`` is any subset of DIMENSIONS and ``granularity`` one of
+    GRANULARITIES (or None for totals over the whole range). Extra keyword
+    arguments are applied as cube filters, e.g. ``campaign_id=3``.
+    """
+    unknown = set(group_by) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+    if granularity and granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    queryset = CallVolumeCube.objects.filter(
+        organization=organization,
+        hour__gte=start,
+        hour__lt=end,
+        **filters
+    )
+
+    fields = _dimension_fields(group_by)
+    if granularity:
+        queryset = queryset.annotate(period=GRANULARITIES[granularity]('hour'))
+        fields.append('period')
+
+    measures = {
+        'calls': Sum('call_count'),
+        'answered_calls': Sum('answered_count'),
+        'total_duration': Sum('duration_sum'),
+        'total_talk_time': Sum('talk_time_sum'),
+        'total_wait_time': Sum('wait_time_sum'),
+        'max_wait_time': Max('wait_time_max'),
+    }
+    if not fields:
+        return [queryset.aggregate(**measures)]
+
+    return queryset.order_by().values(*fields).annotate(**measures).order_by(*fields)
+
+
+def latency_percentiles(organization, start, end, scope, scope_id=None, quantiles=DEFAULT_QUANTILES):
+    """
+    Wait and handle time percentiles (seconds) over [start, end).
+
+    Hourly sketches are merged on read, so any range is answered without
+    touching Call rows. Without ``scope_id`` every member of the scope is
+    merged, e.g. all queues of the organization.
+    """
+    sketches = LatencySketch.objects.filter(
+        organization=organization,
+        scope=scope,
+        hour__gte=start,
+        hour__lt=end,
+    )
+    if scope_id is not None:
+        sketches = sketches.filter(scope_id=scope_id)
+
+    wait, handle, calls = LatencyHistogram(), LatencyHistogram(), 0
+    for wait_data, handle_data, count in sketches.values_list('wait_sketch', 'handle_sketch', 'calls').iterator():
+        wait.merge(LatencyHistogram.from_bytes(wait_data))
+        handle.merge(LatencyHistogram.from_bytes(handle_data))
+        calls += count
+
+    def summarize(histogram):
+        values = {}
+        for quantile in quantiles:
+            value = histogram.percentile(quantile)
+            values[f'p{quantile * 100:g}'] = round(value / 1000, 3) if value is not None else None
+        return values
+
+    return {
+        'calls': calls,
+        'wait_time': summarize(wait),
+        'handle_time': summarize(handle),
+    }
@@ -0,0 +1,272 @@
+"""
+Streaming report export engine
+
+Rows are pulled from the database with server-side cursors and written
+chunk by chunk, so memory use does not depend on the size of the report.
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.files import File
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.calls.models import Call
+from apps.queues.models import QueueStatistics
+from .cube import FOREIGN_KEY_DIMENSIONS, query_cube
+from .models import Report, ReportExport
+
+
+CHUNK_SIZE = 2000
+
+CDR_COLUMNS = [
+    'unique_id', 'direction', 'status', 'caller_id', 'destination',
+    'campaign_id', 'queue_id', 'agent_id', 'contact_id', 'disposition__code',
+    'start_time', 'answer_time', 'end_time', 'duration', 'talk_time',
+    'wait_time', 'hangup_cause',
+]
+
+# Filters custom reports may apply to the CDR export
+CDR_FILTERS = ('direction', 'status', 'campaign_id', 'queue_id', 'agent_id')
+
+QUEUE_STATISTICS_COLUMNS = [
+    'queue_id', 'queue__name', 'date', 'total_calls', 'answered_calls',
+    'abandoned_calls', 'avg_wait_time', 'avg_talk_time', 'max_wait_time',
+    'service_level_threshold', 'calls_within_sl',
+]
+
+CUBE_MEASURES = [
+    'calls', 'answered_calls', 'total_duration', 'total_talk_time',
+    'total_wait_time', 'max_wait_time',
+]
+
+# Cube roll-up used by each report type
+CUBE_REPORTS = {
+    Report.ReportType.CALL_VOLUME: ['direction', 'status'],
+    Report.ReportType.AGENT_PERFORMANCE: ['agent'],
+    Report.ReportType.CAMPAIGN_SUMMARY: ['campaign'],
+}
+
+FORMATS = {
+    ReportExport.Format.CSV: ('csv', 'text/csv'),
+    ReportExport.Format.EXCEL: ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    ReportExport.Format.JSON: ('ndjson', 'application/x-ndjson'),
+}
+
+# XLSX is a zip container and can only be produced as a complete file
+STREAMABLE_FORMATS = (ReportExport.Format.CSV, ReportExport.Format.JSON)
+
+
+class Dataset:
+    """Column list plus a lazily evaluated iterable of row dicts"""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+
+def _to_primitive(value):
+    """Flatten database values into something every writer can handle"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _iterate(queryset):
+    """Iterate a values() queryset with a server-side cursor"""
+    if isinstance(queryset, list):
+        return iter(queryset)
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def report_period(report, day=None):
+    """
+    Resolve the [start, end) range of a report run.
+
+    ``day`` wins over the report parameters; without either the report
+    covers yesterday.
+    """
+    params = report.parameters or {}
+    if day is not None:
+        start_day, end_day = day, day
+    elif params.get('start_date'):
+        start_day = parse_date(params['start_date'])
+        end_day = parse_date(params.get('end_date') or params['start_date'])
+    else:
+        start_day = end_day = timezone.localdate() - timedelta(days=1)
+
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(start_day, time.min, tzinfo=tz)
+    end = datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+def build_dataset(report, day=None):
+    """Build the dataset backing a saved report"""
+    start, end = report_period(report, day)
+    params = report.parameters or {}
+
+    if report.report_type in CUBE_REPORTS:
+        group_by = params.get('group_by') or CUBE_REPORTS[report.report_type]
+        granularity = params.get('granularity', 'day')
+        queryset = query_cube(report.organization_id, start, end, group_by=group_by, granularity=granularity)
+        columns = [f'{d}_id' if d in FOREIGN_KEY_DIMENSIONS else d for d in group_by]
+        if granularity:
+            columns.append('period')
+        return Dataset(columns + CUBE_MEASURES, _iterate(queryset))
+
+    if report.report_type == Report.ReportType.QUEUE_STATISTICS:
+        queryset = (
+            QueueStatistics.objects
+            .filter(
+                queue__organization_id=report.organization_id,
+                date__gte=start.date(),
+                date__lt=end.date(),
+            )
+            .order_by('date', 'queue_id')
+            .values(*QUEUE_STATISTICS_COLUMNS)
+        )
+        return Dataset(QUEUE_STATISTICS_COLUMNS, _iterate(queryset))
+
+    # Custom reports export raw CDRs
+    filters = {k: v for k, v in params.get('filters', {}).items() if k in CDR_FILTERS}
+    queryset = (
+        Call.objects
+        .filter(
+            organization_id=report.organization_id,
+            start_time__gte=start,
+            start_time__lt=end,
+            **filters
+        )
+        .order_by('start_time', 'id')
+        .values(*CDR_COLUMNS)
+    )
+    return Dataset(CDR_COLUMNS, _iterate(queryset))
+
+
+# ==================== WRITERS ====================
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(dataset):
+    """Yield the dataset as CSV text chunks"""
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(dataset.columns)
+
+    chunk = []
+    for row in dataset.rows:
+        chunk.append(writer.writerow([_to_primitive(row.get(c)) for c in dataset.columns]))
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_ndjson(dataset):
+    """Yield the dataset as newline-delimited JSON text chunks"""
+    chunk = []
+    for row in dataset.rows:
+        record = {c: _to_primitive(row.get(c)) for c in dataset.columns}
+        chunk.append(json.dumps(record, separators=(',', ':')))
+        chunk.append('\n')
+        if len(chunk) >= CHUNK_SIZE * 2:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def write_xlsx(dataset, fileobj):
+    """Write the dataset to an XLSX file using openpyxl's write-only mode"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    sheet.append(dataset.columns)
+    for row in dataset.rows:
+        sheet.append([_to_primitive(row.get(c)) for c in dataset.columns])
+    workbook.save(fileobj)
+
+
+TEXT_WRITERS = {
+    ReportExport.Format.CSV: iter_csv,
+    ReportExport.Format.JSON: iter_ndjson,
+}
+
+
+# ==================== ENTRY POINTS ====================
+
+def _check_format(export_format):
+    if export_format not in FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def export_filename(report, export_format, day=None):
+    """File name for an export of ``report``"""
+    extension, _ = FORMATS[export_format]
+    stamp = (day or timezone.localdate()).strftime('%Y%m%d')
+    return f"report-{report.id}-{report.report_type.lower()}-{stamp}.{extension}"
+
+
+def write_export(report_export, day=None):
+    """Render a ReportExport into its ``file`` field"""
+    report = report_export.report
+    _check_format(report_export.format)
+    dataset = build_dataset(report, day)
+
+    # Spools to disk once past a few MB, so the dataset never sits in memory
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as tmp:
+        if report_export.format == ReportExport.Format.EXCEL:
+            write_xlsx(dataset, tmp)
+        else:
+            text = io.TextIOWrapper(tmp, encoding='utf-8', newline='')
+            for chunk in TEXT_WRITERS[report_export.format](dataset):
+                text.write(chunk)
+            text.flush()
+            text.detach()
+
+        tmp.seek(0)
+        report_export.file.save(
+            export_filename(report, report_export.format, day),
+            File(tmp),
+            save=True,
+        )
+
+    return report_export
+
+
+def streaming_response(report, export_format, day=None):
+    """Stream a report straight to the HTTP client"""
+    _check_format(export_format)
+    if export_format not in STREAMABLE_FORMATS:
+        raise ValueError(f"{export_format} exports can't be streamed, generate an export file instead")
+
+    _, content_type = FORMATS[export_format]
+    dataset = build_dataset(report, day)
+    chunks = (chunk.encode('utf-8') for chunk in TEXT_WRITERS[export_format](dataset))
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(report, export_format, day)}"'
+    return response
@@ -2,8 +2,11 @@
 Reports models
 """
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.tenancy import TenantManager
+
 
 class Report(models.Model):
     """Saved reports"""
@@ -33,10 +36,17 @@ class Report(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    
     class Meta:
         verbose_name = _('Report')
         verbose_name_plural = _('Reports')
+        default_manager_name = 'unscoped'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', '-created_at'], name='report_org_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -65,3 +75,96 @@ class ReportExport(models.Model):
     
     def __str__(self):
         return f"{self.report.name} - {self.format} - {self.generated_at}"
+
+
+class CallVolumeCube(models.Model):
+    """Hourly call aggregates keyed by every reporting dimension"""
+    
+    organization = models.ForeignKey('users.Organization', on_delete=models.CASCADE, related_name='call_volume_cube')
+    # Deleting a campaign, queue or agent keeps its calls (SET_NULL), so their
+    # cube rows stay too until the reports app rebuilds the buckets
+    campaign = models.ForeignKey('campaigns.Campaign', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    queue = models.ForeignKey('queues.Queue', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    agent = models.ForeignKey('users.User', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    direction = models.CharField(max_length=20, verbose_name=_('Direction'))
+    status = models.CharField(max_length=20, verbose_name=_('Status'))
+    hour = models.DateTimeField(verbose_name=_('Hour'))
+    
+    # Measures
+    call_count = models.IntegerField(default=0, verbose_name=_('Calls'))
+    answered_count = models.IntegerField(default=0, verbose_name=_('Answered calls'))
+    duration_sum = models.DurationField(null=True, blank=True, verbose_name=_('Total duration'))
+    talk_time_sum = models.DurationField(null=True, blank=True, verbose_name=_('Total talk time'))
+    wait_time_sum = models.DurationField(null=True, blank=True, verbose_name=_('Total wait time'))
+    wait_time_max = models.DurationField(null=True, blank=True, verbose_name=_('Max wait time'))
+    
+    class Meta:
+        verbose_name = _('Call Volume Cube')
+        verbose_name_plural = _('Call Volume Cube')
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['organization', 'hour']),
+            models.Index(fields=['hour']),
+        ]
+        constraints = [
+            # Empty dimensions are NULL, which a plain unique constraint treats as distinct
+            models.UniqueConstraint(
+                'organization', 'hour',
+                Coalesce('campaign', 0, output_field=models.BigIntegerField()),
+                Coalesce('queue', 0, output_field=models.BigIntegerField()),
+                Coalesce('agent', 0, output_field=models.BigIntegerField()),
+                'direction', 'status',
+                name='call_volume_cube_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.organization_id} - {self.hour:%Y-%m-%d %H:00} - {self.call_count}"
+
+
+class RollupWatermark(models.Model):
+    """Last source timestamp folded into a rollup"""
+    
+    name = models.CharField(max_length=100, unique=True, verbose_name=_('Name'))
+    position = models.DateTimeField(verbose_name=_('Position'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Rollup Watermark')
+        verbose_name_plural = _('Rollup Watermarks')
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class LatencySketch(models.Model):
+    """Hourly wait and handle time histograms for one queue, campaign or agent"""
+    
+    class Scope(models.TextChoices):
+        QUEUE = 'QUEUE', _('Queue')
+        CAMPAIGN = 'CAMPAIGN', _('Campaign')
+        AGENT = 'AGENT', _('Agent')
+    
+    organization = models.ForeignKey('users.Organization', on_delete=models.CASCADE, related_name='latency_sketches')
+    scope = models.CharField(max_length=20, choices=Scope.choices, verbose_name=_('Scope'))
+    scope_id = models.BigIntegerField(verbose_name=_('Scope ID'))
+    hour = models.DateTimeField(verbose_name=_('Hour'))
+    
+    # Encoded apps.reports.sketches.LatencyHistogram
+    wait_sketch = models.BinaryField(verbose_name=_('Wait time sketch'))
+    handle_sketch = models.BinaryField(verbose_name=_('Handle time sketch'))
+    calls = models.IntegerField(default=0, verbose_name=_('Calls'))
+    
+    class Meta:
+        verbose_name = _('Latency Sketch')
+        verbose_name_plural = _('Latency Sketches')
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['organization', 'hour']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'scope', 'scope_id', 'hour'], name='latency_sketch_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_scope_display()} {self.scope_id} - {self.hour:%Y-%m-%d %H:00}"
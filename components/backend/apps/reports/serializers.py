@@ -0,0 +1,86 @@
+"""
+Serializers for reports app
+"""
+from django.utils.dateparse import parse_date
+from rest_framework import serializers
+from .cube import DIMENSIONS, GRANULARITIES
+from .exports import CUBE_REPORTS, FORMATS
+from .models import Report, ReportExport
+
+
+def _is_date(value):
+    try:
+        return parse_date(str(value)) is not None
+    except ValueError:
+        return False
+
+
+class ReportSerializer(serializers.ModelSerializer):
+    """Report serializer"""
+    
+    class Meta:
+        model = Report
+        fields = [
+            'id', 'name', 'description', 'report_type', 'organization',
+            'created_by', 'parameters', 'is_scheduled', 'schedule_frequency',
+            'last_generated', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_by', 'last_generated', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        report_type = attrs.get('report_type', getattr(self.instance, 'report_type', None))
+        params = attrs.get('parameters', getattr(self.instance, 'parameters', None)) or {}
+        if not isinstance(params, dict):
+            raise serializers.ValidationError({'parameters': 'Must be an object.'})
+        
+        errors = []
+        for name in ('start_date', 'end_date'):
+            if params.get(name) and not _is_date(params[name]):
+                errors.append(f'{name} must be a date (YYYY-MM-DD).')
+        if params.get('export_format', 'CSV') not in FORMATS:
+            errors.append(f"export_format must be one of: {', '.join(FORMATS)}.")
+        if report_type in CUBE_REPORTS:
+            group_by = params.get('group_by')
+            if group_by is not None and (
+                not isinstance(group_by, list) or not set(group_by) <= set(DIMENSIONS)
+            ):
+                errors.append(f"group_by must be a list of: {', '.join(DIMENSIONS)}.")
+            if params.get('granularity') and params['granularity'] not in GRANULARITIES:
+                errors.append(f"granularity must be one of: {', '.join(GRANULARITIES)}.")
+        if errors:
+            raise serializers.ValidationError({'parameters': errors})
+        return attrs
+
+
+class ReportExportSerializer(serializers.ModelSerializer):
+    """Report export serializer"""
+    
+    class Meta:
+        model = ReportExport
+        fields = ['id', 'report', 'format', 'file', 'generated_by', 'generated_at']
+        read_only_fields = fields
+
+
+class ReportExportRequestSerializer(serializers.Serializer):
+    """Export request serializer"""
+    
+    # PDF is a known format without an export writer
+    format = serializers.ChoiceField(
+        choices=[c for c in ReportExport.Format.choices if c[0] in FORMATS],
+        default=ReportExport.Format.CSV
+    )
+    date = serializers.DateField(required=False)
+
+
+class LatencyQuerySerializer(serializers.Serializer):
+    """Latency percentiles query parameters"""
+    
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    scope_id = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate(self, attrs):
+        start_date, end_date = attrs.get('start_date'), attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError({'start_date': 'Must not be after end_date.'})
+        return attrs
@@ -0,0 +1,66 @@
+"""
+Signal handlers for reports app
+
+The cube's updated_at watermark can't see deleted calls, nor calls whose
+campaign, queue or agent was set to NULL by a delete, so those buckets are
+rebuilt once the deleting transaction commits. A bulk delete sends one
+signal per call; the buckets are collected and dispatched as a single task.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.calls.models import Call
+from apps.campaigns.models import Campaign
+from apps.queues.models import Queue
+from apps.users.models import User
+from .cube import call_bucket
+from .models import CallVolumeCube
+
+
+_pending = threading.local()
+
+
+def _schedule_rebuild(buckets):
+    buckets = {(organization_id, hour.isoformat()) for organization_id, hour in buckets}
+    if not buckets:
+        return
+    
+    pending = getattr(_pending, 'buckets', None)
+    if pending is None:
+        pending = _pending.buckets = set()
+    pending.update(buckets)
+    # Every callback drains the whole set, so all but the first one are no-ops
+    transaction.on_commit(_dispatch_rebuild)
+
+
+def _dispatch_rebuild():
+    from .tasks import rebuild_call_volume_buckets
+    
+    buckets = getattr(_pending, 'buckets', None)
+    _pending.buckets = None
+    if buckets:
+        rebuild_call_volume_buckets.delay(sorted(buckets))
+
+
+@receiver(post_delete, sender=Call)
+def rebuild_deleted_call_bucket(sender, instance, **kwargs):
+    """Drop a deleted call from the cube"""
+    _schedule_rebuild([call_bucket(instance)])
+
+
+@receiver(post_delete, sender=Campaign)
+@receiver(post_delete, sender=Queue)
+@receiver(post_delete, sender=User)
+def rebuild_deleted_dimension_buckets(sender, instance, **kwargs):
+    """Move the calls of a deleted campaign, queue or agent to the empty dimension"""
+    field = {Campaign: 'campaign', Queue: 'queue', User: 'agent'}[sender]
+    _schedule_rebuild(
+        CallVolumeCube.objects
+        .filter(**{f'{field}_id': instance.pk})
+        .order_by()
+        .values_list('organization_id', 'hour')
+        .distinct()
+    )
@@ -0,0 +1,134 @@
+"""
+Mergeable latency histograms
+
+Values are counted in logarithmic buckets whose width grows with the value
+(the HDR histogram / DDSketch idea), so any quantile is answered within a
+fixed relative error, two histograms merge by adding bucket counts, and the
+encoded form only stores the non-empty buckets.
+"""
+import math
+import zlib
+
+
+# Quantiles are exact to within +/- 1% of the true value
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Values are recorded in milliseconds; anything below 1 ms lands in bucket 0
+_ZERO_BUCKET = 0
+
+_ENCODING_VERSION = 1
+
+
+def _bucket(value_ms):
+    if value_ms < 1:
+        return _ZERO_BUCKET
+    return int(math.ceil(math.log(value_ms) / _LOG_GAMMA)) + 1
+
+
+def _bucket_value(index):
+    if index == _ZERO_BUCKET:
+        return 0.0
+    # Midpoint (in relative terms) of the bucket's (gamma^(i-2), gamma^(i-1)] range
+    return 2 * _GAMMA ** (index - 1) / (_GAMMA + 1)
+
+
+def _write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+class LatencyHistogram:
+    """Relative-error histogram of latencies in milliseconds"""
+
+    __slots__ = ('counts', 'count', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value_ms, count=1):
+        value_ms = max(0, int(value_ms))
+        index = _bucket(value_ms)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def add_duration(self, duration):
+        """Record a timedelta, ignoring missing values"""
+        if duration is not None:
+            self.add(duration.total_seconds() * 1000)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, quantile):
+        """Latency in milliseconds at ``quantile`` (0..1), or None when empty"""
+        if not self.count:
+            return None
+
+        rank = quantile * (self.count - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return min(_bucket_value(index), self.max)
+        return float(self.max)
+
+    def to_bytes(self):
+        """Compact encoding: version, max, then (index delta, count) varint pairs"""
+        out = bytearray([_ENCODING_VERSION])
+        _write_varint(out, self.max)
+        previous = 0
+        for index in sorted(self.counts):
+            _write_varint(out, index - previous)
+            _write_varint(out, self.counts[index])
+            previous = index
+        return zlib.compress(bytes(out))
+
+    @classmethod
+    def from_bytes(cls, data):
+        histogram = cls()
+        if not data:
+            return histogram
+
+        data = zlib.decompress(bytes(data))
+        if data[0] != _ENCODING_VERSION:
+            raise ValueError(f"Unsupported histogram encoding version: {data[0]}")
+
+        histogram.max, pos = _read_varint(data, 1)
+        index = 0
+        while pos < len(data):
+            delta, pos = _read_varint(data, pos)
+            count, pos = _read_varint(data, pos)
+            index += delta
+            histogram.counts[index] = count
+            histogram.count += count
+        return histogram
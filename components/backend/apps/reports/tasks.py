@@ -1,44 +1,208 @@
 """Celery tasks for reports"""
-from celery import shared_task
+import logging
+
+from celery import chord, shared_task
+from django.core.cache import cache
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime, time
+
+
+logger = logging.getLogger(__name__)
+
+# Daily run progress is kept for two days so it can be inspected the next morning
+PROGRESS_TIMEOUT = 2 * 24 * 60 * 60
+PROGRESS_FIELDS = ('total', 'done', 'failed', 'finished')
+
+
+def _progress_key(day, field):
+    return f'reports:daily:{day.isoformat()}:{field}'
+
+
+def daily_report_progress(day):
+    """Progress of the daily report run for ``day``"""
+    values = cache.get_many([_progress_key(day, f) for f in PROGRESS_FIELDS])
+    return {f: values.get(_progress_key(day, f)) for f in PROGRESS_FIELDS}
+
+
+def _count_progress(day, field):
+    # Counters are separate keys so concurrent subtasks never overwrite each other
+    try:
+        cache.incr(_progress_key(day, field))
+    except ValueError:
+        cache.set(_progress_key(day, field), 1, PROGRESS_TIMEOUT)
+
+
+def _export(report, format, user_id=None, day=None, replica=True):
+    """Write one export of ``report`` and stamp it as generated"""
+    from omnivoip.db_router import use_replica
+    from .exports import write_export
+    from .models import ReportExport
+    
+    report_export = ReportExport(report=report, format=format, generated_by_id=user_id)
+    if replica:
+        # The dataset is read from the replica; the export row is still written to the primary
+        with use_replica():
+            write_export(report_export, day)
+    else:
+        write_export(report_export, day)
+    
+    report.last_generated = timezone.now()
+    report.save(update_fields=['last_generated'])
+    return report_export
 
 
 @shared_task
-def generate_daily_reports():
+def generate_daily_reports(day=None):
     """Generate daily reports for all organizations"""
     from .models import Report
-    from apps.users.models import Organization
     
-    yesterday = date.today() - timedelta(days=1)
+    day = date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    
+    reports = list(
+        Report.objects
+        .filter(
+            organization__is_active=True,
+            is_scheduled=True,
+            schedule_frequency__iexact='daily',
+        )
+        .values_list('id', 'organization_id')
+    )
+    
+    cache.set_many({
+        _progress_key(day, 'total'): len(reports),
+        _progress_key(day, 'done'): 0,
+        _progress_key(day, 'failed'): 0,
+        _progress_key(day, 'finished'): not reports,
+    }, PROGRESS_TIMEOUT)
+    
+    if not reports:
+        return f"No daily reports scheduled for {day}"
+    
+    # Rebuild the whole day before any report reads it: the rolling refresh
+    # is bounded and lags behind, so it doesn't guarantee a complete day.
+    # One rollup per organization runs in parallel; the reports are only
+    # dispatched once they have all finished.
+    organization_ids = sorted({organization_id for _, organization_id in reports})
+    chord(
+        rebuild_daily_cube.si(organization_id, day.isoformat()) for organization_id in organization_ids
+    )(dispatch_daily_reports.si([report_id for report_id, _ in reports], day.isoformat()))
+    
+    return f"Dispatched {len(organization_ids)} daily rollups for {len(reports)} reports on {day}"
+
+
+# rebuild_hour() locks each bucket, so this can overlap with the rolling refresh
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def rebuild_daily_cube(self, organization_id, day):
+    """Recompute one organization's call volume cube for one day"""
+    from .cube import rebuild_range
     
-    # Generate reports for each organization
-    organizations = Organization.objects.filter(is_active=True)
+    day = date.fromisoformat(day)
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
     
-    for org in organizations:
-        # Generate standard daily reports
-        # TODO: Implement report generation logic
-        pass
+    try:
+        buckets = rebuild_range(start, end, organization_id=organization_id)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        # The organization's reports still run, on whatever the refresh has folded in
+        logger.exception(f"Could not rebuild the call volume cube of organization {organization_id} for {day}")
+        return {'organization_id': organization_id, 'status': 'failed', 'error': str(e)}
     
-    return f"Generated daily reports for {organizations.count()} organizations"
+    return {'organization_id': organization_id, 'status': 'ok', 'buckets': buckets}
 
 
 @shared_task
-def export_report(report_id, format='PDF'):
+def dispatch_daily_reports(report_ids, day):
+    """Generate the daily reports once their day is rolled up"""
+    # One subtask per organization report; a slow tenant only holds its own slot
+    chord(
+        generate_scheduled_report.s(report_id, day) for report_id in report_ids
+    )(collect_daily_reports.s(day))
+    
+    return f"Dispatched {len(report_ids)} daily reports for {day}"
+
+
+# The soft limit turns a hung tenant into a retry instead of stalling the chord
+@shared_task(bind=True, max_retries=3, default_retry_delay=120, soft_time_limit=10 * 60)
+def generate_scheduled_report(self, report_id, day):
+    """Generate one scheduled report for one day"""
+    from .models import Report
+    
+    day = date.fromisoformat(day)
+    
+    try:
+        report = Report.objects.select_related('organization').get(id=report_id)
+        format = report.parameters.get('export_format', 'CSV')
+        # Read from the primary: the rollup that precedes this run just wrote the day
+        report_export = _export(report, format, day=day, replica=False)
+    except Report.DoesNotExist:
+        _count_progress(day, 'failed')
+        return {'report_id': report_id, 'status': 'missing'}
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        # Give up on this report without failing the whole chord
+        _count_progress(day, 'failed')
+        return {'report_id': report_id, 'status': 'failed', 'error': str(e)}
+    
+    _count_progress(day, 'done')
+    return {'report_id': report_id, 'status': 'ok', 'export_id': report_export.id}
+
+
+@shared_task
+def collect_daily_reports(results, day):
+    """Summarize a daily report run"""
+    day = date.fromisoformat(day)
+    
+    failed = [r['report_id'] for r in results if r['status'] != 'ok']
+    cache.set(_progress_key(day, 'finished'), True, PROGRESS_TIMEOUT)
+    
+    summary = f"Generated {len(results) - len(failed)} of {len(results)} daily reports for {day}"
+    if failed:
+        summary += f" (failed: {', '.join(map(str, failed))})"
+    return summary
+
+
+@shared_task
+def refresh_call_volume_cube():
+    """Fold recently written CDRs into the call volume cube"""
+    from .cube import refresh_cube
+    
+    buckets = refresh_cube()
+    
+    return f"Refreshed {buckets} call volume buckets"
+
+
+@shared_task
+def rebuild_call_volume_buckets(buckets):
+    """Recompute [organization_id, hour] call volume buckets, e.g. after calls in them were deleted"""
+    from .cube import rebuild_hour
+    
+    rows = sum(
+        rebuild_hour(organization_id, datetime.fromisoformat(hour))
+        for organization_id, hour in buckets
+    )
+    
+    return f"Rebuilt {rows} call volume rows in {len(buckets)} buckets"
+
+
+@shared_task
+def export_report(report_id, format='CSV', user_id=None, day=None):
     """Export report to file"""
-    from .models import Report, ReportExport
+    from .models import Report
     
     try:
         report = Report.objects.get(id=report_id)
-        
-        # TODO: Implement report generation and export
-        # Generate report data based on report.parameters
-        # Create file in specified format
-        # Save to ReportExport model
-        
-        report.last_generated = timezone.now()
-        report.save()
-        
-        return f"Exported report {report.name} as {format}"
     except Report.DoesNotExist:
         return f"Report {report_id} not found"
+    
+    if day:
+        day = date.fromisoformat(day)
+    
+    try:
+        _export(report, format, user_id, day)
+    except ValueError as e:
+        return f"Could not export report {report.name}: {e}"
+    
+    return f"Exported report {report.name} as {format}"
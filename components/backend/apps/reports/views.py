@@ -0,0 +1,130 @@
+"""
+Views for reports app
+"""
+from rest_framework import viewsets, status, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+
+from apps.users.models import User
+from apps.users.tenancy import TenantScopedMixin
+from omnivoip.db_router import ReplicaReadMixin
+from .cube import latency_percentiles
+from .exports import STREAMABLE_FORMATS, streaming_response
+from .models import LatencySketch, Report, ReportExport
+from .serializers import (
+    LatencyQuerySerializer, ReportSerializer, ReportExportSerializer, ReportExportRequestSerializer
+)
+from .tasks import daily_report_progress, export_report
+
+
+class CanExportReports(permissions.BasePermission):
+    """Exports carry raw CDRs; only supervisors, managers and admins may pull them"""
+    
+    roles = (User.Role.ADMIN, User.Role.SUPERVISOR, User.Role.MANAGER)
+    
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role in self.roles)
+
+
+class ReportViewSet(TenantScopedMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    """Report CRUD operations and exports; reads use the read replica"""
+    queryset = Report.objects.all()
+    serializer_class = ReportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['report_type', 'is_scheduled', 'organization']
+    search_fields = ['name', 'description']
+    ordering_fields = ['created_at', 'name', 'last_generated']
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('organization')
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer, created_by=self.request.user)
+    
+    @action(detail=True, methods=['post'], permission_classes=[CanExportReports])
+    def export(self, request, pk=None):
+        """Generate an export file in the background"""
+        report = self.get_object()
+        serializer = ReportExportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        day = serializer.validated_data.get('date')
+        task = export_report.delay(
+            report.id,
+            serializer.validated_data['format'],
+            user_id=request.user.id,
+            day=day.isoformat() if day else None,
+        )
+        
+        return Response({'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'])
+    def daily_progress(self, request):
+        """Progress of the scheduled daily report run"""
+        day = parse_date(request.query_params.get('date', ''))
+        if day is None:
+            day = timezone.localdate() - timedelta(days=1)
+        
+        return Response({'date': day, **daily_report_progress(day)})
+    
+    @action(detail=False, methods=['get'])
+    def latency(self, request):
+        """Wait and handle time percentiles for a queue, campaign or agent"""
+        organization = request.user.organization
+        scope = request.query_params.get('scope', LatencySketch.Scope.QUEUE).upper()
+        if organization is None or scope not in LatencySketch.Scope.values:
+            return Response(
+                {'detail': 'An organization and a valid scope are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = LatencyQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        end_date = serializer.validated_data.get('end_date') or timezone.localdate()
+        start_date = serializer.validated_data.get('start_date') or end_date
+        tz = timezone.get_current_timezone()
+        
+        return Response(latency_percentiles(
+            organization,
+            datetime.combine(start_date, time.min, tzinfo=tz),
+            datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+            scope,
+            serializer.validated_data.get('scope_id'),
+        ))
+    
+    @action(detail=True, methods=['get'])
+    def exports(self, request, pk=None):
+        """List generated export files"""
+        report = self.get_object()
+        queryset = ReportExport.objects.filter(report=report)
+        
+        page = self.paginate_queryset(queryset)
+        serializer = ReportExportSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[CanExportReports])
+    def download(self, request, pk=None):
+        """Stream the report as CSV or NDJSON without generating a file"""
+        report = self.get_object()
+        # `format` is reserved by DRF for renderer selection
+        data = {'format': request.query_params.get('export_format', ReportExport.Format.CSV)}
+        if request.query_params.get('date'):
+            data['date'] = request.query_params['date']
+        serializer = ReportExportRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        
+        export_format = serializer.validated_data['format']
+        if export_format not in STREAMABLE_FORMATS:
+            return Response(
+                {'export_format': f'{export_format} can only be generated as an export file.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            return streaming_response(report, export_format, serializer.validated_data.get('date'))
+        except ValueError as e:
+            # Parameters saved before they were validated
+            return Response({'parameters': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,144 @@
+"""
+JWT authentication with cached user resolution
+
+Tokens carry the user's ``token_version``. The user row is cached for a
+short time, so an authenticated request normally costs one cache read
+instead of a query. Any save of the user drops its entry. Bumping the
+version (deactivation, password change) revokes every token issued
+before it, since the claim no longer matches the cached user.
+
+``last_activity`` is recorded in Redis per request and written to the
+database in batches by ``flush_last_activity``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+
+VERSION_CLAIM = 'ver'
+ACTIVITY_KEY = 'auth:last_activity'
+FLUSHING_KEY = f'{ACTIVITY_KEY}:flushing'
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def invalidate_users(user_ids):
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+def tokens_for_user(user):
+    """Refresh/access token pair bound to the user's current token version"""
+    refresh = RefreshToken.for_user(user)
+    refresh[VERSION_CLAIM] = user.token_version
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to ``user`` so far; the caller saves"""
+    user.token_version += 1
+
+
+def mark_active(user_id, at=None):
+    """Record activity; it reaches the database on the next flush"""
+    at = at or timezone.now()
+    get_redis_connection('default').hset(ACTIVITY_KEY, user_id, at.timestamp())
+
+
+def flush_last_activity():
+    """Write recorded activity to User.last_activity in one batch"""
+    from datetime import datetime, timezone as dt_timezone
+    from apps.api.conditional import bump_version
+
+    client = get_redis_connection('default')
+    if not client.exists(FLUSHING_KEY):
+        if not client.exists(ACTIVITY_KEY):
+            return 0
+        # Entries recorded while this flush runs go to a fresh hash
+        client.rename(ACTIVITY_KEY, FLUSHING_KEY)
+
+    users = [
+        User(id=int(user_id), last_activity=datetime.fromtimestamp(float(at), tz=dt_timezone.utc))
+        for user_id, at in client.hgetall(FLUSHING_KEY).items()
+    ]
+    # bulk_update() sends no signals, so cached users stay cached, but
+    # last_activity is part of the ETagged user representation
+    User.objects.bulk_update(users, ['last_activity'], batch_size=1000)
+    bump_version(User, [user.id for user in users])
+    client.delete(FLUSHING_KEY)
+    return len(users)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users from the cache"""
+
+    def _user_id(self, validated_token):
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def _check(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if validated_token.get(VERSION_CLAIM, 0) != user.token_version:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User.objects.select_related('organization').get(id=user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        self._check(user, validated_token)
+        mark_active(user.id)
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views, on the async Redis client"""
+        from apps.api.realtime import aredis, cache_get, cache_set
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        user_id = self._user_id(validated_token)
+        key = user_cache_key(user_id)
+        user = await cache_get(key)
+        if user is None:
+            try:
+                user = await User.objects.select_related('organization').aget(id=user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            await cache_set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        self._check(user, validated_token)
+        await aredis().hset(ACTIVITY_KEY, user.id, timezone.now().timestamp())
+        return user, validated_token
@@ -73,6 +73,9 @@ class User(AbstractUser):
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated at'))
     last_activity = models.DateTimeField(null=True, blank=True, verbose_name=_('Last activity'))
     
+    # Bumped to revoke every JWT issued so far (see authentication.py)
+    token_version = models.PositiveIntegerField(default=0, verbose_name=_('Token version'))
+    
     objects = UserManager()
     
     USERNAME_FIELD = 'email'
@@ -1,9 +1,14 @@
 """
 Signal handlers for users app
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import User, UserProfile
+
+from apps.agents.models import AgentStatus
+from apps.campaigns.models import Campaign
+from .authentication import invalidate_user, invalidate_users
+from .models import Organization, User, UserProfile
+from .statistics import invalidate_agents, invalidate_organizations
 
 
 @receiver(post_save, sender=User)
@@ -18,3 +23,31 @@ def save_user_profile(sender, instance, **kwargs):
     """Save UserProfile when User is saved"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Campaign)
+@receiver(post_delete, sender=Campaign)
+def invalidate_organization_statistics(sender, instance, **kwargs):
+    """Drop cached organization statistics when users or campaigns change"""
+    invalidate_organizations([instance.organization_id])
+
+
+@receiver(post_save, sender=AgentStatus)
+def invalidate_agent_statistics(sender, instance, **kwargs):
+    """Drop cached organization statistics when an agent's state is saved"""
+    invalidate_agents([instance.agent_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    """Drop the cached user used by JWT authentication"""
+    invalidate_user(instance.id)
+
+
+@receiver(post_save, sender=Organization)
+def invalidate_organization_users(sender, instance, **kwargs):
+    """Cached users carry their organization, so drop them with it"""
+    invalidate_users(instance.users.values_list('id', flat=True))
@@ -0,0 +1,83 @@
+"""
+Organization statistics
+
+All counters come from a single query: conditional counts over the
+organization's users (and their agent status) plus scalar subqueries for
+campaigns and today's calls. Results are cached per organization and
+dropped when users, agent states or campaigns change; call counts are
+only as fresh as STATS_TIMEOUT. The query runs on the primary: right after
+an invalidation a lagging replica would put the old counters back in the
+cache.
+"""
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Organization, User
+
+
+STATS_TIMEOUT = 30
+
+
+def stats_key(organization_id):
+    return f'org:{organization_id}:statistics'
+
+
+def _count(queryset):
+    """Scalar subquery counting ``queryset`` rows of the outer organization"""
+    counted = queryset.filter(organization=OuterRef('pk')).order_by().values('organization').annotate(n=Count('pk'))
+    return Coalesce(Subquery(counted.values('n'), output_field=IntegerField()), Value(0))
+
+
+def compute_statistics(organization_id):
+    from apps.agents.models import AgentStatus
+    from apps.calls.models import Call
+    from apps.campaigns.models import Campaign
+
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    live_states = [s for s in AgentStatus.State.values if s != AgentStatus.State.OFFLINE]
+
+    queryset = Organization.objects.filter(pk=organization_id).annotate(
+        total_users=Count('users'),
+        active_users=Count('users', filter=Q(users__is_active=True)),
+        agents=Count('users', filter=Q(users__role=User.Role.AGENT)),
+        supervisors=Count('users', filter=Q(users__role=User.Role.SUPERVISOR)),
+        managers=Count('users', filter=Q(users__role=User.Role.MANAGER)),
+        live_agents=Count('users', filter=Q(
+            users__role=User.Role.AGENT,
+            users__is_active=True,
+            users__agent_status__state__in=live_states,
+        )),
+        active_campaigns=_count(Campaign.objects.filter(status=Campaign.Status.ACTIVE)),
+        calls_today=_count(Call.objects.filter(start_time__gte=today)),
+    ).values(
+        'total_users', 'active_users', 'agents', 'supervisors', 'managers',
+        'live_agents', 'active_campaigns', 'calls_today',
+    )
+    return queryset.get()
+
+
+def organization_statistics(organization_id):
+    """Cached statistics of an organization"""
+    key = stats_key(organization_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_statistics(organization_id)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_organizations(organization_ids):
+    keys = [stats_key(o) for o in set(organization_ids) if o is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_agents(agent_ids):
+    """Drop the statistics of the organizations of ``agent_ids``"""
+    if not agent_ids:
+        return
+    invalidate_organizations(
+        User.objects.filter(id__in=agent_ids).values_list('organization_id', flat=True).order_by().distinct()
+    )
@@ -14,6 +14,15 @@ def cleanup_expired_sessions():
     return f"Cleaned up expired sessions"
 
 
+@shared_task
+def flush_last_activity():
+    """Write batched last_activity timestamps to the database"""
+    from .authentication import flush_last_activity as flush
+    
+    flushed = flush()
+    return f"Flushed last activity of {flushed} users"
+
+
 @shared_task
 def update_user_statistics(user_id):
     """Update user statistics"""
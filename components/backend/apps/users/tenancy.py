@@ -0,0 +1,130 @@
+"""
+Tenant (organization) scoping
+
+Tenant models expose TenantManager as ``objects``. Inside a tenant scope
+their querysets are filtered to the scope's organization on creation:
+
+    with tenant_scope(user.organization_id):
+        Call.objects.filter(status=...)   # ... AND organization_id = <id>
+
+TenantScopedMixin opens the scope for DRF views from the authenticated
+user (administrators are unscoped, users without an organization see
+nothing) and applies it to the view's class-level queryset, which was
+built at import time. It covers writes too: inside a scope the
+serializer's ``organization`` is read-only and pinned on create, and its
+related fields only accept rows of the same organization. Outside a
+scope (Celery tasks, management commands, the admin) querysets are
+unfiltered.
+
+The default manager of tenant models stays unscoped (``unscoped``), so
+related managers and uniqueness validation don't depend on the tenant.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+
+# Scope of users without an organization: no rows at all
+NO_ORGANIZATION = object()
+
+_tenant = ContextVar('tenant', default=None)
+
+
+def current_tenant():
+    """Organization id of the active scope, NO_ORGANIZATION, or None when unscoped"""
+    return _tenant.get()
+
+
+def tenant_of(user):
+    if not user.is_authenticated:
+        return NO_ORGANIZATION
+    if user.role == user.Role.ADMIN:
+        return None
+    return user.organization_id or NO_ORGANIZATION
+
+
+@contextmanager
+def tenant_scope(organization_id):
+    token = _tenant.set(organization_id)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+class TenantQuerySet(models.QuerySet):
+
+    def for_tenant(self, tenant):
+        if tenant is None:
+            return self
+        if tenant is NO_ORGANIZATION:
+            return self.none()
+        return self.filter(organization_id=tenant)
+
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    """Manager filtering by the organization of the active tenant scope"""
+
+    def get_queryset(self):
+        return super().get_queryset().for_tenant(current_tenant())
+
+
+def _organization_field(model):
+    try:
+        return model._meta.get_field('organization')
+    except FieldDoesNotExist:
+        return None
+
+
+def restrict_fields(serializer, tenant):
+    """Make ``organization`` read-only and limit related fields to ``tenant``"""
+    for name, field in serializer.fields.items():
+        if name == 'organization':
+            field.read_only = True
+            continue
+
+        relation = field.child_relation if isinstance(field, serializers.ManyRelatedField) else field
+        if field.read_only or not isinstance(relation, serializers.RelatedField):
+            continue
+        queryset = relation.queryset
+        if queryset is None or _organization_field(queryset.model) is None:
+            continue
+        queryset = queryset.all()
+        relation.queryset = queryset.none() if tenant is NO_ORGANIZATION else queryset.filter(organization_id=tenant)
+
+
+class TenantScopedMixin:
+    """Run DRF views in the tenant scope of the authenticated user"""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _tenant.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _tenant.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Authentication has run; the scope lasts until dispatch() resets it
+        _tenant.set(tenant_of(request.user))
+
+    def get_queryset(self):
+        return super().get_queryset().for_tenant(current_tenant())
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        tenant = current_tenant()
+        if tenant is not None:
+            restrict_fields(getattr(serializer, 'child', serializer), tenant)
+        return serializer
+
+    def perform_create(self, serializer, **kwargs):
+        tenant = current_tenant()
+        if tenant is NO_ORGANIZATION:
+            raise PermissionDenied('You must belong to an organization.')
+        if tenant is not None:
+            kwargs['organization_id'] = tenant
+        serializer.save(**kwargs)
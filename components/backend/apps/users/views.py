@@ -5,11 +5,13 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import login, logout
-from django.utils import timezone
 
+from apps.api.conditional import ConditionalGetMixin
+from apps.api.realtime import AsyncAPIView, json_response
+from .authentication import mark_active, revoke_tokens, tokens_for_user
 from .models import User, Organization, UserProfile
+from .statistics import organization_statistics
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     OrganizationSerializer, LoginSerializer, ChangePasswordSerializer
@@ -25,19 +27,12 @@ class LoginView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         
-        # Update last activity
-        user.last_activity = timezone.now()
-        user.save(update_fields=['last_activity'])
-        
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        # Update last activity (written in batches)
+        mark_active(user.id)
         
         return Response({
             'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
+            'tokens': tokens_for_user(user),
         })
 
 
@@ -58,19 +53,13 @@ class RegisterView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        
         return Response({
             'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
+            'tokens': tokens_for_user(user),
         }, status=status.HTTP_201_CREATED)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """User CRUD operations"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -134,11 +123,15 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Set new password
+        # Set new password and revoke the tokens issued with the old one
         user.set_password(serializer.validated_data['new_password'])
+        revoke_tokens(user)
         user.save()
         
-        return Response({'detail': 'Password updated successfully.'})
+        return Response({
+            'detail': 'Password updated successfully.',
+            'tokens': tokens_for_user(user),
+        })
     
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
@@ -153,6 +146,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """Deactivate user"""
         user = self.get_object()
         user.is_active = False
+        revoke_tokens(user)
         user.save()
         return Response({'detail': 'User deactivated.'})
 
@@ -183,21 +177,49 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     def users(self, request, pk=None):
         """Get users of an organization"""
         organization = self.get_object()
-        users = User.objects.filter(organization=organization)
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        users = User.objects.select_related('organization', 'profile').filter(organization=organization).order_by('id')
+        
+        page = self.paginate_queryset(users)
+        if page is not None:
+            return self.get_paginated_response(UserSerializer(page, many=True).data)
+        
+        return Response(UserSerializer(users, many=True).data)
     
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         """Get organization statistics"""
         organization = self.get_object()
         
-        stats = {
-            'total_users': organization.users.count(),
-            'active_users': organization.users.filter(is_active=True).count(),
-            'agents': organization.users.filter(role=User.Role.AGENT).count(),
-            'supervisors': organization.users.filter(role=User.Role.SUPERVISOR).count(),
-            'managers': organization.users.filter(role=User.Role.MANAGER).count(),
-        }
+        return Response(organization_statistics(organization.id))
+
+
+class TopicGrantView(AsyncAPIView):
+    """
+    Pub/sub topics the caller may follow on the WebSocket hub (async, /api/rt/).
+    
+    The hub resolves a socket's token here when it connects. Admins may
+    follow every topic; everyone else only the agents, queues and
+    campaigns of their own organization.
+    """
+    
+    async def get(self, request):
+        from apps.campaigns.models import Campaign
+        from apps.queues.models import Queue
         
-        return Response(stats)
+        user = request.user
+        if user.role == User.Role.ADMIN:
+            return json_response({'user_id': user.id, 'organization_id': user.organization_id, 'all': True})
+        
+        # Queues and campaigns are already scoped to the caller's tenant
+        agents = []
+        if user.organization_id:
+            agents = [i async for i in User.objects.filter(organization_id=user.organization_id).values_list('id', flat=True)]
+        
+        return json_response({
+            'user_id': user.id,
+            'organization_id': user.organization_id,
+            'all': False,
+            'agents': agents,
+            'queues': [i async for i in Queue.objects.values_list('id', flat=True)],
+            'campaigns': [i async for i in Campaign.objects.values_list('id', flat=True)],
+        })
@@ -3,6 +3,7 @@ Celery configuration for OmniVoIP project.
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
@@ -29,16 +30,39 @@ app.conf.beat_schedule = {
         'task': 'apps.campaigns.tasks.update_campaign_statistics',
         'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
+    'flush-last-activity': {
+        'task': 'apps.users.tasks.flush_last_activity',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    'persist-agent-presence': {
+        'task': 'apps.agents.tasks.persist_agent_presence',
+        'schedule': 10.0,  # Every 10 seconds
+    },
     'check-agent-timeouts': {
         'task': 'apps.agents.tasks.check_agent_timeouts',
         'schedule': crontab(minute='*/1'),  # Every minute
     },
+    'refresh-call-volume-cube': {
+        'task': 'apps.reports.tasks.refresh_call_volume_cube',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'flush-queue-statistics': {
+        'task': 'apps.queues.tasks.flush_queue_statistics',
+        'schedule': crontab(minute='*/1'),  # Every minute
+    },
     'generate-daily-reports': {
         'task': 'apps.reports.tasks.generate_daily_reports',
         'schedule': crontab(hour=0, minute=30),  # Daily at 00:30
     },
 }
 
+@worker_process_shutdown.connect
+def close_database_pools(**kwargs):
+    """Release a prefork child's pooled database connections (DB_POOL)"""
+    from omnivoip.pooled_postgresql.base import close_pools
+    close_pools()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
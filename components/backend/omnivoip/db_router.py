@@ -0,0 +1,141 @@
+"""
+Primary/replica database routing
+
+Reads go to the primary unless code opts in to the `replica` alias:
+
+    with use_replica():
+        rows = list(Call.objects.filter(...))
+
+or, for viewsets, ReplicaReadMixin (GET/HEAD only). Writes always go to
+the primary. Inside a request, the first write pins the rest of the
+request to the primary, and a short-lived cookie keeps the client's next
+requests there too, so a client reads its own writes despite replication
+lag. Reads inside a transaction on the primary also stay there.
+
+Without a `replica` entry in DATABASES, everything runs on `default`.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+PIN_COOKIE = 'db_pin'
+
+
+class RoutingState:
+    """Routing decisions of the current request or task"""
+
+    __slots__ = ('replica', 'sticky', 'pinned', 'wrote')
+
+    def __init__(self, replica=False, sticky=False, pinned=False):
+        self.replica = replica
+        self.sticky = sticky
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send the block's reads to the replica (writes still go to the primary)"""
+    current = _state.get()
+    if current is None or not current.sticky:
+        token = _state.set(RoutingState(replica=True))
+        try:
+            yield
+        finally:
+            _state.reset(token)
+        return
+
+    # Inside a request: keep its state so a write still pins it
+    previous = current.replica
+    current.replica = True
+    try:
+        yield
+    finally:
+        current.replica = previous
+
+
+class PrimaryReplicaRouter:
+    """Route opted-in reads to the replica and pin to the primary after writes"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.pinned or not replica_configured():
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.sticky:
+            state.pinned = state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    """Give each request sticky routing state and carry the pin across requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = RoutingState(sticky=True, pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        # The async ORM's worker threads copy the context, so they share state
+        state = RoutingState(sticky=True, pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote and replica_configured():
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class ReplicaReadMixin:
+    """Viewset mixin serving safe requests from the replica"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return super().dispatch(request, *args, **kwargs)
+        with use_replica():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,3 @@
+"""
+PostgreSQL backend with a per-process psycopg connection pool
+"""
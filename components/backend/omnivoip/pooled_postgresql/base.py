@@ -0,0 +1,134 @@
+"""
+PostgreSQL backend with a per-process psycopg connection pool
+
+Django's own backend opens one connection per thread and, with
+CONN_MAX_AGE, keeps it between requests, so every Gunicorn/ASGI thread
+and Celery prefork child holds a Postgres backend even when idle. With
+this engine each process shares one bounded psycopg_pool.ConnectionPool
+per database alias instead:
+
+    'ENGINE': 'omnivoip.pooled_postgresql',
+    'CONN_MAX_AGE': 0,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'pool': {'min_size': 1, 'max_size': 4, 'timeout': 10}},
+
+A connection is checked out when Django connects and goes back to the pool
+when Django closes it: at the end of each request, and after each Celery
+task (Celery's Django fixup closes connections around tasks). The
+``pool`` options are passed to ConnectionPool. With CONN_HEALTH_CHECKS,
+connections are checked as they leave the pool. Without ``pool`` the
+backend behaves like django.db.backends.postgresql.
+
+Pools belong to the process that created them. A forked child (Celery
+prefork) ignores inherited pools and opens its own on first use.
+"""
+import logging
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+NO_DB_ALIAS = '__no_db__'
+
+# {alias: (pid, pool)}
+_pools = {}
+_lock = threading.Lock()
+
+
+def pool_stats():
+    """ConnectionPool.get_stats() of this process' pools, by alias"""
+    pid = os.getpid()
+    return {alias: pool.get_stats() for alias, (owner, pool) in _pools.items() if owner == pid}
+
+
+def close_pools():
+    """Close this process' pools, e.g. on shutdown"""
+    pid = os.getpid()
+    with _lock:
+        for alias, (owner, pool) in list(_pools.items()):
+            if owner == pid:
+                pool.close()
+            del _pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options or self.alias == NO_DB_ALIAS:
+            return None
+
+        pid = os.getpid()
+        owner, pool = _pools.get(self.alias, (None, None))
+        if owner == pid:
+            return pool
+
+        with _lock:
+            owner, pool = _pools.get(self.alias, (None, None))
+            if owner != pid:
+                # An inherited pool's connections and worker threads belong
+                # to the parent; psycopg never closes them from a child.
+                pool = self._create_pool({} if options is True else options)
+                _pools[self.alias] = (pid, pool)
+        return pool
+
+    def _create_pool(self, options):
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(f"Database '{self.alias}': pooled connections need CONN_MAX_AGE = 0.")
+
+        kwargs = self.get_connection_params()
+        # Django switches autocommit as needed once it has the connection
+        kwargs['autocommit'] = True
+        check = ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None
+        return ConnectionPool(
+            kwargs=kwargs,
+            check=check,
+            name=self.alias,
+            open=True,
+            **options,
+        )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        try:
+            connection = pool.getconn()
+        except PoolTimeout:
+            logger.warning(
+                "Timed out waiting for a connection from the '%s' pool", self.alias,
+                extra={'alias': self.alias, **pool.get_stats()},
+            )
+            raise
+
+        # As the parent does after connecting
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        if isolation_level is None:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+        else:
+            self.isolation_level = connection.isolation_level = base.IsolationLevel(isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self.pool
+        if pool is None:
+            return super()._close()
+
+        connection, self.connection = self.connection, None
+        with self.wrap_database_errors:
+            if connection._pool is pool:
+                pool.putconn(connection)
+            # else: checked out from an inherited pool, which isn't ours to use
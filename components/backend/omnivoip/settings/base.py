@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'omnivoip.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.api.queries.QueryCountMiddleware',
 ]
 
 ROOT_URLCONF = 'omnivoip.urls'
@@ -91,6 +93,39 @@ DATABASES = {
     }
 }
 
+# Pooled connections (omnivoip.pooled_postgresql): each process shares a
+# bounded pool per database instead of keeping a connection per thread
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
+if DB_POOL:
+    DATABASES['default'].update({
+        'ENGINE': 'omnivoip.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+    })
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=4, cast=int),
+        # Seconds to wait for a free connection before failing the query
+        'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+        # Idle connections above min_size are closed after this many seconds
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+    }
+
+# Optional read replica for reports, dashboards and stats rollups
+# (see omnivoip.db_router); without it every query uses the primary
+if config('POSTGRES_NODE_RO', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('POSTGRES_NODE_RO'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['omnivoip.db_router.PrimaryReplicaRouter']
+
+# After a write, the client's requests read from the primary for this long
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -132,7 +167,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -147,11 +182,21 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.api.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Per-request SQL instrumentation (apps.api.queries)
+QUERY_COUNT_HEADERS = config('QUERY_COUNT_HEADERS', default=False, cast=bool)
+QUERY_BUDGET = config('QUERY_BUDGET', default=50, cast=int)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+
 # JWT Settings
 from datetime import timedelta
 
@@ -160,7 +205,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Login activity goes through apps.users.authentication.mark_active
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -170,6 +216,9 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
 }
 
+# Seconds an authenticated user is served from the cache
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -179,6 +228,13 @@ CORS_ALLOWED_ORIGINS = config(
 CORS_ALLOW_CREDENTIALS = True
 
 # Channels
+# Per-connection outbound buffering (apps.api.buffers)
+WEBSOCKET_SEND_BUFFER = config('WEBSOCKET_SEND_BUFFER', default=256, cast=int)
+WEBSOCKET_DROP_POLICY = config('WEBSOCKET_DROP_POLICY', default='coalesce')
+WEBSOCKET_SEND_TIMEOUT = config('WEBSOCKET_SEND_TIMEOUT', default=5.0, cast=float)
+# Dashboard/campaign streams batch changes into one delta per interval (seconds)
+WEBSOCKET_DELTA_INTERVAL = config('WEBSOCKET_DELTA_INTERVAL', default=0.15, cast=float)
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
@@ -209,6 +265,13 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_RESULT_EXTENDED = True
 
+# Durable event bus (Redis Streams) shared with the dialer and the WebSocket hub
+EVENTS_REDIS_URL = config(
+    'EVENTS_REDIS_URL',
+    default=f"redis://{config('REDIS_HOST', default='localhost')}:{config('REDIS_PORT', default=6379)}/2"
+)
+EVENTS_STREAM = config('EVENTS_STREAM', default='bus:events')
+
 # Cache
 CACHES = {
     'default': {
@@ -295,6 +358,15 @@ ASTERISK_ARI_PORT = config('ASTERISK_ARI_PORT', default=8088, cast=int)
 ASTERISK_ARI_USER = config('ASTERISK_ARI_USER', default='admin')
 ASTERISK_ARI_PASSWORD = config('ASTERISK_ARI_PASSWORD', default='admin')
 
+# Queue service level (calls answered within this many seconds)
+QUEUE_SERVICE_LEVEL_THRESHOLD = config('QUEUE_SERVICE_LEVEL_THRESHOLD', default=20, cast=int)
+
+# Shared key the dialplan sends (X-Dialplan-Key header) to the call routing endpoint
+DIALPLAN_API_KEY = config('DIALPLAN_API_KEY', default='')
+
+# Seconds a contact claimed by a dialer (/api/rt/campaigns/<id>/claim/) is held
+DIALER_CLAIM_SECONDS = config('DIALER_CLAIM_SECONDS', default=120, cast=int)
+
 # Gearman Configuration
 GEARMAN_SERVER = config('GEARMAN_SERVER', default='localhost:4730')
 
@@ -19,6 +19,9 @@ CORS_ALLOW_ALL_ORIGINS = True
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 
+# Query count headers on every response
+QUERY_COUNT_HEADERS = True
+
 # Email backend (console for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -10,18 +10,21 @@ Funcionalidades:
 - Integración con backend Django
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from enum import Enum
 import asyncio
+import hmac
 import redis.asyncio as aioredis
 import httpx
+import json
 import logging
 import os
+import uuid
 
 # Configuración
 API_VERSION = "1.0.0"
@@ -36,6 +39,22 @@ ASTERISK_AMI_PORT = int(os.getenv("ASTERISK_AMI_PORT", "5038"))
 ASTERISK_AMI_USER = os.getenv("ASTERISK_AMI_USER", "dialer")
 ASTERISK_AMI_SECRET = os.getenv("ASTERISK_AMI_SECRET", "dialerpass123")
 
+# Bus de eventos (Redis Streams) compartido con el worker, el backend y el hub WebSocket
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://redis:6379/2")
+EVENTS_STREAM = os.getenv("EVENTS_STREAM", "bus:events")
+EVENTS_STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", "100000"))
+# Clave compartida con el dialplan (header X-Dialplan-Key) para publicar eventos
+DIALPLAN_API_KEY = os.getenv("DIALPLAN_API_KEY", "")
+
+# Eventos en tiempo real (SSE)
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_STATS_INTERVAL = float(os.getenv("SSE_STATS_INTERVAL", "2"))
+SSE_CLIENT_BUFFER = int(os.getenv("SSE_CLIENT_BUFFER", "1000"))
+
+# Cache de estadísticas del backend (segundos)
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "2"))
+STATS_BATCH_MAX = 100
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -60,6 +79,10 @@ app.add_middleware(
 
 # Redis connection pool
 redis_pool = None
+events_pool = None
+
+# Shared HTTP client for the Django backend (connection pooling / keep-alive)
+backend_http = None
 
 
 # ==================== MODELS ====================
@@ -142,6 +165,27 @@ class CallOriginate(BaseModel):
     variables: Optional[Dict[str, str]] = None
 
 
+class CallEventType(str, Enum):
+    ORIGINATED = "call.originated"
+    ANSWERED = "call.answered"
+    COMPLETED = "call.completed"
+    FAILED = "call.failed"
+    AGENT_AVAILABLE = "agent.available"
+    AGENT_BUSY = "agent.busy"
+
+
+class CallEvent(BaseModel):
+    type: CallEventType
+    call_id: Optional[str] = Field(None, description="Asterisk UNIQUEID")
+    campaign_id: Optional[int] = None
+    contact_id: Optional[int] = None
+    queue_id: Optional[int] = None
+    agent_id: Optional[int] = None
+    status: Optional[str] = Field(None, description="Disposición: busy, no_answer, failed...")
+    duration: Optional[float] = None
+    data: Optional[Dict[str, Any]] = None
+
+
 class CampaignStats(BaseModel):
     campaign_id: int
     total_contacts: int
@@ -174,10 +218,107 @@ async def get_redis():
     return redis_pool
 
 
+async def get_events_redis():
+    """Get Redis connection holding the event bus stream"""
+    global events_pool
+    if events_pool is None:
+        events_pool = await aioredis.from_url(
+            EVENTS_REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=10
+        )
+    return events_pool
+
+
+async def require_dialplan_key(x_dialplan_key: str = Header("")):
+    """Only producers presenting the shared dialplan key may publish events"""
+    if not DIALPLAN_API_KEY:
+        # Fail closed: without a configured key nobody may write CDR events
+        logger.error("DIALPLAN_API_KEY is not set; rejecting event")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Event ingestion is not configured")
+    if not hmac.compare_digest(x_dialplan_key.encode(), DIALPLAN_API_KEY.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid dialplan key")
+
+
 async def get_backend_client():
     """Get HTTP client for backend"""
-    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=10.0) as client:
-        yield client
+    global backend_http
+    if backend_http is None:
+        backend_http = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return backend_http
+
+
+class TTLCache:
+    """
+    Small async cache with request coalescing.
+    
+    Concurrent misses for the same key share one in-flight fetch
+    (single-flight); results are kept for ``ttl`` seconds. Failures are
+    propagated to every waiter and never cached. If the request doing the
+    fetch is cancelled, one of its waiters takes over. Expired entries are
+    pruned on write and at most ``max_size`` are kept.
+    """
+    
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._values = {}
+        self._inflight = {}
+    
+    async def get(self, key, fetch):
+        loop = asyncio.get_running_loop()
+        cached = self._values.get(key)
+        if cached is not None and cached[0] > loop.time():
+            return cached[1]
+        
+        future = self._inflight.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only swallow the fetcher's cancellation, never our own
+                if not future.cancelled():
+                    raise
+            future = self._inflight.get(key)
+        
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self._store(key, value, loop.time())
+            future.set_result(value)
+            return value
+        finally:
+            # Cancelled (or otherwise interrupted): release the waiters
+            if not future.done():
+                future.cancel()
+            del self._inflight[key]
+    
+    def _store(self, key, value, now):
+        # Entries share one ttl, so insertion order is expiry order
+        self._values.pop(key, None)
+        for stale, (expires, _) in list(self._values.items()):
+            if expires > now and len(self._values) < self.max_size:
+                break
+            del self._values[stale]
+        self._values[key] = (now + self.ttl, value)
+    
+    def clear(self):
+        self._values.clear()
+
+
+stats_cache = TTLCache(STATS_CACHE_TTL)
 
 
 # ==================== AMI CONNECTION ====================
@@ -246,8 +387,9 @@ class AsteriskAMI:
     
     async def originate(self, channel: str, context: str, exten: str, 
                        priority: int = 1, timeout: int = 30, 
-                       caller_id: str = "", variables: Dict[str, str] = None) -> Dict[str, Any]:
-        """Originate a call"""
+                       caller_id: str = "", variables: Dict[str, str] = None,
+                       channel_id: str = "") -> Dict[str, Any]:
+        """Originate a call; ``channel_id`` becomes the channel's UNIQUEID"""
         if not self.connected:
             await self.connect()
         
@@ -268,6 +410,9 @@ class AsteriskAMI:
         if caller_id:
             action += f"CallerID: {caller_id}\r\n"
         
+        if channel_id:
+            action += f"ChannelId: {channel_id}\r\n"
+        
         if var_str:
             action += f"Variable: {var_str}\r\n"
         
@@ -297,6 +442,201 @@ class AsteriskAMI:
 ami = AsteriskAMI()
 
 
+# ==================== REAL-TIME EVENTS ====================
+
+def _stream_id(event_id: str) -> tuple:
+    """Comparable form of a Redis Stream id ("<ms>-<seq>")"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _sse_frame(event_type: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    frame = f"id: {event_id}\n" if event_id else ""
+    return frame + f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# Compact field names of bus entries (see the backend's apps.calls.events)
+EVENT_FIELDS = {
+    "type": "t", "timestamp": "ts", "organization_id": "o", "campaign_id": "c",
+    "contact_id": "k", "call_id": "u", "queue_id": "q", "agent_id": "a",
+    "status": "s", "duration": "d",
+}
+_EVENT_NAMES = {short: name for name, short in EVENT_FIELDS.items()}
+_INTEGER_FIELDS = {"organization_id", "campaign_id", "contact_id", "queue_id", "agent_id"}
+
+
+def encode_event(event: Dict[str, Any]) -> Dict[str, str]:
+    """Stream entry fields for an event; unknown keys travel as JSON under x"""
+    fields, extra = {}, {}
+    for name, value in event.items():
+        if value is None:
+            continue
+        short = EVENT_FIELDS.get(name)
+        if short is None:
+            extra[name] = value
+        else:
+            fields[short] = str(value)
+    if extra:
+        fields["x"] = json.dumps(extra, separators=(",", ":"))
+    return fields
+
+
+def decode_event(event_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    event = {"id": event_id}
+    for short, value in fields.items():
+        if short == "x":
+            event.update(json.loads(value))
+            continue
+        name = _EVENT_NAMES.get(short, short)
+        if name in _INTEGER_FIELDS:
+            value = int(value)
+        elif name == "timestamp":
+            value = datetime.fromtimestamp(int(value) / 1000).isoformat()
+        elif name == "duration":
+            value = float(value)
+        event[name] = value
+    return event
+
+
+async def publish_event(event_type: str, campaign_id: Optional[int] = None, **data) -> str:
+    """
+    Append an event to the bus stream.
+    
+    The stream is trimmed to about EVENTS_STREAM_MAXLEN entries; consumer
+    groups (worker, CDR writer, WebSocket hub) and SSE clients read from it.
+    """
+    events_redis = await get_events_redis()
+    return await events_redis.xadd(
+        EVENTS_STREAM,
+        encode_event({
+            "type": event_type,
+            "timestamp": int(datetime.now().timestamp() * 1000),
+            "campaign_id": campaign_id,
+            **data,
+        }),
+        maxlen=EVENTS_STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+class EventClient:
+    """One SSE connection: its filters and bounded frame queue"""
+    
+    def __init__(self, campaign_ids: Optional[List[int]] = None, types: Optional[List[str]] = None):
+        self.campaign_ids = set(campaign_ids) if campaign_ids else None
+        self.types = set(types) if types else None
+        self.queue = asyncio.Queue(maxsize=SSE_CLIENT_BUFFER)
+        self.lagged = False
+    
+    def matches(self, event_type: str, campaign_id) -> bool:
+        if self.types is not None and event_type not in self.types:
+            return False
+        if self.campaign_ids is not None and campaign_id not in self.campaign_ids:
+            return False
+        return True
+    
+    def push(self, frame: str):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # End the stream; the client reconnects and resumes with Last-Event-ID
+            self.lagged = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBroker:
+    """Single bus reader shared by all SSE clients of this process"""
+    
+    def __init__(self):
+        self.clients = set()
+        self.redis = None
+        self._tasks = []
+        self._last_stats = {}
+    
+    async def start(self, redis_client):
+        self.redis = redis_client
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._poll_stats()),
+        ]
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def register(self, client: EventClient):
+        self.clients.add(client)
+    
+    def unregister(self, client: EventClient):
+        self.clients.discard(client)
+    
+    def dispatch(self, event_type: str, campaign_id, frame: str):
+        for client in self.clients:
+            if client.matches(event_type, campaign_id):
+                client.push(frame)
+    
+    async def _listen(self):
+        # Plain XREAD from the tail: every process fans out all new events
+        last_id = "$"
+        while True:
+            try:
+                events_redis = await get_events_redis()
+                response = await events_redis.xread({EVENTS_STREAM: last_id}, count=500, block=5000)
+                for _, entries in response or []:
+                    for event_id, fields in entries:
+                        last_id = event_id
+                        if not self.clients:
+                            continue
+                        event = decode_event(event_id, fields)
+                        # Serialized once, shared by every matching client
+                        frame = _sse_frame(event["type"], event, event_id)
+                        self.dispatch(event["type"], event.get("campaign_id"), frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event stream read error: {e}")
+                await asyncio.sleep(1)
+    
+    async def _poll_stats(self):
+        """Push campaign counters to the clients watching them when they change"""
+        while True:
+            await asyncio.sleep(SSE_STATS_INTERVAL)
+            campaign_ids = set()
+            for client in self.clients:
+                if client.campaign_ids and (client.types is None or "stats" in client.types):
+                    campaign_ids |= client.campaign_ids
+            if not campaign_ids:
+                self._last_stats.clear()
+                continue
+            
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                ordered = sorted(campaign_ids)
+                for campaign_id in ordered:
+                    pipe.hgetall(f"campaign:{campaign_id}")
+                snapshots = await pipe.execute()
+            except Exception as e:
+                logger.error(f"Stats poll error: {e}")
+                continue
+            
+            for campaign_id, counters in zip(ordered, snapshots):
+                if not counters or counters == self._last_stats.get(campaign_id):
+                    continue
+                self._last_stats[campaign_id] = counters
+                frame = _sse_frame("stats", {"campaign_id": campaign_id, **counters})
+                self.dispatch("stats", campaign_id, frame)
+            for campaign_id in set(self._last_stats) - campaign_ids:
+                del self._last_stats[campaign_id]
+
+
+event_broker = EventBroker()
+
+
 # ==================== STARTUP/SHUTDOWN ====================
 
 @app.on_event("startup")
@@ -308,7 +648,10 @@ async def startup_event():
     await ami.connect()
     
     # Initialize Redis
-    await get_redis()
+    redis_client = await get_redis()
+    
+    # Shared subscription feeding every SSE client
+    await event_broker.start(redis_client)
     
     logger.info("Dialer API started successfully")
 
@@ -321,9 +664,16 @@ async def shutdown_event():
     # Disconnect AMI
     await ami.disconnect()
     
+    await event_broker.stop()
+    
+    if backend_http:
+        await backend_http.aclose()
+    
     # Close Redis
     if redis_pool:
         await redis_pool.close()
+    if events_pool:
+        await events_pool.close()
     
     logger.info("Dialer API shutdown complete")
 
@@ -387,6 +737,44 @@ async def create_campaign(
         raise HTTPException(status_code=500, detail="Backend communication error")
 
 
+# Declared before /campaigns/{campaign_id} so "stats" isn't taken for an id
+@app.get("/campaigns/stats", response_model=List[CampaignStats])
+async def get_campaigns_stats(
+    ids: str = Query(..., description="IDs de campaña separados por coma, ej. 1,2,3"),
+    backend: httpx.AsyncClient = Depends(get_backend_client)
+):
+    """Get statistics for several campaigns at once"""
+    try:
+        campaign_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if not campaign_ids or len(campaign_ids) > STATS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {STATS_BATCH_MAX} ids are required")
+    
+    try:
+        redis_client = await get_redis()
+        pipe = redis_client.pipeline(transaction=False)
+        for campaign_id in campaign_ids:
+            pipe.hgetall(f"campaign:{campaign_id}")
+        counters = dict(zip(campaign_ids, await pipe.execute()))
+        
+        # Unknown campaigns are left out of the response
+        found = [campaign_id for campaign_id in campaign_ids if counters[campaign_id]]
+        queue_stats, *backend_stats = await asyncio.gather(
+            _backend_queue_stats(backend),
+            *(_backend_campaign_stats(backend, campaign_id) for campaign_id in found)
+        )
+        
+        return [
+            _campaign_stats(campaign_id, counters[campaign_id], stats, queue_stats)
+            for campaign_id, stats in zip(found, backend_stats)
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error getting stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/campaigns/{campaign_id}")
 async def get_campaign(
     campaign_id: int,
@@ -460,10 +848,7 @@ async def start_campaign(
         )
         
         # Trigger dialer worker (via Celery task)
-        await redis_client.publish(
-            "dialer:events",
-            f"campaign:started:{campaign_id}"
-        )
+        await publish_event("campaign.started", campaign_id)
         
         logger.info(f"Campaign {campaign_id} started")
         return {"status": "success", "message": "Campaign started"}
@@ -484,10 +869,7 @@ async def pause_campaign(campaign_id: int):
         CampaignStatus.PAUSED
     )
     
-    await redis_client.publish(
-        "dialer:events",
-        f"campaign:paused:{campaign_id}"
-    )
+    await publish_event("campaign.paused", campaign_id)
     
     logger.info(f"Campaign {campaign_id} paused")
     return {"status": "success", "message": "Campaign paused"}
@@ -506,10 +888,7 @@ async def stop_campaign(campaign_id: int):
         }
     )
     
-    await redis_client.publish(
-        "dialer:events",
-        f"campaign:stopped:{campaign_id}"
-    )
+    await publish_event("campaign.stopped", campaign_id)
     
     logger.info(f"Campaign {campaign_id} stopped")
     return {"status": "success", "message": "Campaign stopped"}
@@ -517,6 +896,50 @@ async def stop_campaign(campaign_id: int):
 
 # ==================== STATISTICS ====================
 
+async def _backend_campaign_stats(backend: httpx.AsyncClient, campaign_id: int) -> Dict[str, Any]:
+    async def fetch():
+        response = await backend.get(f"/api/campaigns/{campaign_id}/stats/")
+        return response.json() if response.status_code == 200 else {}
+    return await stats_cache.get(("campaign", campaign_id), fetch)
+
+
+async def _backend_queue_stats(backend: httpx.AsyncClient) -> Dict[str, Any]:
+    # Global: shared by every campaign instead of refetched per campaign
+    async def fetch():
+        response = await backend.get("/api/queues/stats/")
+        return response.json() if response.status_code == 200 else {}
+    return await stats_cache.get(("queues",), fetch)
+
+
+def _campaign_stats(
+    campaign_id: int,
+    campaign_data: Dict[str, str],
+    backend_stats: Dict[str, Any],
+    queue_stats: Dict[str, Any],
+) -> CampaignStats:
+    # Calculate rates
+    total_calls = int(campaign_data.get("total_calls", 0))
+    answered = int(campaign_data.get("answered_calls", 0))
+    answer_rate = (answered / total_calls * 100) if total_calls > 0 else 0.0
+    
+    return CampaignStats(
+        campaign_id=campaign_id,
+        total_contacts=backend_stats.get("total_contacts", 0),
+        pending_calls=backend_stats.get("pending_calls", 0),
+        active_calls=int(campaign_data.get("active_calls", 0)),
+        completed_calls=total_calls,
+        answered_calls=answered,
+        no_answer=backend_stats.get("no_answer", 0),
+        busy=backend_stats.get("busy", 0),
+        failed=backend_stats.get("failed", 0),
+        answer_rate=round(answer_rate, 2),
+        average_duration=backend_stats.get("avg_duration", 0.0),
+        calls_per_hour=backend_stats.get("calls_per_hour", 0.0),
+        agents_available=queue_stats.get("available", 0),
+        agents_busy=queue_stats.get("busy", 0)
+    )
+
+
 @app.get("/campaigns/{campaign_id}/stats", response_model=CampaignStats)
 async def get_campaign_stats(
     campaign_id: int,
@@ -532,36 +955,16 @@ async def get_campaign_stats(
         if not campaign_data:
             raise HTTPException(status_code=404, detail="Campaign not found")
         
-        # Get detailed stats from backend
-        response = await backend.get(f"/api/campaigns/{campaign_id}/stats/")
-        backend_stats = response.json() if response.status_code == 200 else {}
-        
-        # Get queue stats from Asterisk (via backend)
-        queue_response = await backend.get(f"/api/queues/stats/")
-        queue_stats = queue_response.json() if queue_response.status_code == 200 else {}
-        
-        # Calculate rates
-        total_calls = int(campaign_data.get("total_calls", 0))
-        answered = int(campaign_data.get("answered_calls", 0))
-        answer_rate = (answered / total_calls * 100) if total_calls > 0 else 0.0
-        
-        return CampaignStats(
-            campaign_id=campaign_id,
-            total_contacts=backend_stats.get("total_contacts", 0),
-            pending_calls=backend_stats.get("pending_calls", 0),
-            active_calls=int(campaign_data.get("active_calls", 0)),
-            completed_calls=total_calls,
-            answered_calls=answered,
-            no_answer=backend_stats.get("no_answer", 0),
-            busy=backend_stats.get("busy", 0),
-            failed=backend_stats.get("failed", 0),
-            answer_rate=round(answer_rate, 2),
-            average_duration=backend_stats.get("avg_duration", 0.0),
-            calls_per_hour=backend_stats.get("calls_per_hour", 0.0),
-            agents_available=queue_stats.get("available", 0),
-            agents_busy=queue_stats.get("busy", 0)
+        # Detailed stats and queue stats from backend, cached and coalesced
+        backend_stats, queue_stats = await asyncio.gather(
+            _backend_campaign_stats(backend, campaign_id),
+            _backend_queue_stats(backend),
         )
         
+        return _campaign_stats(campaign_id, campaign_data, backend_stats, queue_stats)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -586,6 +989,10 @@ async def originate_call(call: CallOriginate):
         if call.variables:
             variables.update(call.variables)
         
+        # Our own UNIQUEID for the channel, so the dialplan's call events
+        # and the CDR writer refer to the call by the same id
+        call_id = f"dialer-{uuid.uuid4().hex}"
+        
         # Originate via AMI
         response = await ami.originate(
             channel=channel,
@@ -593,15 +1000,27 @@ async def originate_call(call: CallOriginate):
             exten=call.phone_number,
             priority=call.priority,
             timeout=call.timeout,
-            variables=variables
+            variables=variables,
+            channel_id=call_id,
         )
+        success = response.get("Response") == "Success"
         
         # Update Redis counter
         redis_client = await get_redis()
         await redis_client.hincrby(f"campaign:{call.campaign_id}", "total_calls", 1)
         await redis_client.hincrby(f"campaign:{call.campaign_id}", "active_calls", 1)
+        # Without a call_id the CDR writer skips the event, so a failed
+        # originate doesn't leave a call that never ends
+        await publish_event(
+            "call.originated",
+            call.campaign_id,
+            call_id=call_id if success else None,
+            contact_id=call.contact_id,
+            phone_number=call.phone_number,
+            success=success,
+        )
         
-        if response.get("Response") == "Success":
+        if success:
             logger.info(f"Call originated: {call.phone_number}")
             return {
                 "status": "success",
@@ -664,13 +1083,97 @@ async def bulk_import_contacts(
         raise HTTPException(status_code=500, detail="Bulk import failed")
 
 
-# ==================== WEBSOCKET EVENTS ====================
+# ==================== CALL EVENTS ====================
+
+@app.post("/events", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_dialplan_key)])
+async def ingest_call_event(event: CallEvent):
+    """Accept a call/agent event (from AMI/ARI or the dialplan) onto the bus"""
+    # Extra data can't override the event's own fields (nor publish_event's arguments)
+    fields = {
+        key: value for key, value in (event.data or {}).items()
+        if key not in ("type", "event_type", "campaign_id", "timestamp")
+    }
+    fields.update(event.dict(exclude={"type", "campaign_id", "data"}, exclude_none=True))
+    event_id = await publish_event(event.type.value, event.campaign_id, **fields)
+    return {"id": event_id}
+
+
+# ==================== SERVER-SENT EVENTS ====================
+
+async def _replay_events(client: EventClient, last_event_id: str):
+    """Frames for stream events after ``last_event_id`` that match the client"""
+    events_redis = await get_events_redis()
+    start = f"({last_event_id}"
+    while True:
+        entries = await events_redis.xrange(EVENTS_STREAM, min=start, count=500)
+        if not entries:
+            return
+        for event_id, fields in entries:
+            event = decode_event(event_id, fields)
+            if client.matches(event["type"], event.get("campaign_id")):
+                yield event_id, _sse_frame(event["type"], event, event_id)
+        start = f"({entries[-1][0]}"
+
 
 @app.get("/events/stream")
-async def event_stream():
+async def event_stream(
+    request: Request,
+    campaign_id: Optional[List[int]] = Query(None, description="Solo eventos de estas campañas"),
+    types: Optional[str] = Query(None, description="Tipos separados por coma, ej. campaign.started,stats"),
+    last_event_id: Optional[str] = Query(None, description="Alternativa al header Last-Event-ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
     """SSE endpoint for real-time events"""
-    # TODO: Implement Server-Sent Events for real-time updates
-    return {"message": "Use WebSocket endpoint for real-time events"}
+    resume_from = last_event_id_header or last_event_id
+    if resume_from:
+        try:
+            _stream_id(resume_from)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    
+    client = EventClient(
+        campaign_ids=campaign_id,
+        types=[t.strip() for t in types.split(",") if t.strip()] if types else None,
+    )
+    
+    async def generate():
+        # Registered once streaming starts, so the finally below always
+        # unregisters it, and before the replay so nothing is lost meanwhile
+        event_broker.register(client)
+        try:
+            yield f"retry: {int(SSE_HEARTBEAT_INTERVAL * 1000)}\n\n"
+            
+            replayed = None
+            if resume_from:
+                async for event_id, frame in _replay_events(client, resume_from):
+                    replayed = _stream_id(event_id)
+                    yield frame
+            
+            while True:
+                try:
+                    frame = await asyncio.wait_for(client.queue.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                if frame is None:
+                    break
+                # Skip live events already sent during the replay
+                if replayed and frame.startswith("id: "):
+                    if _stream_id(frame[4:frame.index("\n")]) <= replayed:
+                        continue
+                    replayed = None
+                yield frame
+        finally:
+            event_broker.unregister(client)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
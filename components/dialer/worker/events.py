@@ -0,0 +1,158 @@
+"""
+OmniVoIP Dialer Worker - Event bus consumer
+
+Lee los eventos de llamadas del stream de Redis (grupo "worker") en lotes,
+aplica los contadores de campaña y actualiza los contactos en el backend.
+Los eventos solo se confirman (XACK) después de procesar el lote, así que
+un reinicio los vuelve a entregar en lugar de perderlos. Las entradas que
+no se pueden decodificar o aplicar se mueven al stream "<stream>:dead" y
+se confirman, para que una entrada inválida no bloquee el resto.
+
+Uso:
+    python events.py
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+import redis
+
+from tasks import apply_call_event, send_contact_updates
+
+# Configuración
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://redis:6379/2")
+EVENTS_STREAM = os.getenv("EVENTS_STREAM", "bus:events")
+EVENTS_GROUP = "worker"
+EVENTS_CONSUMER = os.getenv("EVENTS_CONSUMER", socket.gethostname())
+BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "200"))
+BLOCK_MS = 5000
+CLAIM_IDLE_MS = 60 * 1000
+DEAD_LETTER_MAXLEN = 10000
+
+# Errores que justifican reintentar el lote; cualquier otro invalida la entrada
+TRANSIENT_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Campos compactos de las entradas del stream
+FIELDS = {
+    "t": "type", "ts": "timestamp", "o": "organization_id", "c": "campaign_id",
+    "k": "contact_id", "u": "call_id", "q": "queue_id", "a": "agent_id",
+    "s": "status", "d": "duration",
+}
+INTEGER_FIELDS = {"organization_id", "campaign_id", "contact_id", "queue_id", "agent_id", "timestamp"}
+
+
+def decode(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Event dict from a stream entry's compact fields"""
+    event = json.loads(fields["x"]) if fields.get("x") else {}
+    for short, value in fields.items():
+        name = FIELDS.get(short)
+        if name is None:
+            continue
+        event[name] = int(value) if name in INTEGER_FIELDS else value
+    return event
+
+
+def dead_letter(client: redis.Redis, entry_id: str, fields: Dict[str, str], error: Exception):
+    """Move a rejected entry to "<stream>:dead" with the reason"""
+    logger.warning(f"Dead-lettering event {entry_id}: {error}")
+    client.xadd(
+        f"{EVENTS_STREAM}:dead",
+        {**fields, "entry_id": entry_id, "group": EVENTS_GROUP, "error": str(error)[:500]},
+        maxlen=DEAD_LETTER_MAXLEN,
+        approximate=True,
+    )
+
+
+def handle_batch(client: redis.Redis, entries: List[tuple]) -> int:
+    """
+    Apply a batch of entries; contact updates go out concurrently.
+    
+    Counters are applied at most once per entry id, so a batch retried
+    after a transient error doesn't count its events twice.
+    """
+    contact_updates = []
+    handled = 0
+    for entry_id, fields in entries:
+        if not fields:
+            continue
+        try:
+            event = decode(fields)
+            if event.get("type", "").split(".")[0] not in ("call", "agent"):
+                continue
+            contact_updates.extend(apply_call_event(event["type"], event, event_id=entry_id))
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            dead_letter(client, entry_id, fields, e)
+            continue
+        handled += 1
+    
+    if contact_updates:
+        asyncio.run(send_contact_updates(contact_updates))
+    return handled
+
+
+def ensure_group(client: redis.Redis):
+    try:
+        client.xgroup_create(EVENTS_STREAM, EVENTS_GROUP, id="$", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consume():
+    """Consumer loop of the worker group"""
+    client = redis.from_url(EVENTS_REDIS_URL, decode_responses=True)
+    ensure_group(client)
+    logger.info(f"Consuming {EVENTS_STREAM} as {EVENTS_GROUP}/{EVENTS_CONSUMER}")
+    
+    # Pendientes propios primero (de antes de un reinicio), luego nuevos
+    cursor = "0"
+    last_claim = 0
+    while True:
+        try:
+            if time.monotonic() - last_claim > CLAIM_IDLE_MS / 1000:
+                last_claim = time.monotonic()
+                # Tomar lo que dejaron consumidores caídos
+                claimed = client.xautoclaim(
+                    EVENTS_STREAM, EVENTS_GROUP, EVENTS_CONSUMER, CLAIM_IDLE_MS, count=BATCH_SIZE
+                )[1]
+                if claimed:
+                    cursor = "0"
+                    continue
+            
+            response = client.xreadgroup(
+                EVENTS_GROUP, EVENTS_CONSUMER, {EVENTS_STREAM: cursor},
+                count=BATCH_SIZE, block=BLOCK_MS
+            )
+            entries = response[0][1] if response else []
+            
+            if not entries:
+                cursor = ">"
+                continue
+            
+            handled = handle_batch(client, entries)
+            client.xack(EVENTS_STREAM, EVENTS_GROUP, *[entry_id for entry_id, _ in entries])
+            logger.debug(f"Handled {handled} of {len(entries)} events")
+            
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Event bus connection error: {e}")
+            # Reintentar los pendientes propios; los contadores ya aplicados no se repiten
+            cursor = "0"
+            time.sleep(1)
+        except Exception as e:
+            logger.error(f"Error handling event batch: {e}")
+            cursor = "0"
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    consume()
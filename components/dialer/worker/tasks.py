@@ -25,6 +25,20 @@ import json
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://django:8000")
 DIALER_API_URL = os.getenv("DIALER_API_URL", "http://dialer-api:8001")
+# Redis database holding the backend's real-time agent presence store
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "redis://redis:6379/1")
+# Backend service account of the dialer; an administrator, since it
+# works for every organization
+BACKEND_EMAIL = os.getenv("BACKEND_EMAIL", "")
+BACKEND_PASSWORD = os.getenv("BACKEND_PASSWORD", "")
+# Most contacts one claim request may return (the backend's MAX_CLAIM)
+MAX_CLAIM = 100
+
+# Dialer outcomes as backend Contact statuses; anything else (failures,
+# dispositions) puts the contact back in the pool. The claim already
+# counted the attempt, so the backend stops offering it after
+# max_calls_per_contact attempts.
+CONTACT_STATUSES = {'answered': 'CONTACTED', 'completed': 'CONTACTED'}
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -47,8 +61,9 @@ app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
-# Redis client
+# Redis clients
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+presence_client = redis.from_url(PRESENCE_REDIS_URL, decode_responses=True)
 
 
 # ==================== HELPER FUNCTIONS ====================
@@ -58,50 +73,94 @@ async def get_http_client():
     return httpx.AsyncClient(timeout=30.0)
 
 
+# Access token of the service account, shared by the requests of this process
+_backend_token: Dict[str, str] = {}
+
+
+async def _backend_login(client: httpx.AsyncClient) -> Optional[str]:
+    response = await client.post(
+        f"{BACKEND_URL}/api/auth/login/",
+        json={'email': BACKEND_EMAIL, 'password': BACKEND_PASSWORD}
+    )
+    if response.status_code != 200:
+        logger.error(f"Backend login failed: {response.status_code}")
+        return None
+    _backend_token['access'] = response.json()['tokens']['access']
+    return _backend_token['access']
+
+
+async def backend_request(client: httpx.AsyncClient, method: str, path: str,
+                          headers: Optional[Dict[str, str]] = None, **kwargs) -> httpx.Response:
+    """Backend request as the service account; logs in again once on 401"""
+    headers = dict(headers or {})
+    token = _backend_token.get('access') or await _backend_login(client)
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    response = await client.request(method, f"{BACKEND_URL}{path}", headers=headers, **kwargs)
+    
+    if response.status_code == 401 and token:
+        # Expired or revoked access token
+        _backend_token.pop('access', None)
+        token = await _backend_login(client)
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+            response = await client.request(method, f"{BACKEND_URL}{path}", headers=headers, **kwargs)
+    return response
+
+
+# Campaign configs with their ETag, revalidated with If-None-Match
+_campaign_configs: Dict[int, tuple] = {}
+
+
 async def get_campaign_config(campaign_id: int) -> Optional[Dict[str, Any]]:
     """Get campaign configuration from backend"""
     try:
+        cached = _campaign_configs.get(campaign_id)
+        headers = {'If-None-Match': cached[0]} if cached else {}
         async with await get_http_client() as client:
-            response = await client.get(f"{BACKEND_URL}/api/campaigns/{campaign_id}/")
+            response = await backend_request(client, "GET", f"/api/campaigns/{campaign_id}/", headers=headers)
+            if response.status_code == 304 and cached:
+                return cached[1]
             if response.status_code == 200:
-                return response.json()
+                config = response.json()
+                etag = response.headers.get('ETag')
+                if etag:
+                    _campaign_configs[campaign_id] = (etag, config)
+                return config
+            _campaign_configs.pop(campaign_id, None)
             return None
     except Exception as e:
         logger.error(f"Error getting campaign config: {e}")
         return None
 
 
-async def get_available_agents(queue_name: str) -> int:
-    """Get number of available agents in queue"""
+def get_available_agents(queue_id: int) -> int:
+    """Get number of available agents in queue from the presence store"""
+    if not queue_id:
+        return 0
     try:
-        async with await get_http_client() as client:
-            response = await client.get(f"{BACKEND_URL}/api/queues/{queue_name}/agents/")
-            if response.status_code == 200:
-                data = response.json()
-                # Count agents with status "available" or "idle"
-                available = sum(1 for agent in data if agent.get('status') in ['available', 'idle'])
-                return available
-            return 0
+        return presence_client.scard(f"presence:queue:{queue_id}:available")
     except Exception as e:
         logger.error(f"Error getting available agents: {e}")
         return 0
 
 
 async def get_pending_contacts(campaign_id: int, limit: int = 100) -> List[Dict[str, Any]]:
-    """Get pending contacts for campaign"""
+    """
+    Claim dialable contacts of a campaign, in dialing order.
+    
+    The backend holds each claimed contact for a while, so concurrent
+    workers never dial the same one, and counts the attempt.
+    """
     try:
         async with await get_http_client() as client:
-            response = await client.get(
-                f"{BACKEND_URL}/api/contacts/",
-                params={
-                    'campaign_id': campaign_id,
-                    'status': 'pending',
-                    'limit': limit,
-                    'ordering': '-priority,created_at'
-                }
+            response = await backend_request(
+                client, "POST", f"/api/rt/campaigns/{campaign_id}/claim/",
+                json={'limit': max(1, min(limit, MAX_CLAIM))}
             )
             if response.status_code == 200:
-                return response.json().get('results', [])
+                return response.json().get('contacts', [])
+            logger.error(f"Claiming contacts failed: {response.status_code} - {response.text}")
             return []
     except Exception as e:
         logger.error(f"Error getting contacts: {e}")
@@ -136,17 +195,13 @@ async def originate_call(campaign_id: int, contact_id: int, phone_number: str) -
         return False
 
 
-async def update_contact_status(contact_id: int, status: str, attempts: int = None):
+async def update_contact_status(contact_id: int, status: str) -> bool:
     """Update contact status in backend"""
     try:
-        data = {'status': status}
-        if attempts is not None:
-            data['attempts'] = attempts
-        
         async with await get_http_client() as client:
-            response = await client.patch(
-                f"{BACKEND_URL}/api/contacts/{contact_id}/",
-                json=data
+            response = await backend_request(
+                client, "POST", f"/api/rt/contacts/{contact_id}/status/",
+                json={'status': CONTACT_STATUSES.get(status.lower(), 'NEW')}
             )
             return response.status_code == 200
             
@@ -240,10 +295,10 @@ async def process_campaign(campaign_id: int) -> Dict[str, Any]:
         logger.error(f"Campaign {campaign_id} configuration not found")
         return {'status': 'error', 'reason': 'config_not_found'}
     
-    queue_name = campaign_config.get('queue_name')
+    queue_id = campaign_config.get('queue')
     
     # Get available agents
-    available_agents = await get_available_agents(queue_name)
+    available_agents = get_available_agents(queue_id)
     logger.info(f"Campaign {campaign_id}: {available_agents} agents available")
     
     # Get active calls count
@@ -303,26 +358,16 @@ async def process_campaign(campaign_id: int) -> Dict[str, Any]:
     
     for contact in contacts[:calls_to_make]:
         contact_id = contact['id']
-        phone_number = contact['phone_number']
+        phone_number = contact['phone']
         
-        # Update contact to "dialing"
-        await update_contact_status(contact_id, 'dialing')
-        
-        # Originate call
+        # Originate call; the claim holds the contact meanwhile
         success = await originate_call(campaign_id, contact_id, phone_number)
         
         if success:
             dialed += 1
         else:
+            # Offered again once the claim expires, within max_calls_per_contact
             failed += 1
-            # Update contact back to pending or failed
-            attempts = contact.get('attempts', 0) + 1
-            max_retries = campaign_config.get('max_retries', 3)
-            
-            if attempts >= max_retries:
-                await update_contact_status(contact_id, 'failed', attempts)
-            else:
-                await update_contact_status(contact_id, 'pending', attempts)
         
         # Small delay between calls
         await asyncio.sleep(0.1)
@@ -371,8 +416,8 @@ async def retry_contacts(campaign_id: int) -> Dict[str, Any]:
             # Get contacts with status='no_answer' or 'busy' and last_attempt > retry_delay ago
             cutoff_time = (datetime.now() - timedelta(seconds=retry_delay)).isoformat()
             
-            response = await client.get(
-                f"{BACKEND_URL}/api/contacts/",
+            response = await backend_request(
+                client, "GET", "/api/contacts/",
                 params={
                     'campaign_id': campaign_id,
                     'status': 'no_answer,busy',
@@ -434,8 +479,8 @@ async def update_statistics(campaign_id: int) -> Dict[str, Any]:
                 stats = response.json()
                 
                 # Update in backend
-                await client.post(
-                    f"{BACKEND_URL}/api/campaigns/{campaign_id}/update_stats/",
+                await backend_request(
+                    client, "POST", f"/api/campaigns/{campaign_id}/update_stats/",
                     json=stats
                 )
                 
@@ -576,62 +621,113 @@ def update_all_statistics():
 
 # ==================== EVENT HANDLERS ====================
 
-@app.task(name='dialer.handle_call_event')
-def handle_call_event(event_type: str, data: Dict[str, Any]):
+# Event ids whose counters were applied are remembered this long (seconds)
+APPLIED_EVENT_TTL = 24 * 60 * 60
+
+# Applies the counter increments only if the event's marker isn't set yet
+_apply_counters_once = redis_client.register_script("""
+if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    for i = 2, #KEYS do
+        redis.call('HINCRBY', KEYS[i], ARGV[2 * i - 2], ARGV[2 * i - 1])
+    end
+    return 1
+end
+return 0
+""")
+
+
+def _incr_counters(increments: List[tuple], event_id: Optional[str] = None):
+    """Apply (key, field, amount) increments, at most once per bus event id"""
+    if not increments:
+        return
+    if event_id is None:
+        for key, field, amount in increments:
+            redis_client.hincrby(key, field, amount)
+        return
+    
+    args = [APPLIED_EVENT_TTL]
+    for _, field, amount in increments:
+        args.extend([field, amount])
+    _apply_counters_once(keys=[f"events:applied:{event_id}"] + [key for key, _, _ in increments], args=args)
+
+
+def apply_call_event(event_type: str, data: Dict[str, Any], event_id: Optional[str] = None) -> List[tuple]:
     """
-    Handle call events from Asterisk (via AMI/ARI)
+    Apply a call event to the campaign counters.
     
-    Event types:
-    - call_answered
-    - call_completed
-    - call_failed
-    - agent_available
-    - agent_busy
+    Returns the (contact_id, status) updates still to be sent to the
+    backend, so callers can batch them. Event types may use the bus form
+    (``call.answered``) or the task form (``call_answered``). With the
+    bus ``event_id``, redelivered events don't change the counters again.
     """
-    logger.info(f"Handling call event: {event_type}")
-    
+    event_type = event_type.replace('.', '_')
     campaign_id = data.get('campaign_id')
     contact_id = data.get('contact_id')
+    contact_updates = []
+    increments = []
     
     if event_type == 'call_answered':
         # Decrement active calls
         if campaign_id:
-            redis_client.hincrby(f"campaign:{campaign_id}", "active_calls", -1)
-            redis_client.hincrby(f"campaign:{campaign_id}", "answered_calls", 1)
+            increments.append((f"campaign:{campaign_id}", "active_calls", -1))
+            increments.append((f"campaign:{campaign_id}", "answered_calls", 1))
         
         # Update contact status
         if contact_id:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(update_contact_status(contact_id, 'answered'))
-            loop.close()
+            contact_updates.append((contact_id, 'answered'))
     
     elif event_type == 'call_completed':
         # Update contact
         if contact_id:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(update_contact_status(contact_id, 'completed'))
-            loop.close()
+            contact_updates.append((contact_id, 'completed'))
     
     elif event_type == 'call_failed':
         # Decrement active calls
         if campaign_id:
-            redis_client.hincrby(f"campaign:{campaign_id}", "active_calls", -1)
+            increments.append((f"campaign:{campaign_id}", "active_calls", -1))
         
         # Update contact for retry
         if contact_id:
-            disposition = data.get('disposition', 'failed')
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(update_contact_status(contact_id, disposition))
-            loop.close()
+            contact_updates.append((contact_id, data.get('disposition') or data.get('status') or 'failed'))
     
     elif event_type in ['agent_available', 'agent_busy']:
         # Trigger campaign processing
         if campaign_id:
             process_campaign_task.delay(campaign_id)
     
+    _incr_counters(increments, event_id)
+    return contact_updates
+
+
+async def send_contact_updates(updates: List[tuple]):
+    """Send contact status updates to the backend concurrently"""
+    await asyncio.gather(*(update_contact_status(contact_id, status) for contact_id, status in updates))
+
+
+@app.task(name='dialer.handle_call_event')
+def handle_call_event(event_type: str, data: Dict[str, Any]):
+    """
+    Handle call events from Asterisk (via AMI/ARI)
+    
+    Event types:
+    - call_answered
+    - call_completed
+    - call_failed
+    - agent_available
+    - agent_busy
+    
+    The event bus consumer (events.py) is the durable path for these
+    events; this task remains for direct callers.
+    """
+    logger.info(f"Handling call event: {event_type}")
+    
+    contact_updates = apply_call_event(event_type, data)
+    if contact_updates:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(send_contact_updates(contact_updates))
+        loop.close()
+    
     return {'status': 'ok', 'event': event_type}
 
 
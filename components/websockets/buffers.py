@@ -0,0 +1,136 @@
+"""
+Per-connection outbound buffers
+
+The hub pushes every frame into the connection's OutboundBuffer and a
+sender task drains it. When a socket falls behind, the configured policy
+decides what to give up:
+
+    drop_oldest   discard the oldest pending frame
+    coalesce      keep only the latest frame per key (others drop oldest)
+    disconnect    close the slow connection
+
+The backend's consumers use a copy of this module
+(components/backend/apps/api/buffers.py); keep the two in sync.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+# Weight of the newest sample in the moving send latency averages
+LATENCY_SMOOTHING = 0.2
+
+
+class BufferOverflow(Exception):
+    """A connection with the disconnect policy fell too far behind"""
+
+
+class OutboundBuffer:
+    """Fixed capacity frame queue with a drop policy and delivery metrics"""
+
+    def __init__(self, capacity=256, policy=COALESCE):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.overflowed = False
+
+        self._frames = OrderedDict()
+        self._seq = 0
+        self._ready = asyncio.Event()
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.send_latency = 0.0
+        self.max_send_latency = 0.0
+        self.queue_latency = 0.0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def push(self, frame, key=None):
+        """Queue a frame; returns False once the connection should be dropped"""
+        if self.overflowed:
+            return False
+
+        queued_at = time.monotonic()
+        if key is not None and self.policy == COALESCE and key in self._frames:
+            # Replacing in place keeps the key's original position in line
+            self._frames[key] = (frame, self._frames[key][1])
+            self.coalesced += 1
+            return True
+
+        if len(self._frames) >= self.capacity:
+            if self.policy == DISCONNECT:
+                self.overflowed = True
+                self._ready.set()
+                return False
+            self._frames.popitem(last=False)
+            self.dropped += 1
+
+        if key is None or self.policy != COALESCE:
+            self._seq += 1
+            key = ("seq", self._seq)
+        self._frames[key] = (frame, queued_at)
+        self.max_depth = max(self.max_depth, len(self._frames))
+        self._ready.set()
+        return True
+
+    async def get(self):
+        """Next frame and the time it was queued; raises BufferOverflow when overflowed"""
+        while not self._frames:
+            if self.overflowed:
+                raise BufferOverflow()
+            self._ready.clear()
+            await self._ready.wait()
+        if self.overflowed:
+            raise BufferOverflow()
+        _, (frame, queued_at) = self._frames.popitem(last=False)
+        return frame, queued_at
+
+    def record_send(self, queued_at, started_at):
+        now = time.monotonic()
+        send = now - started_at
+        self.sent += 1
+        self.send_latency += LATENCY_SMOOTHING * (send - self.send_latency)
+        self.queue_latency += LATENCY_SMOOTHING * (now - queued_at - self.queue_latency)
+        self.max_send_latency = max(self.max_send_latency, send)
+
+    def metrics(self):
+        return {
+            "policy": self.policy,
+            "depth": len(self._frames),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "overflowed": self.overflowed,
+            "send_latency_ms": round(self.send_latency * 1000, 2),
+            "max_send_latency_ms": round(self.max_send_latency * 1000, 2),
+            "queue_latency_ms": round(self.queue_latency * 1000, 2),
+        }
+
+
+async def drain(buffer, send, timeout):
+    """
+    Deliver frames from ``buffer`` through ``send`` until cancelled.
+
+    A send that takes longer than ``timeout`` seconds counts as an overflow,
+    so a stalled client is treated like one whose buffer filled up.
+    """
+    while True:
+        frame, queued_at = await buffer.get()
+        started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(send(frame), timeout)
+        except asyncio.TimeoutError:
+            buffer.overflowed = True
+            raise BufferOverflow()
+        buffer.record_send(queued_at, started_at)
@@ -0,0 +1,327 @@
+"""
+Redis pub/sub fan-out hub
+
+The process holds a single Redis subscription for every topic and keeps a
+topic -> connections index. Each published message is serialized once and
+the same frame is queued on every subscribed connection; a per-connection
+sender task drains its buffer, so a slow socket only delays itself.
+
+Clients are authenticated before they join (see main.py). Each connection
+carries the Grant the backend issued for its token and may only subscribe
+to the agents, queues and campaigns of its own organization; wildcard
+topics and dialer events of other tenants are reserved to admins.
+
+Dialer call events come from the durable event bus (a Redis Stream) rather
+than pub/sub. Every hub instance reads it with a plain XREAD from the tail,
+since each instance has to fan out every event to its own clients and
+delivery to sockets is best effort anyway.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+
+from buffers import BufferOverflow, OutboundBuffer, drain
+
+logger = logging.getLogger(__name__)
+
+# Channels published by the backend (presence), the dialer and the worker
+CHANNEL_PATTERNS = ("agent:*", "queue:*", "campaign:*")
+CHANNELS = ("dialer:events",)
+
+# Event bus stream feeding the dialer:events topic
+EVENTS_STREAM = os.getenv("EVENTS_STREAM", "bus:events")
+EVENTS_BATCH_SIZE = 200
+EVENTS_BLOCK_MS = 5000
+
+# Compact stream fields, see the dialer API's encode_event()
+EVENT_FIELDS = {
+    "t": "type", "ts": "timestamp", "o": "organization_id", "c": "campaign_id",
+    "k": "contact_id", "u": "call_id", "q": "queue_id", "a": "agent_id",
+    "s": "status", "d": "duration",
+}
+
+# Outbound buffering per connection; see buffers.py for the drop policies
+SEND_BUFFER_SIZE = int(os.getenv("SEND_BUFFER_SIZE", "256"))
+DROP_POLICY = os.getenv("DROP_POLICY", "coalesce")
+SEND_TIMEOUT = float(os.getenv("SEND_TIMEOUT", "5"))
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def topic_allowed(topic):
+    """Whether ``topic`` is a known topic (exact or ``prefix:*``)"""
+    if topic in CHANNELS:
+        return True
+    prefix, _, rest = topic.partition(":")
+    return f"{prefix}:*" in CHANNEL_PATTERNS and bool(rest)
+
+
+class Grant:
+    """
+    What an authenticated client may follow, as issued by the backend's
+    /api/rt/ws/grant/ endpoint for its token.
+    """
+
+    def __init__(self, data):
+        self.user_id = data.get("user_id")
+        self.organization_id = data.get("organization_id")
+        self.all = bool(data.get("all"))
+        self.ids = {
+            "agent": set(data.get("agents") or ()),
+            "queue": set(data.get("queues") or ()),
+            "campaign": set(data.get("campaigns") or ()),
+        }
+
+    def allows(self, topic):
+        if not topic_allowed(topic):
+            return False
+        if self.all or topic in CHANNELS:
+            return True
+        prefix, _, rest = topic.partition(":")
+        # Wildcards span every tenant
+        return rest.isdigit() and int(rest) in self.ids.get(prefix, ())
+
+    def allows_event(self, event):
+        """Whether a dialer event concerns this client's organization"""
+        if self.all:
+            return True
+        if not isinstance(event, dict):
+            return False
+        campaign_id = str(event.get("campaign_id") or "")
+        if campaign_id:
+            return campaign_id.isdigit() and int(campaign_id) in self.ids["campaign"]
+        organization_id = event.get("organization_id")
+        return organization_id is not None and str(organization_id) == str(self.organization_id)
+
+
+class Connection:
+    """A client socket with its grant, outbound buffer and sender task"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket, grant, capacity=SEND_BUFFER_SIZE, policy=DROP_POLICY):
+        self.id = next(self._ids)
+        self.websocket = websocket
+        self.grant = grant
+        self.topics = set()
+        self.outbound = OutboundBuffer(capacity, policy)
+        self._sender = None
+
+    def start(self):
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        if self._sender:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+
+    def push(self, frame, key=None):
+        """Queue a frame without waiting"""
+        self.outbound.push(frame, key)
+
+    def metrics(self):
+        return {"id": self.id, "topics": len(self.topics), **self.outbound.metrics()}
+
+    async def _send_loop(self):
+        try:
+            await drain(self.outbound, self.websocket.send_text, SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except BufferOverflow:
+            logger.warning(f"Closing slow client {self.id}: {self.outbound.metrics()}")
+            try:
+                await self.websocket.close(code=1013)
+            except Exception:
+                pass
+        except Exception as e:
+            # The receive loop notices the disconnect and cleans up
+            logger.debug(f"Send failed: {e}")
+
+
+def decode_event(fields):
+    """Event dict from a stream entry's compact fields"""
+    event = json.loads(fields["x"]) if fields.get("x") else {}
+    for short, value in fields.items():
+        name = EVENT_FIELDS.get(short)
+        if name is not None:
+            event[name] = value
+    return event
+
+
+def coalesce_key(channel, payload):
+    """
+    Key under which a newer frame may replace a pending one.
+
+    State updates of the same agent on the same channel supersede each other;
+    dialer events are discrete and are never coalesced.
+    """
+    if channel in CHANNELS:
+        return None
+    if isinstance(payload, dict) and payload.get("type") == "agent_state":
+        return f"{channel}:{payload.get('agent_id')}"
+    return None
+
+
+class FanoutHub:
+    """Routes Redis pub/sub messages to subscribed connections"""
+
+    def __init__(self, redis_client, events_client=None):
+        self.redis = redis_client
+        self.events = events_client
+        self.connections = set()
+        self.subscriptions = {}
+        self.messages = 0
+        self._listener = None
+        self._events_reader = None
+
+    def __len__(self):
+        return len(self.connections)
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+        if self.events is not None:
+            self._events_reader = asyncio.create_task(self._read_events())
+
+    async def stop(self):
+        for task in (self._listener, self._events_reader):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        for connection in list(self.connections):
+            await self.remove(connection)
+
+    def add(self, connection):
+        self.connections.add(connection)
+        connection.start()
+
+    async def remove(self, connection):
+        self.unsubscribe(connection, list(connection.topics))
+        self.connections.discard(connection)
+        await connection.stop()
+
+    def subscribe(self, connection, topics):
+        accepted = [t for t in topics if connection.grant.allows(t)]
+        for topic in accepted:
+            self.subscriptions.setdefault(topic, set()).add(connection)
+            connection.topics.add(topic)
+        return accepted
+
+    def unsubscribe(self, connection, topics):
+        for topic in topics:
+            subscribers = self.subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscriptions[topic]
+            connection.topics.discard(topic)
+
+    def subscribers(self, channel):
+        """Connections subscribed to ``channel`` directly or through ``prefix:*``"""
+        exact = self.subscriptions.get(channel, ())
+        prefix = channel.partition(":")[0]
+        wildcard = self.subscriptions.get(f"{prefix}:*", ())
+        if not wildcard:
+            return exact
+        if not exact:
+            return wildcard
+        return set(exact) | set(wildcard)
+
+    def publish(self, channel, data):
+        """Serialize one message once and queue it on every subscriber"""
+        targets = self.subscribers(channel)
+        if not targets:
+            return 0
+
+        if isinstance(data, dict):
+            payload = data
+        else:
+            try:
+                payload = json.loads(data)
+            except (TypeError, ValueError):
+                payload = data
+        if channel in CHANNELS:
+            # One stream for every tenant; each client only gets its own events
+            targets = [c for c in targets if c.grant.allows_event(payload)]
+            if not targets:
+                return 0
+        frame = json.dumps({"topic": channel, "data": payload})
+        key = coalesce_key(channel, payload)
+
+        for connection in targets:
+            connection.push(frame, key)
+        return len(targets)
+
+    def metrics(self):
+        connections = [c.metrics() for c in self.connections]
+        return {
+            "connections": len(connections),
+            "topics": len(self.subscriptions),
+            "messages": self.messages,
+            "sent": sum(c["sent"] for c in connections),
+            "dropped": sum(c["dropped"] for c in connections),
+            "coalesced": sum(c["coalesced"] for c in connections),
+            "slowest": sorted(connections, key=lambda c: c["queue_latency_ms"], reverse=True)[:20],
+        }
+
+    async def _listen(self):
+        delay = RECONNECT_DELAY
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(*CHANNEL_PATTERNS)
+                logger.info("Fan-out hub subscribed to Redis")
+                delay = RECONNECT_DELAY
+
+                async for message in pubsub.listen():
+                    if message["type"] not in ("message", "pmessage"):
+                        continue
+                    self.messages += 1
+                    self.publish(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                logger.error(f"Fan-out hub lost its Redis subscription: {e}")
+                await pubsub.close()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _read_events(self):
+        delay = RECONNECT_DELAY
+        # Live events only; after a reconnect, resume where we left off
+        last_id = "$"
+        while True:
+            try:
+                logger.info(f"Fan-out hub reading {EVENTS_STREAM}")
+                delay = RECONNECT_DELAY
+
+                while True:
+                    response = await self.events.xread(
+                        {EVENTS_STREAM: last_id}, count=EVENTS_BATCH_SIZE, block=EVENTS_BLOCK_MS
+                    )
+                    if not response:
+                        continue
+                    for entry_id, fields in response[0][1]:
+                        last_id = entry_id
+                        self.messages += 1
+                        try:
+                            event = decode_event(fields)
+                        except (ValueError, TypeError) as e:
+                            logger.warning(f"Skipping malformed event {entry_id}: {e}")
+                            continue
+                        self.publish("dialer:events", event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Fan-out hub lost the event bus: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
@@ -1,68 +1,174 @@
 """
 OmniVoIP WebSocket Server
 Real-time notifications and messaging
+
+Clients authenticate with their backend access token, either as the first
+frame ({"action": "auth", "token": "..."}) or as ?token=... on the URL.
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import redis.asyncio as aioredis
+import asyncio
+import httpx
 import json
 import logging
 import os
 
+from hub import Connection, FanoutHub, Grant
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="OmniVoIP WebSocket Server")
 
+# Comma separated origins allowed to call the HTTP endpoints; sockets use tokens
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET"],
     allow_headers=["*"],
 )
 
 # Redis connection
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://redis:6379/2")
 redis_client = None
+events_client = None
 
-# Active connections
-active_connections = set()
+# Backend that validates tokens and issues topic grants
+BACKEND_URL = os.getenv("BACKEND_URL", "http://django-rt:8000")
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "5"))
+backend_http = None
+
+# One Redis subscription per process, shared by every socket
+hub = None
 
 
 @app.on_event("startup")
 async def startup():
-    global redis_client
+    global redis_client, events_client, backend_http, hub
+    backend_http = httpx.AsyncClient(base_url=BACKEND_URL, timeout=AUTH_TIMEOUT)
     redis_client = await aioredis.from_url(REDIS_URL, decode_responses=True)
+    events_client = await aioredis.from_url(EVENTS_REDIS_URL, decode_responses=True)
+    hub = FanoutHub(redis_client, events_client)
+    await hub.start()
     logger.info("WebSocket server started")
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    if hub:
+        await hub.stop()
     if redis_client:
         await redis_client.close()
+    if events_client:
+        await events_client.close()
+    if backend_http:
+        await backend_http.aclose()
     logger.info("WebSocket server stopped")
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "connections": len(hub) if hub else 0,
+        "topics": len(hub.subscriptions) if hub else 0,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Delivery metrics, including the slowest connections"""
+    return hub.metrics() if hub else {}
+
+
+def _topics(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return [t.strip() for t in value or [] if isinstance(t, str) and t.strip()]
+
+
+async def handle_client_message(connection: Connection, text: str):
+    """Subscription protocol: {"action": "subscribe"|"unsubscribe"|"ping", "topics": [...]}"""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        connection.push(json.dumps({"type": "error", "detail": "Invalid JSON"}))
+        return
+    
+    action = message.get("action") if isinstance(message, dict) else None
+    topics = _topics(message.get("topics")) if isinstance(message, dict) else []
+    
+    if action == "subscribe":
+        accepted = hub.subscribe(connection, topics)
+        rejected = sorted(set(topics) - set(accepted))
+        connection.push(json.dumps({"type": "subscribed", "topics": accepted, "rejected": rejected}))
+    elif action == "unsubscribe":
+        hub.unsubscribe(connection, topics)
+        connection.push(json.dumps({"type": "unsubscribed", "topics": topics}))
+    elif action == "ping":
+        connection.push(json.dumps({"type": "pong"}))
+    else:
+        connection.push(json.dumps({"type": "error", "detail": f"Unknown action: {action}"}))
+
+
+async def authenticate(websocket: WebSocket):
+    """Grant for the socket's token, or None when it has no valid one"""
+    token = websocket.query_params.get("token")
+    if not token:
+        try:
+            message = json.loads(await asyncio.wait_for(websocket.receive_text(), AUTH_TIMEOUT))
+        except (asyncio.TimeoutError, ValueError):
+            return None
+        if not isinstance(message, dict) or message.get("action") != "auth":
+            return None
+        token = message.get("token")
+    if not token or not isinstance(token, str):
+        return None
+    
+    try:
+        response = await backend_http.get("/api/rt/ws/grant/", headers={"Authorization": f"Bearer {token}"})
+    except httpx.HTTPError as e:
+        logger.error(f"Could not validate a WebSocket token: {e}")
+        return None
+    if response.status_code != 200:
+        return None
+    return Grant(response.json())
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    active_connections.add(websocket)
-    logger.info(f"Client connected. Total: {len(active_connections)}")
+    try:
+        grant = await authenticate(websocket)
+    except WebSocketDisconnect:
+        return
+    if grant is None:
+        await websocket.close(code=4401, reason="Authentication required")
+        return
+    
+    connection = Connection(websocket, grant)
+    hub.add(connection)
+    connection.push(json.dumps({"type": "authenticated", "user_id": grant.user_id}))
+    
+    # Topics can be given upfront: /ws?topics=agent:5,queue:3
+    initial = _topics(websocket.query_params.get("topics"))
+    if initial:
+        hub.subscribe(connection, initial)
+    logger.info(f"Client connected (user {grant.user_id}). Total: {len(hub)}")
     
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo back for now
-            await websocket.send_text(f"Echo: {data}")
+            await handle_client_message(connection, data)
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
-        logger.info(f"Client disconnected. Total: {len(active_connections)}")
+        pass
+    finally:
+        await hub.remove(connection)
+        logger.info(f"Client disconnected. Total: {len(hub)}")
 
 
 if __name__ == "__main__":